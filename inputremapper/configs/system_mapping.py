@@ -19,11 +19,13 @@
 """Make the systems/environments mapping of keys and codes accessible."""
 
 import json
+import os
 import re
 import subprocess
-from typing import Optional, List, Iterable, Tuple
+from typing import Optional, List, Iterable, Tuple, Dict
 
 import evdev
+from evdev.ecodes import KEY_LEFTSHIFT, KEY_RIGHTALT
 
 from inputremapper.configs.paths import get_config_path, touch
 from inputremapper.logger import logger
@@ -38,6 +40,97 @@ XKB_KEYCODE_OFFSET = 8
 
 XMODMAP_FILENAME = "xmodmap.json"
 
+XMODMAP_LEVELS_FILENAME = "xmodmap_levels.json"
+
+# The columns of `xmodmap -pke` that are reachable with shift and AltGr, and the
+# modifiers that need to be held down to reach them.
+LEVEL_MODIFIERS = {
+    0: [],
+    1: [KEY_LEFTSHIFT],
+    4: [KEY_RIGHTALT],
+    5: [KEY_RIGHTALT, KEY_LEFTSHIFT],
+}
+
+# xkb symbol names of characters that aren't named like the character itself
+CHARACTER_SYMBOLS = {
+    " ": "space",
+    "\n": "Return",
+    "\t": "Tab",
+    "!": "exclam",
+    '"': "quotedbl",
+    "#": "numbersign",
+    "$": "dollar",
+    "%": "percent",
+    "&": "ampersand",
+    "'": "apostrophe",
+    "(": "parenleft",
+    ")": "parenright",
+    "*": "asterisk",
+    "+": "plus",
+    ",": "comma",
+    "-": "minus",
+    ".": "period",
+    "/": "slash",
+    ":": "colon",
+    ";": "semicolon",
+    "<": "less",
+    "=": "equal",
+    ">": "greater",
+    "?": "question",
+    "@": "at",
+    "[": "bracketleft",
+    "\\": "backslash",
+    "]": "bracketright",
+    "^": "asciicircum",
+    "_": "underscore",
+    "`": "grave",
+    "{": "braceleft",
+    "|": "bar",
+    "}": "braceright",
+    "~": "asciitilde",
+}
+
+# Used if the layout of the user is unknown, for example because xmodmap is not
+# installed. Maps characters to the linux key name and whether shift is needed on a
+# US keyboard.
+US_CHARACTERS = {
+    " ": ("KEY_SPACE", False),
+    "\n": ("KEY_ENTER", False),
+    "\t": ("KEY_TAB", False),
+    "!": ("KEY_1", True),
+    '"': ("KEY_APOSTROPHE", True),
+    "#": ("KEY_3", True),
+    "$": ("KEY_4", True),
+    "%": ("KEY_5", True),
+    "&": ("KEY_7", True),
+    "'": ("KEY_APOSTROPHE", False),
+    "(": ("KEY_9", True),
+    ")": ("KEY_0", True),
+    "*": ("KEY_8", True),
+    "+": ("KEY_EQUAL", True),
+    ",": ("KEY_COMMA", False),
+    "-": ("KEY_MINUS", False),
+    ".": ("KEY_DOT", False),
+    "/": ("KEY_SLASH", False),
+    ":": ("KEY_SEMICOLON", True),
+    ";": ("KEY_SEMICOLON", False),
+    "<": ("KEY_COMMA", True),
+    "=": ("KEY_EQUAL", False),
+    ">": ("KEY_DOT", True),
+    "?": ("KEY_SLASH", True),
+    "@": ("KEY_2", True),
+    "[": ("KEY_LEFTBRACE", False),
+    "\\": ("KEY_BACKSLASH", False),
+    "]": ("KEY_RIGHTBRACE", False),
+    "^": ("KEY_6", True),
+    "_": ("KEY_MINUS", True),
+    "`": ("KEY_GRAVE", False),
+    "{": ("KEY_LEFTBRACE", True),
+    "|": ("KEY_BACKSLASH", True),
+    "}": ("KEY_RIGHTBRACE", True),
+    "~": ("KEY_GRAVE", True),
+}
+
 LAZY_LOAD = None
 
 
@@ -47,6 +140,7 @@ class SystemMapping:
     _mapping: Optional[dict] = LAZY_LOAD
     _xmodmap: Optional[List[Tuple[str, str]]] = LAZY_LOAD
     _case_insensitive_mapping: Optional[dict] = LAZY_LOAD
+    _levels: Optional[Dict[str, Tuple[int, int]]] = LAZY_LOAD
 
     def __getattribute__(self, wanted: str):
         """To lazy load system_mapping info only when needed.
@@ -54,7 +148,18 @@ class SystemMapping:
         For example, this helps to keep logs of input-remapper-control clear when it
         doesn't need it the information.
         """
-        lazy_loaded_attributes = ["_mapping", "_xmodmap", "_case_insensitive_mapping"]
+        if (
+            wanted == "_levels"
+            and object.__getattribute__(self, "_levels") is LAZY_LOAD
+        ):
+            # only needed for the type macro, don't look for them during populate
+            object.__getattribute__(self, "_load_levels")()
+
+        lazy_loaded_attributes = [
+            "_mapping",
+            "_xmodmap",
+            "_case_insensitive_mapping",
+        ]
         for lazy_loaded_attribute in lazy_loaded_attributes:
             if wanted != lazy_loaded_attribute:
                 continue
@@ -117,6 +222,28 @@ class SystemMapping:
         for name, code in xmodmap_dict.items():
             self._set(name, code)
 
+    def _load_levels(self):
+        """Find the shift-levels of the symbols in the xmodmap of the session."""
+        # the service can't use xmodmap, see load_session_xmodmap instead
+        self._levels = {} if is_service() else self._find_levels()
+
+    def save_levels(self):
+        """Write the shift-levels of the session into xmodmap_levels.json.
+
+        The service needs them to type text with the macro `type`, and reads them
+        in load_session_xmodmap. Call this before telling the service about the
+        config dir.
+        """
+        if len(self._levels) == 0:
+            # xmodmap is not available
+            return
+
+        path = get_config_path(XMODMAP_LEVELS_FILENAME)
+        touch(path)
+        with open(path, "w") as file:
+            logger.debug('Writing "%s"', path)
+            json.dump(self._levels, file, indent=4)
+
     def _use_linux_evdev_symbols(self):
         """Look up the evdev constant names and use them."""
         for name, ecode in evdev.ecodes.ecodes.items():
@@ -153,6 +280,86 @@ class SystemMapping:
             "Updated keycodes with %d new ones", len(self._mapping) - len_before
         )
 
+    def update_levels(self, levels: Dict[str, Tuple[int, int]]):
+        """Update the known shift-levels of symbols.
+
+        Parameters
+        ----------
+        levels
+            maps from symbol to the code and the column in `xmodmap -pke`
+        """
+        for symbol, (code, level) in levels.items():
+            self._levels[symbol] = (code, level)
+
+    def load_session_xmodmap(self, config_dir: str):
+        """Use the keyboard layout that the users session wrote into config_dir."""
+        # Path to a dump of the xkb mappings, to provide more human
+        # readable keys in the correct keyboard layout to the service.
+        # The service cannot use `xmodmap -pke` because it's running via
+        # systemd.
+        xmodmap_path = os.path.join(config_dir, XMODMAP_FILENAME)
+        try:
+            with open(xmodmap_path, "r") as file:
+                # do this for each injection to make sure it is up to
+                # date when the system layout changes.
+                xmodmap = json.load(file)
+                logger.debug('Using keycodes from "%s"', xmodmap_path)
+
+                # this creates the _xmodmap, which we need to do now
+                # otherwise it might be created later which will override the changes
+                # we do here.
+                # Do we really need to lazyload in the system_mapping?
+                # this kind of bug is stupid to track down
+                self.get_name(0)
+                self.update(xmodmap)
+                # the service now has process wide knowledge of xmodmap
+                # keys of the users session
+        except FileNotFoundError:
+            logger.error('Could not find "%s"', xmodmap_path)
+
+        # Which symbols are reachable via shift and AltGr, needed for the type macro
+        xmodmap_levels_path = os.path.join(config_dir, XMODMAP_LEVELS_FILENAME)
+        try:
+            with open(xmodmap_levels_path, "r") as file:
+                self.update_levels(json.load(file))
+                logger.debug('Using levels from "%s"', xmodmap_levels_path)
+        except FileNotFoundError:
+            logger.debug('Could not find "%s"', xmodmap_levels_path)
+
+    def get_character_keys(self, character: str) -> Optional[Tuple[int, List[int]]]:
+        """Find the code and the modifiers that are needed to write the character.
+
+        Returns None if the character can't be written.
+        """
+        symbol = CHARACTER_SYMBOLS.get(character, character)
+
+        if symbol in self._levels:
+            code, level = self._levels[symbol]
+            return code, LEVEL_MODIFIERS[level]
+
+        # without level information, only symbols without modifiers are known
+        code = self._mapping.get(symbol)
+        if code is not None:
+            return code, []
+
+        if character.isupper():
+            code = self._mapping.get(character.lower())
+            if code is not None:
+                return code, [KEY_LEFTSHIFT]
+
+        if character.isascii() and character.isalnum():
+            code = self._mapping.get(f"KEY_{character.upper()}")
+            if code is not None:
+                return code, [KEY_LEFTSHIFT] if character.isupper() else []
+
+        if character in US_CHARACTERS:
+            name, shift = US_CHARACTERS[character]
+            code = self._mapping.get(name)
+            if code is not None:
+                return code, [KEY_LEFTSHIFT] if shift else []
+
+        return None
+
     def _set(self, name: str, code: int):
         """Map name to code."""
         self._mapping[str(name)] = code
@@ -174,6 +381,8 @@ class SystemMapping:
         for key in keys:
             del self._mapping[key]
 
+        self._levels = LAZY_LOAD
+
     def get_name(self, code: int):
         """Get the first matching name for the code."""
         for entry in self._xmodmap:
@@ -213,6 +422,21 @@ class SystemMapping:
 
         return xmodmap_dict
 
+    def _find_levels(self) -> Dict[str, Tuple[int, int]]:
+        """From the parsed xmodmap list find the code and level of each symbol."""
+        levels = {}
+        for keycode, names in self._xmodmap:
+            code = int(keycode) - XKB_KEYCODE_OFFSET
+            for level, name in enumerate(names.split()):
+                if level not in LEVEL_MODIFIERS or name == "NoSymbol":
+                    continue
+
+                # prefer the first key and the lowest level that writes the symbol
+                if name not in levels or levels[name][1] > level:
+                    levels[name] = (code, level)
+
+        return levels
+
 
 # this mapping represents the xmodmap output, which stays constant
 system_mapping = SystemMapping()
@@ -25,25 +25,41 @@ https://github.com/LEW21/pydbus/tree/cc407c8b1d25b7e28a6d661a29f9e661b1c9b964/ex
 
 
 import atexit
+import enum
+import itertools
 import json
 import os
 import sys
+import threading
 import time
+from collections import deque
 from pathlib import PurePath
-from typing import Protocol, Dict, Optional
+from typing import (
+    Protocol,
+    Dict,
+    Optional,
+    List,
+    Tuple,
+    Generator,
+    Deque,
+    Callable,
+    Any,
+)
 
 import gi
 from pydbus import SystemBus
+from pydbus.generic import signal
 
 gi.require_version("GLib", "2.0")
-from gi.repository import GLib
+from gi.repository import GLib, Gio
 
 from inputremapper.logger import logger, is_debug
 from inputremapper.injection.injector import Injector, InjectorState
+from inputremapper.injection.injection_host import InjectionHost
 from inputremapper.configs.preset import Preset
 from inputremapper.configs.global_config import global_config
 from inputremapper.configs.system_mapping import system_mapping
-from inputremapper.groups import groups
+from inputremapper.groups import groups, DEVICE_CACHE_PATH, _Group
 from inputremapper.configs.paths import get_config_path, sanitize_path_component, USER
 from inputremapper.injection.macros.macro import macro_variables
 from inputremapper.injection.global_uinputs import global_uinputs
@@ -53,6 +69,26 @@ BUS_NAME = "inputremapper.Control"
 # timeout in seconds, see
 # https://github.com/LEW21/pydbus/blob/cc407c8b1d25b7e28a6d661a29f9e661b1c9b964/pydbus/proxy.py
 BUS_TIMEOUT = 10
+# udev triggers autoload_single for each new device node, and a single usb device
+# usually has multiple of them. Requests within this time in milliseconds are
+# processed together.
+AUTOLOAD_DEBOUNCE_MS = 100
+# the states of that many of the most recent jobs are remembered
+MAX_JOBS = 100
+
+# A job yields between its slow parts, so that the main loop can handle other
+# requests in between. It can yield a function that blocks, which is then called
+# in a thread, and gets its return value sent back. The return value of the job
+# tells if it succeeded.
+JobSteps = Generator[Optional[Callable[[], Any]], Any, bool]
+
+
+class JobState(str, enum.Enum):
+    UNKNOWN = "UNKNOWN"
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
 
 
 class AutoloadHistory:
@@ -121,6 +157,9 @@ def remove_timeout(func):
 class DaemonProxy(Protocol):  # pragma: no cover
     """The interface provided over the dbus."""
 
+    injector_state_changed: signal
+    job_changed: signal
+
     def stop_injecting(self, group_key: str) -> None:
         ...
 
@@ -130,6 +169,24 @@ class DaemonProxy(Protocol):  # pragma: no cover
     def start_injecting(self, group_key: str, preset: str) -> bool:
         ...
 
+    def reload_preset(self, group_key: str, preset: str) -> bool:
+        ...
+
+    def preload_preset(self, group_key: str, preset: str) -> bool:
+        ...
+
+    def switch_preset(self, group_key: str, preset: str) -> bool:
+        ...
+
+    def get_states(self) -> Dict[str, str]:
+        ...
+
+    def start_injecting_many(self, presets: List[Tuple[str, str]]) -> Dict[str, bool]:
+        ...
+
+    def stop_injecting_many(self, group_keys: List[str]) -> None:
+        ...
+
     def stop_all(self) -> None:
         ...
 
@@ -142,6 +199,21 @@ class DaemonProxy(Protocol):  # pragma: no cover
     def autoload_single(self, group_key: str) -> None:
         ...
 
+    def get_macro_statistics(self, group_key: str) -> str:
+        ...
+
+    def get_stats(self) -> str:
+        ...
+
+    def queue_start_injecting(self, group_key: str, preset: str) -> str:
+        ...
+
+    def queue_stop_injecting(self, group_key: str) -> str:
+        ...
+
+    def get_job_state(self, job_id: str) -> JobState:
+        ...
+
     def hello(self, out: str) -> str:
         ...
 
@@ -173,6 +245,31 @@ class Daemon:
                     <arg type='s' name='preset' direction='in'/>
                     <arg type='b' name='response' direction='out'/>
                 </method>
+                <method name='reload_preset'>
+                    <arg type='s' name='group_key' direction='in'/>
+                    <arg type='s' name='preset' direction='in'/>
+                    <arg type='b' name='response' direction='out'/>
+                </method>
+                <method name='preload_preset'>
+                    <arg type='s' name='group_key' direction='in'/>
+                    <arg type='s' name='preset' direction='in'/>
+                    <arg type='b' name='response' direction='out'/>
+                </method>
+                <method name='switch_preset'>
+                    <arg type='s' name='group_key' direction='in'/>
+                    <arg type='s' name='preset' direction='in'/>
+                    <arg type='b' name='response' direction='out'/>
+                </method>
+                <method name='get_states'>
+                    <arg type='a{{ss}}' name='response' direction='out'/>
+                </method>
+                <method name='start_injecting_many'>
+                    <arg type='a(ss)' name='presets' direction='in'/>
+                    <arg type='a{{sb}}' name='response' direction='out'/>
+                </method>
+                <method name='stop_injecting_many'>
+                    <arg type='as' name='group_keys' direction='in'/>
+                </method>
                 <method name='stop_all'>
                 </method>
                 <method name='set_config_dir'>
@@ -183,6 +280,35 @@ class Daemon:
                 <method name='autoload_single'>
                     <arg type='s' name='group_key' direction='in'/>
                 </method>
+                <method name='get_macro_statistics'>
+                    <arg type='s' name='group_key' direction='in'/>
+                    <arg type='s' name='response' direction='out'/>
+                </method>
+                <method name='get_stats'>
+                    <arg type='s' name='response' direction='out'/>
+                </method>
+                <method name='queue_start_injecting'>
+                    <arg type='s' name='group_key' direction='in'/>
+                    <arg type='s' name='preset' direction='in'/>
+                    <arg type='s' name='response' direction='out'/>
+                </method>
+                <method name='queue_stop_injecting'>
+                    <arg type='s' name='group_key' direction='in'/>
+                    <arg type='s' name='response' direction='out'/>
+                </method>
+                <method name='get_job_state'>
+                    <arg type='s' name='job_id' direction='in'/>
+                    <arg type='s' name='response' direction='out'/>
+                </method>
+                <signal name='injector_state_changed'>
+                    <arg type='s' name='group_key'/>
+                    <arg type='s' name='state'/>
+                </signal>
+                <signal name='job_changed'>
+                    <arg type='s' name='job_id'/>
+                    <arg type='s' name='group_key'/>
+                    <arg type='s' name='state'/>
+                </signal>
                 <method name='hello'>
                     <arg type='s' name='out' direction='in'/>
                     <arg type='s' name='response' direction='out'/>
@@ -191,11 +317,20 @@ class Daemon:
         </node>
     """
 
+    # emitted with the group key and the InjectorState whenever it changes
+    injector_state_changed = signal()
+    # emitted with the job id, the group key and the JobState
+    job_changed = signal()
+
     def __init__(self):
         """Constructs the daemon."""
         logger.debug("Creating daemon")
         self.injectors: Dict[str, Injector] = {}
 
+        # idle injector processes, if "injector_pool_size" is set
+        self._injector_pool: List[InjectionHost] = []
+        self._injector_pool_source = None
+
         self.config_dir = None
 
         if USER != "root":
@@ -206,7 +341,29 @@ class Daemon:
             logger.warning("The service usually needs elevated privileges")
 
         self.autoload_history = AutoloadHistory()
-        self.refreshed_devices_at = 0
+        self._device_monitor = None
+        self._update_groups_source = None
+        # group keys that wait for the debounced autoload, in order of arrival
+        self._autoload_queue: Dict[str, None] = {}
+        self._autoload_source = None
+        # the last state that was emitted for each group, and the GLib sources
+        # that watch the current injector of the group
+        self._injector_states: Dict[str, InjectorState] = {}
+        self._injector_watches: Dict[str, List[int]] = {}
+
+        # slow operations requested via the queue_ methods are done one after the
+        # other, step by step, whenever the main loop is idle
+        self._job_queue: Deque[Tuple[str, str, JobSteps]] = deque()
+        self._job_source = None
+        # the job whose blocking function is running in a thread, and what the
+        # function returned or raised
+        self._waiting_job: Optional[str] = None
+        self._job_result: Tuple[Any, Optional[Exception]] = (None, None)
+        self._job_ids = itertools.count(1)
+        self._job_states: Dict[str, JobState] = {}
+
+        # runs all injections in a single process, if "injection_host" is enabled
+        self._injection_host: Optional[InjectionHost] = None
 
         atexit.register(self.stop_all)
 
@@ -278,31 +435,58 @@ class Daemon:
     def run(self):
         """Start the daemons loop. Blocks until the daemon stops."""
         loop = GLib.MainLoop()
+        groups.use_cache(DEVICE_CACHE_PATH)
+        self._watch_devices()
         logger.debug("Running daemon")
         loop.run()
 
-    def refresh(self, group_key: Optional[str] = None):
-        """Refresh groups if the specified group is unknown.
+    def _watch_devices(self):
+        """Keep the groups up to date while devices are plugged in or removed."""
+        directory = Gio.File.new_for_path("/dev/input")
+        try:
+            self._device_monitor = directory.monitor_directory(
+                Gio.FileMonitorFlags.NONE, None
+            )
+        except GLib.GError as error:
+            logger.error("Can't watch /dev/input for new devices: %s", error)
+            return
+
+        self._device_monitor.connect("changed", self._on_devices_changed)
+
+    def _on_devices_changed(self, _monitor, file, _other_file, _event_type):
+        if not file.get_basename().startswith("event"):
+            return
+
+        if self._update_groups_source is not None:
+            # already scheduled
+            return
+
+        # A device usually adds multiple nodes at once, and it may take a bit of
+        # time until they are usable
+        self._update_groups_source = GLib.timeout_add(100, self._update_groups)
+
+    def _update_groups(self):
+        self._update_groups_source = None
+        groups.update()
+        # don't repeat the timeout
+        return False
+
+    def refresh(self, *group_keys: str):
+        """Update the groups if devices changed.
+
+        Only devices that were added or replaced are opened, so this is cheap.
 
         Parameters
         ----------
-        group_key
-            unique identifier used by the groups object
+        group_keys
+            unique identifiers used by the groups object, to report if they are
+            still unknown afterwards
         """
-        now = time.time()
-        if now - 10 > self.refreshed_devices_at:
-            logger.debug("Refreshing because last info is too old")
-            # it may take a bit of time until devices are visible after changes
-            time.sleep(0.1)
-            groups.refresh()
-            self.refreshed_devices_at = now
-            return
+        groups.update()
 
-        if not groups.find(key=group_key):
-            logger.debug('Refreshing because "%s" is unknown', group_key)
-            time.sleep(0.1)
-            groups.refresh()
-            self.refreshed_devices_at = now
+        unknown = [key for key in group_keys if groups.find(key=key) is None]
+        if len(unknown) > 0:
+            logger.debug("%s is unknown", unknown)
 
     def stop_injecting(self, group_key: str):
         """Stop injecting the preset mappings for a single device."""
@@ -319,7 +503,90 @@ class Daemon:
     def get_state(self, group_key: str) -> InjectorState:
         """Get the injectors state."""
         injector = self.injectors.get(group_key)
-        return injector.get_state() if injector else InjectorState.UNKNOWN
+        if injector is None:
+            return InjectorState.UNKNOWN
+
+        state = injector.get_state()
+        # messages of the injector were consumed, so the watch won't notice them
+        self._emit_injector_state(group_key, state)
+        return state
+
+    def get_states(self) -> Dict[str, str]:
+        """Get the states of all injectors, by group key."""
+        return {
+            group_key: self.get_state(group_key).value
+            for group_key in list(self.injectors.keys())
+        }
+
+    def _watch_injector(self, injector: Injector):
+        """Emit injector_state_changed for each new state of the injector."""
+        group_key = injector.group.key
+        self._unwatch_injector(group_key)
+
+        def on_message(*_):
+            return self._on_injector_message(injector)
+
+        # The sentinel is readable once the process ended, which may happen without
+        # sending a message first if it crashed. Depending on how the process ended,
+        # poll reports that as a hangup instead.
+        condition = GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR
+        self._injector_watches[group_key] = [
+            GLib.io_add_watch(fd, GLib.PRIORITY_DEFAULT, condition, on_message)
+            for fd in (injector.fileno(), injector.sentinel)
+        ]
+        # always announce the new injector, even if the previous one of the group
+        # ended up in the same state
+        self._injector_states.pop(group_key, None)
+        self._emit_injector_state(group_key, injector.get_state())
+
+    def _unwatch_injector(self, group_key: str):
+        for source_id in self._injector_watches.pop(group_key, []):
+            GLib.source_remove(source_id)
+
+    def _on_injector_message(self, injector: Injector) -> bool:
+        """The injector sent its state, or its process ended."""
+        group_key = injector.group.key
+        if self.injectors.get(group_key) is not injector:
+            return False
+
+        self._emit_injector_state(group_key, injector.get_state())
+
+        if not injector.is_alive():
+            # the sentinel would be readable forever
+            self._unwatch_injector(group_key)
+            return False
+
+        return True
+
+    def _emit_injector_state(self, group_key: str, state: InjectorState):
+        if self._injector_states.get(group_key) == state:
+            return
+
+        self._injector_states[group_key] = state
+        self.injector_state_changed(group_key, state.value)
+
+    def get_macro_statistics(self, group_key: str) -> str:
+        """Get the runtime statistics of the macros as json.
+
+        Only available if "profile_macros" is enabled in the config.json.
+        """
+        injector = self.injectors.get(group_key)
+        statistics = injector.get_macro_statistics() if injector else {}
+        return json.dumps(statistics)
+
+    def get_stats(self) -> str:
+        """Get the runtime counters of all running injectors as json, by group key.
+
+        Contains the events that were read, forwarded and handled, the writes to
+        uinputs, and the cpu time and memory usage of the injector processes.
+        Hosted injections report those of the host, which they share.
+        """
+        stats = {}
+        for group_key, injector in list(self.injectors.items()):
+            if injector.is_alive():
+                stats[group_key] = injector.get_stats()
+
+        return json.dumps(stats)
 
     @remove_timeout
     def set_config_dir(self, config_dir: str):
@@ -342,32 +609,34 @@ class Daemon:
         self.config_dir = config_dir
         global_config.load_config(config_path)
 
-    def _autoload(self, group_key: str):
-        """Check if autoloading is a good idea, and if so do it.
+        # the idle injector processes know the previous config
+        self._clear_injector_pool()
+        self._fill_injector_pool_later()
+
+    def _get_autoload_preset(self, group_key: str) -> Optional[Tuple[_Group, str]]:
+        """Check if autoloading is a good idea, and if so return what to inject.
 
         Parameters
         ----------
         group_key
             unique identifier used by the groups object
         """
-        self.refresh(group_key)
-
         group = groups.find(key=group_key)
         if group is None:
             # even after groups.refresh, the device is unknown, so it's
             # either not relevant for input-remapper, or not connected yet
-            return
+            return None
 
         preset = global_config.get(["autoload", group.key], log_unknown=False)
 
         if preset is None:
             # no autoloading is configured for this device
-            return
+            return None
 
         if not isinstance(preset, str):
             # maybe another dict or something, who knows. Broken config
             logger.error("Expected a string for autoload, but got %s", preset)
-            return
+            return None
 
         logger.info('Autoloading for "%s"', group.key)
 
@@ -377,21 +646,119 @@ class Daemon:
                 preset,
                 group.key,
             )
+            return None
+
+        return group, preset
+
+    def _autoload_batch(self, group_keys: List[str]):
+        """Autoload for multiple groups with a single refresh of the devices.
+
+        Paths of devices are resolved to the key of their group. All presets are
+        loaded first, and all injectors are started afterwards. They are processes
+        that don't block the daemon while they start, so they are starting in
+        parallel.
+        """
+        if self.config_dir is None:
+            logger.error(
+                "Request to autoload before a user told the service about their "
+                "session using set_config_dir",
+            )
             return
 
-        self.start_injecting(group.key, preset)
-        self.autoload_history.remember(group.key, preset)
+        # paths are not waited for, because udev also reports nodes like
+        # /dev/input/mouse0 that never belong to a group
+        self.refresh(*[key for key in group_keys if not key.startswith("/dev/")])
+
+        resolved_keys = []
+        for group_key in group_keys:
+            if group_key.startswith("/dev/"):
+                group = groups.find(path=group_key)
+                if group is None:
+                    logger.debug('No group found for "%s"', group_key)
+                    continue
+
+                group_key = group.key
+
+            resolved_keys.append(group_key)
+
+        # duplicates are removed while keeping the order. Devices usually have
+        # multiple nodes that udev reports separately.
+        autoloads = []
+        for group_key in dict.fromkeys(resolved_keys):
+            autoload = self._get_autoload_preset(group_key)
+            if autoload is not None:
+                autoloads.append(autoload)
+
+        if len(autoloads) == 0:
+            return
+
+        self._load_xmodmap()
+
+        # Validating the presets with pydantic holds the GIL, so threads wouldn't
+        # make this any faster.
+        results = []
+        for group, preset_name in autoloads:
+            start = time.perf_counter()
+            preset = self._load_preset(group, preset_name)
+            results.append((preset, time.perf_counter() - start))
+
+        for (group, preset_name), (preset, load_time) in zip(autoloads, results):
+            start = time.perf_counter()
+            if preset is not None:
+                self._start_injector(group, preset)
+
+            self.autoload_history.remember(group.key, preset_name)
+            logger.info(
+                'Took %.3fs to load and %.3fs to start "%s" for "%s"',
+                load_time,
+                time.perf_counter() - start,
+                preset_name,
+                group.key,
+            )
+
+    def _queue_autoload(self, group_key: str):
+        """Autoload after a short delay, together with other requests."""
+        self._autoload_queue[group_key] = None
+        if self._autoload_source is None:
+            self._autoload_source = GLib.timeout_add(
+                AUTOLOAD_DEBOUNCE_MS,
+                self._process_autoload_queue,
+            )
+
+    def _take_autoload_queue(self) -> List[str]:
+        """Empty the queue and return the group keys that were in it."""
+        if self._autoload_source is not None:
+            # if not called by the timeout, it would otherwise run again
+            GLib.source_remove(self._autoload_source)
+            self._autoload_source = None
+
+        group_keys = list(self._autoload_queue)
+        self._autoload_queue.clear()
+        return group_keys
+
+    def _process_autoload_queue(self):
+        """Autoload for all groups that were requested since the last time."""
+        group_keys = self._take_autoload_queue()
+        if len(group_keys) > 0:
+            logger.debug("Processing %d autoload requests", len(group_keys))
+            self._autoload_batch(group_keys)
+
+        # don't repeat the timeout
+        return False
 
     @remove_timeout
     def autoload_single(self, group_key: str):
         """Inject the configured autoload preset for the device.
 
         If the preset is already being injected, it won't autoload it again.
+        Requests are debounced by AUTOLOAD_DEBOUNCE_MS, so this returns before the
+        injection is started.
 
         Parameters
         ----------
         group_key
-            unique identifier used by the groups object
+            unique identifier used by the groups object, or the path of one of the
+            devices of the group, like /dev/input/event3
         """
         # avoid some confusing logs and filter obviously invalid requests
         if group_key.startswith("input-remapper"):
@@ -400,14 +767,16 @@ class Daemon:
         logger.info('Request to autoload for "%s"', group_key)
 
         if self.config_dir is None:
-            logger.error(
+            # udev requests this for each device while booting, before anyone
+            # logged in, so this is expected to happen
+            logger.debug(
                 'Request to autoload "%s" before a user told the service about their '
                 "session using set_config_dir",
                 group_key,
             )
             return
 
-        self._autoload(group_key)
+        self._queue_autoload(group_key)
 
     @remove_timeout
     def autoload(self):
@@ -430,8 +799,10 @@ class Daemon:
             logger.error("No presets configured to autoload")
             return
 
-        for group_key, _ in autoload_presets:
-            self._autoload(group_key)
+        # pending requests of single devices are covered by this as well
+        group_keys = self._take_autoload_queue()
+        group_keys += [group_key for group_key, _ in autoload_presets]
+        self._autoload_batch(group_keys)
 
     def start_injecting(self, group_key: str, preset_name: str) -> bool:
         """Start injecting the preset for the device.
@@ -446,9 +817,144 @@ class Daemon:
         preset_name
             The name of the preset
         """
+        return self._run_steps(self._start_injecting_steps(group_key, preset_name))
+
+    def reload_preset(self, group_key: str, preset_name: str) -> bool:
+        """Replace the preset of a running injection, without restarting it.
+
+        The devices stay grabbed, and only the handlers of mappings that changed
+        are created again. Returns False if the group isn't being injected into,
+        use start_injecting then.
+
+        Parameters
+        ----------
+        group_key
+            The unique key of the group
+        preset_name
+            The name of the preset
+        """
+        injector = self._get_running_injector(group_key)
+        if injector is None:
+            return False
+
+        self._load_xmodmap()
+        preset = self._load_preset(injector.group, preset_name)
+        if preset is None:
+            return False
+
+        injector.reload_preset(preset, self.config_dir)
+        return True
+
+    def preload_preset(self, group_key: str, preset_name: str) -> bool:
+        """Compile the preset within the running injection, to switch to it later.
+
+        Returns False if the group isn't being injected into.
+
+        Parameters
+        ----------
+        group_key
+            The unique key of the group
+        preset_name
+            The name of the preset
+        """
+        injector = self._get_running_injector(group_key)
+        if injector is None:
+            return False
+
+        self._load_xmodmap()
+        preset = self._load_preset(injector.group, preset_name)
+        if preset is None:
+            return False
+
+        injector.preload_preset(preset, self.config_dir)
+        return True
+
+    def switch_preset(self, group_key: str, preset_name: str) -> bool:
+        """Switch the running injection to another preset, without restarting it.
+
+        Presets that were injected or preloaded before are already compiled, and
+        switching to them takes effect immediately. Others are preloaded first.
+        Returns False if the group isn't being injected into.
+
+        Parameters
+        ----------
+        group_key
+            The unique key of the group
+        preset_name
+            The name of the preset
+        """
+        injector = self._get_running_injector(group_key)
+        if injector is None:
+            return False
+
+        if not injector.is_preloaded(preset_name):
+            self._load_xmodmap()
+            preset = self._load_preset(injector.group, preset_name)
+            if preset is None:
+                return False
+
+            injector.preload_preset(preset, self.config_dir)
+
+        injector.switch_preset(preset_name)
+        return True
+
+    def _get_running_injector(self, group_key: str) -> Optional[Injector]:
+        """The injector of the group, if its preset can be changed."""
+        injector = self.injectors.get(group_key)
+        if injector is None or injector.get_state() != InjectorState.RUNNING:
+            logger.debug('No running injection for "%s"', group_key)
+            return None
+
+        if any(job[1] == group_key for job in self._job_queue):
+            # the queued jobs would undo it
+            return None
+
+        if self.config_dir is None:
+            logger.error(
+                "Request to change a preset before a user told the service about "
+                "their session using set_config_dir",
+            )
+            return None
+
+        return injector
+
+    def start_injecting_many(self, presets: List[Tuple[str, str]]) -> Dict[str, bool]:
+        """Start injecting for multiple devices with a single call.
+
+        Returns if it succeeded for each group.
+
+        Parameters
+        ----------
+        presets
+            Pairs of group key and preset name
+        """
+        group_keys = [group_key for group_key, _ in presets]
+        # the devices only need to be checked once
+        self.refresh(*group_keys)
+        return {
+            group_key: self._run_steps(
+                self._start_injecting_steps(group_key, preset_name, refresh=False)
+            )
+            for group_key, preset_name in presets
+        }
+
+    def stop_injecting_many(self, group_keys: List[str]):
+        """Stop injecting for multiple devices with a single call."""
+        for group_key in group_keys:
+            self.stop_injecting(group_key)
+
+    def _start_injecting_steps(
+        self,
+        group_key: str,
+        preset_name: str,
+        refresh: bool = True,
+    ) -> JobSteps:
+        """The work of start_injecting, pausing after each slow part."""
         logger.info('Request to start injecting for "%s"', group_key)
 
-        self.refresh(group_key)
+        if refresh:
+            self.refresh(group_key)
+            yield
 
         if self.config_dir is None:
             logger.error(
@@ -463,6 +969,33 @@ class Daemon:
             logger.error('Could not find group "%s"', group_key)
             return False
 
+        self._load_xmodmap()
+
+        # reading and validating a large preset takes a while, and doesn't touch
+        # anything the main loop uses
+        preset = yield lambda: self._load_preset(group, preset_name)
+        if preset is None:
+            return False
+
+        return self._start_injector(group, preset)
+
+    @staticmethod
+    def _run_steps(steps: JobSteps) -> bool:
+        """Do all steps of a job at once and return if it succeeded."""
+        result = None
+        try:
+            while True:
+                blocking = steps.send(result)
+                result = blocking() if blocking is not None else None
+        except StopIteration as stop:
+            return stop.value
+
+    def _load_xmodmap(self):
+        """Read the keyboard layout of the users session."""
+        system_mapping.load_session_xmodmap(self.config_dir)
+
+    def _load_preset(self, group: _Group, preset_name: str) -> Optional[Preset]:
+        """Load and validate the preset of the group, None if it doesn't exist."""
         preset_path = PurePath(
             self.config_dir,
             "presets",
@@ -470,52 +1003,46 @@ class Daemon:
             f"{preset_name}.json",
         )
 
-        # Path to a dump of the xkb mappings, to provide more human
-        # readable keys in the correct keyboard layout to the service.
-        # The service cannot use `xmodmap -pke` because it's running via
-        # systemd.
-        xmodmap_path = os.path.join(self.config_dir, "xmodmap.json")
-        try:
-            with open(xmodmap_path, "r") as file:
-                # do this for each injection to make sure it is up to
-                # date when the system layout changes.
-                xmodmap = json.load(file)
-                logger.debug('Using keycodes from "%s"', xmodmap_path)
-
-                # this creates the system_mapping._xmodmap, which we need to do now
-                # otherwise it might be created later which will override the changes
-                # we do here.
-                # Do we really need to lazyload in the system_mapping?
-                # this kind of bug is stupid to track down
-                system_mapping.get_name(0)
-                system_mapping.update(xmodmap)
-                # the service now has process wide knowledge of xmodmap
-                # keys of the users session
-        except FileNotFoundError:
-            logger.error('Could not find "%s"', xmodmap_path)
-
         preset = Preset(preset_path)
 
         try:
             preset.load()
         except FileNotFoundError as error:
             logger.error(str(error))
-            return False
+            return None
+
+        return preset
 
-        for mapping in preset:
+    def _start_injector(self, group: _Group, preset: Preset) -> bool:
+        """Replace the injection of the group with a new one for the preset."""
+        hosted = global_config.get("injection_host", log_unknown=False)
+
+        # the host creates the uinputs of its injections itself
+        for mapping in preset if not hosted else []:
             # only create those uinputs that are required to avoid
             # confusing the system. Seems to be especially important with
             # gamepads, because some apps treat the first gamepad they found
             # as the only gamepad they'll ever care about.
             global_uinputs.prepare_single(mapping.target_uinput)
 
-        if self.injectors.get(group_key) is not None:
-            self.stop_injecting(group_key)
+        previous = self.injectors.get(group.key)
+        if previous is not None:
+            self.stop_injecting(group.key)
 
         try:
-            injector = Injector(group, preset)
+            if hosted:
+                injector = self._get_injection_host().create_injector(group, preset)
+            elif (host := self._take_from_injector_pool(preset)) is not None:
+                injector = host.create_injector(group, preset)
+            else:
+                # Only a new process inherits the sentinel of the previous injection
+                # to wait for it to release the devices. Those of the pool retry to
+                # grab them instead.
+                injector = Injector(group, preset, previous)
+
             injector.start()
             self.injectors[group.key] = injector
+            self._watch_injector(injector)
         except OSError:
             # I think this will never happen, probably leftover from
             # some earlier version
@@ -523,12 +1050,205 @@ class Daemon:
 
         return True
 
+    def _get_injection_host(self) -> InjectionHost:
+        """The process that runs the hosted injections, started if needed."""
+        if self._injection_host is None or not self._injection_host.is_alive():
+            self._injection_host = InjectionHost(self.config_dir)
+            self._injection_host.start()
+
+        self._injection_host.config_dir = self.config_dir
+        return self._injection_host
+
+    def _take_from_injector_pool(self, preset: Preset) -> Optional[InjectionHost]:
+        """Get an idle injector process that can inject the preset."""
+        if not global_config.get("injector_pool_size", log_unknown=False):
+            return None
+
+        self._fill_injector_pool_later()
+        targets = {mapping.target_uinput for mapping in preset}
+        for host in list(self._injector_pool):
+            if not host.is_alive():
+                self._injector_pool.remove(host)
+                continue
+
+            # it can only write into the uinputs that existed when it was forked.
+            # Others stay in the pool for presets that fit.
+            if targets <= host.uinputs:
+                self._injector_pool.remove(host)
+                return host
+
+        return None
+
+    def _fill_injector_pool_later(self):
+        """Start idle injector processes, one at a time while the main loop idles."""
+        if self._injector_pool_source is not None:
+            return
+
+        if not global_config.get("injector_pool_size", log_unknown=False):
+            # the pool is disabled
+            return
+
+        def fill() -> bool:
+            size = global_config.get("injector_pool_size", log_unknown=False) or 0
+            if len(self._injector_pool) >= size or self.config_dir is None:
+                self._injector_pool_source = None
+                return False
+
+            host = InjectionHost(self.config_dir, single=True)
+            host.start()
+            self._injector_pool.append(host)
+            return True
+
+        self._injector_pool_source = GLib.idle_add(fill)
+
+    def _clear_injector_pool(self):
+        if self._injector_pool_source is not None:
+            GLib.source_remove(self._injector_pool_source)
+            self._injector_pool_source = None
+
+        for host in self._injector_pool:
+            host.quit()
+
+        self._injector_pool = []
+
+    def queue_start_injecting(self, group_key: str, preset_name: str) -> str:
+        """Like start_injecting, but returns a job id without waiting.
+
+        The job_changed signal is emitted once the job runs and when it is done.
+        """
+        return self._submit_job(
+            group_key,
+            self._start_injecting_steps(group_key, preset_name),
+        )
+
+    def queue_stop_injecting(self, group_key: str) -> str:
+        """Like stop_injecting, but returns a job id without waiting."""
+
+        def stop() -> JobSteps:
+            yield
+            self.stop_injecting(group_key)
+            return True
+
+        return self._submit_job(group_key, stop())
+
+    def get_job_state(self, job_id: str) -> JobState:
+        """The state of one of the recent jobs."""
+        return self._job_states.get(job_id, JobState.UNKNOWN)
+
+    def _submit_job(self, group_key: str, steps: JobSteps) -> str:
+        """Queue the job, its steps are done once the main loop is idle."""
+        job_id = str(next(self._job_ids))
+        self._set_job_state(job_id, group_key, JobState.QUEUED)
+        self._job_queue.append((job_id, group_key, steps))
+
+        if self._job_source is None and self._waiting_job is None:
+            self._job_source = GLib.idle_add(self._process_job_step)
+
+        return job_id
+
+    def _process_job_step(self):
+        """Do the next step of the oldest job.
+
+        Jobs are done one after the other, and other requests are handled between
+        their steps and while their blocking functions run.
+        """
+        job_id, group_key, steps = self._job_queue[0]
+        if self._job_states.get(job_id) == JobState.QUEUED:
+            self._set_job_state(job_id, group_key, JobState.RUNNING)
+
+        result, error = self._job_result
+        self._job_result = (None, None)
+
+        try:
+            if error is not None:
+                blocking = steps.throw(error)
+            else:
+                blocking = steps.send(result)
+
+            if blocking is not None:
+                # continued by _resume_job once it is done
+                self._job_source = None
+                self._run_blocking(job_id, blocking)
+                return False
+
+            # continue with the next step
+            return True
+        except StopIteration as stop:
+            success = stop.value
+        except Exception as error:
+            logger.error('Job %s for "%s" failed: %s', job_id, group_key, error)
+            success = False
+
+        self._job_queue.popleft()
+        state = JobState.DONE if success else JobState.FAILED
+        self._set_job_state(job_id, group_key, state)
+
+        if len(self._job_queue) == 0:
+            self._job_source = None
+            return False
+
+        return True
+
+    def _run_blocking(self, job_id: str, blocking: Callable[[], Any]):
+        """Call the function of the job in a thread, and resume the job afterwards."""
+        self._waiting_job = job_id
+
+        def run():
+            try:
+                result = (blocking(), None)
+            except Exception as error:
+                result = (None, error)
+
+            GLib.idle_add(self._resume_job, job_id, result)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _resume_job(self, job_id: str, result: Tuple[Any, Optional[Exception]]):
+        """Continue the job with what its blocking function returned."""
+        if self._waiting_job != job_id:
+            # it was canceled in the meantime
+            return False
+
+        self._waiting_job = None
+        self._job_result = result
+        self._job_source = GLib.idle_add(self._process_job_step)
+        return False
+
+    def _cancel_jobs(self):
+        """Fail all jobs that are not done yet."""
+        if self._job_source is not None:
+            GLib.source_remove(self._job_source)
+            self._job_source = None
+
+        self._waiting_job = None
+        self._job_result = (None, None)
+
+        while len(self._job_queue) > 0:
+            job_id, group_key, steps = self._job_queue.popleft()
+            steps.close()
+            self._set_job_state(job_id, group_key, JobState.FAILED)
+
+    def _set_job_state(self, job_id: str, group_key: str, state: JobState):
+        self._job_states[job_id] = state
+        while len(self._job_states) > MAX_JOBS:
+            del self._job_states[next(iter(self._job_states))]
+
+        self.job_changed(job_id, group_key, state.value)
+
     def stop_all(self):
         """Stop all injections."""
         logger.info("Stopping all injections")
+        # queued jobs would start them again
+        self._cancel_jobs()
         for group_key in list(self.injectors.keys()):
             self.stop_injecting(group_key)
 
+        if self._injection_host is not None:
+            self._injection_host.quit()
+            self._injection_host = None
+
+        self._clear_injector_pool()
+
     def hello(self, out: str):
         """Used for tests."""
         logger.info('Received "%s" from client', out)
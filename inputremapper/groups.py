@@ -35,10 +35,14 @@ import enum
 import json
 import multiprocessing
 import os
+import queue
 import re
 import threading
+import time
 import traceback
-from typing import List, Optional
+from dataclasses import dataclass, asdict
+from hashlib import md5
+from typing import List, Optional, Dict, Iterable
 
 import evdev
 from evdev import InputDevice
@@ -56,9 +60,14 @@ from evdev.ecodes import (
     REL_WHEEL,
 )
 
-from inputremapper.configs.paths import get_preset_path
+from inputremapper.configs.paths import get_preset_path, mkdir
 from inputremapper.logger import logger
-from inputremapper.utils import get_device_hash
+from inputremapper.utils import (
+    get_device_hash,
+    get_device_identity,
+    get_device_capabilities,
+    forget_device,
+)
 
 TABLET_KEYS = [
     evdev.ecodes.BTN_STYLUS,
@@ -194,6 +203,32 @@ def classify(device) -> DeviceType:
     return DeviceType.UNKNOWN
 
 
+# the device cache of the service, see _Groups.use_cache
+DEVICE_CACHE_PATH = "/var/cache/input-remapper/devices.json"
+
+# everything that the _DeviceInfo is derived from
+SYSFS_ATTRIBUTES = [
+    "name",
+    "phys",
+    "uniq",
+    "properties",
+    "id/bustype",
+    "id/vendor",
+    "id/product",
+    "id/version",
+    *[
+        f"capabilities/{type_}"
+        for type_ in ["ev", "key", "rel", "abs", "msc", "led", "snd", "ff", "sw"]
+    ],
+]
+
+# how many devices are opened at the same time. Threads that hang on a device are
+# replaced, so that they don't keep other devices from being looked at.
+PROBE_THREADS = 8
+# seconds after which a device that doesn't respond is skipped, counted from when
+# it is opened
+PROBE_TIMEOUT = 2
+
 DENYLIST = [".*Yubico.*YubiKey.*", "Eee PC WMI hotkeys"]
 
 
@@ -327,6 +362,179 @@ class _Group:
         return f"<Group ({self.key}) at {hex(id(self))}>"
 
 
+@dataclass
+class _DeviceInfo:
+    """What is known about a single device node in /dev/input."""
+
+    path: str
+    name: str
+    type: DeviceType
+    # get_unique_key, the same for all nodes of a hardware device
+    key: str
+    hash: str
+    # False if input-remapper can't do anything with it
+    usable: bool
+    capabilities: Dict[int, List[int]]
+    # changes if the node is replaced by a different device under the same path
+    identity: Optional[str]
+    # the same as long as the same device is behind the path, even after reboots
+    fingerprint: Optional[str]
+
+    @classmethod
+    def loads(cls, serialized: Dict) -> _DeviceInfo:
+        info = cls(**serialized)
+        info.type = DeviceType(info.type)
+        # json only has string keys
+        info.capabilities = {
+            int(type_): codes for type_, codes in info.capabilities.items()
+        }
+        return info
+
+
+def _get_fingerprint(path: os.PathLike) -> Optional[str]:
+    """Identify the device via sysfs, which is much faster than opening it."""
+    base = os.path.join("/sys/class/input", os.path.basename(path), "device")
+    values = []
+    try:
+        for attribute in SYSFS_ATTRIBUTES:
+            with open(os.path.join(base, attribute), "r") as file:
+                values.append(file.read())
+    except OSError:
+        return None
+
+    return md5("\n".join(values).encode()).hexdigest()
+
+
+def _probe(path: os.PathLike) -> Optional[_DeviceInfo]:
+    """Open the device to find out what it is.
+
+    Returns None if it can't be accessed.
+    """
+    identity = get_device_identity(path)
+    fingerprint = _get_fingerprint(path)
+
+    try:
+        device = evdev.InputDevice(path)
+    except Exception as error:
+        # Observed exceptions in journalctl:
+        # - "SystemError: <built-in function ioctl_EVIOCGVERSION> returned NULL
+        # without setting an error"
+        # - "FileNotFoundError: [Errno 2] No such file or directory:
+        # '/dev/input/event12'"
+        logger.error(
+            'Failed to access path "%s": %s %s',
+            path,
+            error.__class__.__name__,
+            str(error),
+        )
+        return None
+
+    device_type = classify(device)
+    # https://www.kernel.org/doc/html/latest/input/event-codes.html
+    capabilities = get_device_capabilities(device)
+    info = _DeviceInfo(
+        path=path,
+        name=device.name,
+        type=device_type,
+        key=get_unique_key(device),
+        hash=get_device_hash(device),
+        usable=False,
+        capabilities=capabilities,
+        identity=identity,
+        fingerprint=fingerprint,
+    )
+
+    if device.name == "Power Button":
+        return info
+
+    if device_type == DeviceType.CAMERA:
+        return info
+
+    key_capa = capabilities.get(EV_KEY)
+
+    if key_capa is None and device_type != DeviceType.GAMEPAD:
+        # skip devices that don't provide buttons that can be mapped
+        logger.debug('"%s" has no useful capabilities', device.name)
+        return info
+
+    if is_denylisted(device):
+        logger.debug('"%s" is denylisted', device.name)
+        return info
+
+    logger.debug(
+        'Found %s "%s" at "%s", hash "%s", key "%s"',
+        device_type.value,
+        device.name,
+        path,
+        info.hash,
+        info.key,
+    )
+
+    info.usable = True
+    return info
+
+
+def _probe_worker(
+    paths: queue.Queue,
+    started: Dict[os.PathLike, float],
+    results: queue.Queue,
+):
+    """Probe paths from the queue until it is empty."""
+    # evdev needs asyncio to work
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        while True:
+            try:
+                path = paths.get_nowait()
+            except queue.Empty:
+                return
+
+            started[path] = time.monotonic()
+            results.put((path, _probe(path)))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()  # avoid resource allocation warnings
+
+
+def _group_devices(devices: Iterable[_DeviceInfo]) -> List[_Group]:
+    """Group the devices by the hardware they belong to."""
+    # group them together by usb device because there could be stuff like
+    # "Logitech USB Keyboard" and "Logitech USB Keyboard Consumer Control"
+    grouped: Dict[str, List[_DeviceInfo]] = {}
+    for info in devices:
+        if info.usable:
+            grouped.setdefault(info.key, []).append(info)
+
+    # now write down all the paths of that group
+    result = []
+    used_keys = set()
+    for group in grouped.values():
+        names = [info.name for info in group]
+
+        # generate a human readable key
+        shortest_name = sorted(names, key=len)[0]
+        key = shortest_name
+        i = 2
+        while key in used_keys:
+            key = f"{shortest_name} {i}"
+            i += 1
+        used_keys.add(key)
+
+        result.append(
+            _Group(
+                key=key,
+                paths=[info.path for info in group],
+                names=names,
+                types=sorted(
+                    {info.type for info in group if info.type != DeviceType.UNKNOWN}
+                ),
+            )
+        )
+
+    return result
+
+
 class _FindGroups(threading.Thread):
     """Thread to get the devices that can be worked with.
 
@@ -335,121 +543,101 @@ class _FindGroups(threading.Thread):
     slowing down the initialization.
     """
 
-    def __init__(self, pipe: multiprocessing.Pipe):
+    def __init__(
+        self,
+        pipe: multiprocessing.Pipe,
+        paths: Optional[List[os.PathLike]] = None,
+    ):
         """Construct the process.
 
         Parameters
         ----------
         pipe
             used to communicate the result
+        paths
+            the devices to look at, all of /dev/input by default
         """
         self.pipe = pipe
+        self.paths = paths
         super().__init__()
 
     def run(self):
-        """Do what get_groups describes."""
-        # evdev needs asyncio to work
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
+        """Send the _DeviceInfo of each accessible device through the pipe."""
         logger.debug("Discovering device paths")
 
-        # group them together by usb device because there could be stuff like
-        # "Logitech USB Keyboard" and "Logitech USB Keyboard Consumer Control"
-        grouped = {}
-        for path in evdev.list_devices():
+        paths = self.paths if self.paths is not None else evdev.list_devices()
+
+        # Some devices hang in ioctls for a while, which shouldn't delay all the
+        # other devices. Daemon threads are used, because threads that are stuck
+        # on a device would otherwise keep the process from exiting.
+        pending: queue.Queue = queue.Queue()
+        for path in paths:
+            pending.put(path)
+
+        started: Dict[os.PathLike, float] = {}
+        results: queue.Queue = queue.Queue()
+
+        def start_worker():
+            threading.Thread(
+                target=_probe_worker,
+                args=(pending, started, results),
+                daemon=True,
+            ).start()
+
+        for _ in range(min(PROBE_THREADS, len(paths))):
+            start_worker()
+
+        infos = {}
+        remaining = set(paths)
+        while len(remaining) > 0:
+            deadlines = [
+                started[path] + PROBE_TIMEOUT for path in remaining if path in started
+            ]
+            timeout = min(deadlines) - time.monotonic() if deadlines else PROBE_TIMEOUT
             try:
-                device = evdev.InputDevice(path)
-            except Exception as error:
-                # Observed exceptions in journalctl:
-                # - "SystemError: <built-in function ioctl_EVIOCGVERSION> returned NULL
-                # without setting an error"
-                # - "FileNotFoundError: [Errno 2] No such file or directory:
-                # '/dev/input/event12'"
-                logger.error(
-                    'Failed to access path "%s": %s %s',
-                    path,
-                    error.__class__.__name__,
-                    str(error),
-                )
-                continue
-
-            if device.name == "Power Button":
-                continue
-
-            device_type = classify(device)
-
-            if device_type == DeviceType.CAMERA:
-                continue
-
-            # https://www.kernel.org/doc/html/latest/input/event-codes.html
-            capabilities = device.capabilities(absinfo=False)
-
-            key_capa = capabilities.get(EV_KEY)
-
-            if key_capa is None and device_type != DeviceType.GAMEPAD:
-                # skip devices that don't provide buttons that can be mapped
-                logger.debug('"%s" has no useful capabilities', device.name)
-                continue
-
-            if is_denylisted(device):
-                logger.debug('"%s" is denylisted', device.name)
-                continue
-
-            key = get_unique_key(device)
-            if grouped.get(key) is None:
-                grouped[key] = []
-
-            logger.debug(
-                'Found %s "%s" at "%s", hash "%s", key "%s"',
-                device_type.value,
-                device.name,
-                path,
-                get_device_hash(device),
-                key,
-            )
-
-            grouped[key].append((device.name, path, device_type))
-
-        # now write down all the paths of that group
-        result = []
-        used_keys = set()
-        for group in grouped.values():
-            names = [entry[0] for entry in group]
-            devs = [entry[1] for entry in group]
-
-            # generate a human readable key
-            shortest_name = sorted(names, key=len)[0]
-            key = shortest_name
-            i = 2
-            while key in used_keys:
-                key = f"{shortest_name} {i}"
-                i += 1
-            used_keys.add(key)
-
-            group = _Group(
-                key=key,
-                paths=devs,
-                names=names,
-                types=sorted(
-                    list({item[2] for item in group if item[2] != DeviceType.UNKNOWN})
-                ),
-            )
-
-            result.append(group.dumps())
-
+                path, info = results.get(timeout=max(timeout, 0))
+                if path in remaining:
+                    remaining.remove(path)
+                    if info is not None:
+                        infos[path] = info
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for path in list(remaining):
+                if path in started and now - started[path] > PROBE_TIMEOUT:
+                    logger.error('"%s" did not respond in time, skipping it', path)
+                    remaining.remove(path)
+                    # the thread is stuck, use a different one for the other paths
+                    start_worker()
+
+        # keep the order of the paths
+        result = [asdict(infos[path]) for path in paths if path in infos]
         self.pipe.send(json.dumps(result))
-        loop.close()  # avoid resource allocation warnings
         # now that everything is sent via the pipe, the InputDevice
-        # destructors can go on and take ages to complete in the thread
+        # destructors can go on and take ages to complete in the threads
         # without blocking anything
 
 
 class _Groups:
-    """Contains and manages all groups."""
+    """Contains and manages all groups.
+
+    Remembers what it found out about each device node, so that update() only needs
+    to look at nodes that are new or were replaced.
+    """
 
     def __init__(self):
         self._groups: List[_Group] = None
+        # None if the groups didn't come from looking at the devices
+        self._devices: Optional[Dict[str, _DeviceInfo]] = None
+        self._by_key: Dict[str, _Group] = {}
+        self._by_path: Dict[str, _Group] = {}
+        # the identities of nodes that couldn't be looked at, by path. They are only
+        # tried again by update() after a different device appeared at the path
+        self._failed: Dict[str, Optional[str]] = {}
+        self._cache_path: Optional[str] = None
+        # what the cache file contained, by path
+        self._cached: Dict[str, _DeviceInfo] = {}
 
     def __getattribute__(self, key: str):
         """To lazy load group info only when needed.
@@ -463,17 +651,92 @@ class _Groups:
 
         return object.__getattribute__(self, key)
 
-    def refresh(self):
-        """Look for devices and group them together.
+    def _set_groups(self, new_groups: List[_Group]):
+        self._groups = new_groups
+        # lookup tables for find. The first group wins, like in the list
+        self._by_key = {group.key: group for group in reversed(new_groups)}
+        self._by_path = {
+            path: group for group in reversed(new_groups) for path in group.paths
+        }
 
-        Since this needs to do some stuff with /dev and spawn processes the
-        result is cached. Use refresh_groups if you need up to date
-        devices.
+    def use_cache(self, path: str):
+        """Remember what is known about the devices in this file.
+
+        Devices that are still the same according to sysfs don't need to be opened
+        again, even after a reboot.
         """
-        pipe = multiprocessing.Pipe()
-        _FindGroups(pipe[1]).start()
-        # block until groups are available
-        self.loads(pipe[0].recv())
+        self._cache_path = path
+        self._cached = {}
+        try:
+            with open(path, "r") as file:
+                for info in json.load(file):
+                    info = _DeviceInfo.loads(info)
+                    self._cached[info.path] = info
+        except FileNotFoundError:
+            pass
+        except Exception as error:
+            logger.error('Failed to load the device cache "%s": %s', path, error)
+            self._cached = {}
+
+    def _save_cache(self):
+        if self._cache_path is None:
+            return
+
+        cache = {path: info for path, info in self._devices.items() if info.fingerprint}
+        if cache == self._cached:
+            return
+
+        logger.debug('Writing device cache "%s"', self._cache_path)
+        try:
+            mkdir(os.path.dirname(self._cache_path), log=False)
+            # write it completely before replacing the old file
+            temp_path = f"{self._cache_path}.tmp"
+            with open(temp_path, "w") as file:
+                json.dump([asdict(info) for info in cache.values()], file)
+            os.replace(temp_path, self._cache_path)
+            self._cached = cache
+        except OSError as error:
+            # for example if the service doesn't run as root, don't try it again on
+            # each device change
+            logger.warning("Not using the device cache, failed to write it: %s", error)
+            self._cache_path = None
+
+    def _probe(self, paths: Optional[List[os.PathLike]] = None) -> List[_DeviceInfo]:
+        """Look at the devices in a separate thread, all of them by default."""
+        if paths is None:
+            paths = evdev.list_devices()
+
+        devices = []
+        unknown_paths = []
+        for path in paths:
+            cached = self._cached.get(path)
+            fingerprint = _get_fingerprint(path) if cached else None
+            if fingerprint is not None and cached.fingerprint == fingerprint:
+                cached.identity = get_device_identity(path)
+                devices.append(cached)
+            else:
+                unknown_paths.append(path)
+
+        if len(unknown_paths) > 0:
+            pipe = multiprocessing.Pipe()
+            _FindGroups(pipe[1], unknown_paths).start()
+            # block until the devices are available
+            found = [_DeviceInfo.loads(info) for info in json.loads(pipe[0].recv())]
+            devices.extend(found)
+
+            found_paths = {info.path for info in found}
+            for path in unknown_paths:
+                if path in found_paths:
+                    self._failed.pop(path, None)
+                else:
+                    self._failed[path] = get_device_identity(path)
+
+        return devices
+
+    def _set_devices(self, devices: Dict[str, _DeviceInfo]):
+        self._devices = devices
+        self._set_groups(_group_devices(devices.values()))
+        self._save_cache()
 
         if len(self._groups) == 0:
             logger.debug("Did not find any input device")
@@ -481,6 +744,58 @@ class _Groups:
             keys = [f'"{group.key}"' for group in self._groups]
             logger.info("Found %s", ", ".join(keys))
 
+    def refresh(self):
+        """Look for devices and group them together.
+
+        Since this needs to do some stuff with /dev and spawn processes the
+        result is cached. Use refresh_groups if you need up to date
+        devices.
+        """
+        paths = evdev.list_devices()
+        devices = {info.path: info for info in self._probe(paths)}
+        # keep the order of list_devices
+        self._set_devices({path: devices[path] for path in paths if path in devices})
+
+    def update(self):
+        """Only look at devices that were added or replaced since the last time.
+
+        Much faster than refresh if many devices are connected, because the
+        other devices don't have to be opened again.
+        """
+        if self._devices is None:
+            self.refresh()
+            return
+
+        paths = evdev.list_devices()
+        devices = {}
+        new_paths = []
+        for path in paths:
+            identity = get_device_identity(path)
+            known = self._devices.get(path)
+            if known is not None and known.identity == identity:
+                devices[path] = known
+            elif path in self._failed and self._failed[path] == identity:
+                # it didn't work last time, and it is still the same node
+                continue
+            else:
+                new_paths.append(path)
+
+        # forget about failed nodes that are gone
+        present = set(paths)
+        for path in self._devices.keys() - present:
+            forget_device(path)
+        self._failed = {
+            path: identity for path, identity in self._failed.items() if path in present
+        }
+
+        if len(new_paths) == 0 and len(devices) == len(self._devices):
+            return
+
+        logger.debug("Devices changed, looking at %s", new_paths)
+        devices.update({info.path: info for info in self._probe(new_paths)})
+        # keep the order of list_devices, like refresh does
+        self._set_devices({path: devices[path] for path in paths if path in devices})
+
     def filter(self, include_inputremapper: bool = False) -> List[_Group]:
         """Filter groups."""
         result = []
@@ -496,7 +811,8 @@ class _Groups:
     def set_groups(self, new_groups: List[_Group]):
         """Overwrite all groups."""
         logger.debug("Overwriting groups with %s", new_groups)
-        self._groups = new_groups
+        self._set_groups(new_groups)
+        self._devices = None
 
     def list_group_names(self) -> List[str]:
         """Return a list of all 'name' properties of the groups."""
@@ -518,7 +834,8 @@ class _Groups:
 
     def loads(self, dump: str):
         """Load a serialized representation created via dumps."""
-        self._groups = [_Group.loads(group) for group in json.loads(dump)]
+        self._set_groups([_Group.loads(group) for group in json.loads(dump)])
+        self._devices = None
 
     def find(
         self,
@@ -539,7 +856,13 @@ class _Groups:
         path
             "/dev/input/event3"
         """
-        for group in self._groups:
+        candidates = self._groups
+        if key:
+            candidates = [self._by_key[key]] if key in self._by_key else []
+        elif path:
+            candidates = [self._by_path[path]] if path in self._by_path else []
+
+        for group in candidates:
             if not include_inputremapper and group.name.startswith("input-remapper"):
                 continue
 
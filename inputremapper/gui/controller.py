@@ -641,12 +641,7 @@ class Controller:
             self.show_injector_result,
         )
         self.show_status(CTX_APPLY, _("Starting injection..."))
-        if not self.data_manager.start_injecting():
-            self.message_broker.unsubscribe(self.show_injector_result)
-            self.show_status(
-                CTX_APPLY,
-                _("Failed to apply preset %s") % self.data_manager.active_preset.name,
-            )
+        self.data_manager.start_injecting()
 
     def show_injector_result(self, msg: InjectorStateMessage):
         """Show if the injection was successfully started."""
@@ -21,7 +21,7 @@ import glob
 import os
 import re
 import time
-from typing import Optional, List, Tuple, Set
+from typing import Optional, List, Tuple, Set, Callable, Dict
 
 import gi
 from gi.repository import GLib
@@ -31,7 +31,7 @@ from inputremapper.configs.mapping import UIMapping, MappingData
 from inputremapper.configs.paths import get_preset_path, mkdir, split_all
 from inputremapper.configs.preset import Preset
 from inputremapper.configs.system_mapping import SystemMapping
-from inputremapper.daemon import DaemonProxy
+from inputremapper.daemon import DaemonProxy, JobState
 from inputremapper.configs.input_config import InputCombination, InputConfig
 from inputremapper.exceptions import DataManagementError
 from inputremapper.gui.gettext import _
@@ -90,6 +90,13 @@ class DataManager:
         self._active_mapping: Optional[UIMapping] = None
         self._active_input_config: Optional[InputConfig] = None
 
+        # callbacks that wait for the active group to reach one of the states
+        self._injector_state_callbacks: List[Tuple[Set[InjectorState], Callable]] = []
+        self._daemon.injector_state_changed.connect(self._on_injector_state_changed)
+        # callbacks that wait for jobs of the daemon to be done
+        self._job_callbacks: Dict[str, Callable[[bool], None]] = {}
+        self._daemon.job_changed.connect(self._on_job_changed)
+
     def publish_group(self):
         """Send active group to the MessageBroker.
 
@@ -542,23 +549,41 @@ class DataManager:
         Will send "injector_state" message once the injector has stopped."""
         if not self.active_group:
             raise DataManagementError("Cannot stop injection: Group is not set")
-        self._daemon.stop_injecting(self.active_group.key)
-        self.do_when_injector_state(
-            {InjectorState.STOPPED}, self.publish_injector_state
+
+        job_id = self._daemon.queue_stop_injecting(self.active_group.key)
+        self._do_when_job_done(
+            job_id,
+            lambda _: self.do_when_injector_state(
+                {InjectorState.STOPPED}, self.publish_injector_state
+            ),
         )
 
-    def start_injecting(self) -> bool:
+    def start_injecting(self) -> None:
         """Start injecting the active preset for the active group.
 
-        returns if the startup was successfully initialized.
-        Will send "injector_state" message once the startup is complete.
+        Doesn't wait for the daemon. Will send "injector_state" message once the
+        startup is complete, with the FAILED state if it couldn't be started.
+        If the group is already being injected into, the preset is swapped within
+        the running injection instead.
         """
         if not self.active_preset or not self.active_group:
             raise DataManagementError("Cannot start injection: Preset is not set")
 
-        self._daemon.set_config_dir(self._config.get_dir())
+        self.refresh_service_config_path()
         assert self.active_preset.name is not None
-        if self._daemon.start_injecting(self.active_group.key, self.active_preset.name):
+        if self._daemon.reload_preset(self.active_group.key, self.active_preset.name):
+            self.publish_injector_state()
+            return
+
+        job_id = self._daemon.queue_start_injecting(
+            self.active_group.key, self.active_preset.name
+        )
+
+        def on_job_done(success: bool):
+            if not success:
+                self.message_broker.publish(InjectorStateMessage(InjectorState.FAILED))
+                return
+
             self.do_when_injector_state(
                 {
                     InjectorState.RUNNING,
@@ -568,8 +593,8 @@ class DataManager:
                 },
                 self.publish_injector_state,
             )
-            return True
-        return False
+
+        self._do_when_job_done(job_id, on_job_done)
 
     def get_state(self) -> InjectorState:
         """The state of the injector."""
@@ -579,23 +604,50 @@ class DataManager:
 
     def refresh_service_config_path(self):
         """Tell the service to refresh its config path."""
+        # the service can't find out which symbols need shift or AltGr itself
+        self._system_mapping.save_levels()
         self._daemon.set_config_dir(self._config.get_dir())
 
     def do_when_injector_state(self, states: Set[InjectorState], callback):
         """Run callback once the injector state is one of states."""
-        start = time.time()
+        # the state might have been announced before anyone was waiting for it
+        if self.get_state() in states:
+            callback()
+            return
 
-        def do():
-            if time.time() - start > 3:
-                # something went wrong, there should have been a state long ago.
-                # the timeout prevents tons of GLib.timeouts to run forever, especially
-                # after spamming the "Stop" button.
+        entry = (states, callback)
+        self._injector_state_callbacks.append(entry)
+
+        def timeout():
+            if entry in self._injector_state_callbacks:
+                # something went wrong, there should have been a state long ago
                 logger.error("Timed out while waiting for injector state %s", states)
-                return False
+                self._injector_state_callbacks.remove(entry)
 
-            if self.get_state() in states:
-                callback()
-                return False
-            return True
+            return False
 
-        GLib.timeout_add(100, do)
+        GLib.timeout_add(3000, timeout)
+
+    def _do_when_job_done(self, job_id: str, callback: Callable[[bool], None]):
+        """Run callback once the job of the daemon is done, with its success."""
+        self._job_callbacks[job_id] = callback
+
+    def _on_job_changed(self, job_id: str, _group_key: str, state: str):
+        """The daemon announced a new state of a job."""
+        if state not in (JobState.DONE, JobState.FAILED):
+            return
+
+        callback = self._job_callbacks.pop(job_id, None)
+        if callback is not None:
+            callback(state == JobState.DONE)
+
+    def _on_injector_state_changed(self, group_key: str, state: str):
+        """The daemon announced a new state of an injector."""
+        if not self.active_group or group_key != self.active_group.key:
+            return
+
+        for entry in list(self._injector_state_callbacks):
+            states, callback = entry
+            if InjectorState(state) in states:
+                self._injector_state_callbacks.remove(entry)
+                callback()
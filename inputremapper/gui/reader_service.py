@@ -50,13 +50,15 @@ from typing import Set, List
 
 import evdev
 from evdev.ecodes import EV_KEY, EV_ABS, EV_REL, REL_HWHEEL, REL_WHEEL
-from inputremapper.utils import get_device_hash
+from inputremapper.utils import get_device_hash, get_device_capabilities
 
 from inputremapper.configs.input_config import InputCombination, InputConfig
 from inputremapper.configs.mapping import Mapping
 from inputremapper.groups import _Groups, _Group
+from inputremapper.injection.event_listeners import EventListeners
 from inputremapper.injection.event_reader import EventReader
 from inputremapper.injection.mapping_handlers.abs_to_btn_handler import AbsToBtnHandler
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.injection.mapping_handlers.mapping_handler import (
     NotifyCallback,
     InputEventHandler,
@@ -236,7 +238,7 @@ class ReaderService:
                 logger.error('Could not find "%s"', path)
                 return None
 
-            capabilities = device.capabilities(absinfo=False)
+            capabilities = get_device_capabilities(device)
             if (
                 EV_KEY in capabilities
                 or EV_ABS in capabilities
@@ -267,7 +269,7 @@ class ReaderService:
         # create a context for each source
         for device in sources:
             device_hash = get_device_hash(device)
-            capabilities = device.capabilities(absinfo=False)
+            capabilities = get_device_capabilities(device)
 
             for ev_code in capabilities.get(EV_KEY) or ():
                 input_config = InputConfig(
@@ -285,10 +287,12 @@ class ReaderService:
                     analog_threshold=30,
                     origin_hash=device_hash,
                 )
-                mapping = Mapping(
-                    input_combination=InputCombination([input_config]),
-                    target_uinput="keyboard",
-                    output_symbol="KEY_A",
+                mapping = MappingSpec.from_mapping(
+                    Mapping(
+                        input_combination=InputCombination([input_config]),
+                        target_uinput="keyboard",
+                        output_symbol="KEY_A",
+                    )
                 )
                 handler: MappingHandler = AbsToBtnHandler(
                     InputCombination([input_config]), mapping
@@ -298,10 +302,12 @@ class ReaderService:
 
                 # negative direction
                 input_config = input_config.modify(analog_threshold=-30)
-                mapping = Mapping(
-                    input_combination=InputCombination([input_config]),
-                    target_uinput="keyboard",
-                    output_symbol="KEY_A",
+                mapping = MappingSpec.from_mapping(
+                    Mapping(
+                        input_combination=InputCombination([input_config]),
+                        target_uinput="keyboard",
+                        output_symbol="KEY_A",
+                    )
                 )
                 handler = AbsToBtnHandler(InputCombination([input_config]), mapping)
                 handler.set_sub_handler(ForwardToUIHandler(self._results_pipe))
@@ -315,12 +321,14 @@ class ReaderService:
                     analog_threshold=self.rel_xy_speed[ev_code],
                     origin_hash=device_hash,
                 )
-                mapping = Mapping(
-                    input_combination=InputCombination([input_config]),
-                    target_uinput="keyboard",
-                    output_symbol="KEY_A",
-                    release_timeout=0.3,
-                    force_release_timeout=True,
+                mapping = MappingSpec.from_mapping(
+                    Mapping(
+                        input_combination=InputCombination([input_config]),
+                        target_uinput="keyboard",
+                        output_symbol="KEY_A",
+                        release_timeout=0.3,
+                        force_release_timeout=True,
+                    )
                 )
                 handler = RelToBtnHandler(InputCombination([input_config]), mapping)
                 handler.set_sub_handler(ForwardToUIHandler(self._results_pipe))
@@ -330,12 +338,14 @@ class ReaderService:
                 input_config = input_config.modify(
                     analog_threshold=-self.rel_xy_speed[ev_code]
                 )
-                mapping = Mapping(
-                    input_combination=InputCombination([input_config]),
-                    target_uinput="keyboard",
-                    output_symbol="KEY_A",
-                    release_timeout=0.3,
-                    force_release_timeout=True,
+                mapping = MappingSpec.from_mapping(
+                    Mapping(
+                        input_combination=InputCombination([input_config]),
+                        target_uinput="keyboard",
+                        output_symbol="KEY_A",
+                        release_timeout=0.3,
+                        force_release_timeout=True,
+                    )
                 )
                 handler = RelToBtnHandler(InputCombination([input_config]), mapping)
                 handler.set_sub_handler(ForwardToUIHandler(self._results_pipe))
@@ -354,7 +364,7 @@ class ContextDummy:
     """Used for the reader so that no events are actually written to any uinput."""
 
     def __init__(self):
-        self.listeners = set()
+        self.listeners = EventListeners()
         self._notify_callbacks = defaultdict(list)
         self.forward_dummy = ForwardDummy()
 
@@ -63,7 +63,7 @@ from inputremapper.gui.utils import (
     gtk_iteration,
 )
 from inputremapper.injection.injector import InjectorStateMessage
-from inputremapper.logger import logger, COMMIT_HASH, VERSION, EVDEV_VERSION
+from inputremapper.logger import logger, COMMIT_HASH, VERSION, get_evdev_version
 from inputremapper.gui.gettext import _
 
 # https://cjenkins.wordpress.com/2012/05/08/use-gtksourceview-widget-in-glade/
@@ -235,10 +235,11 @@ class UserInterface:
         # set_position needs to be done once initially, otherwise the
         # dialog is not centered when it is opened for the first time
         self.about.set_position(Gtk.WindowPosition.CENTER_ON_PARENT)
+        evdev_version = get_evdev_version()
         self.get("version-label").set_text(
             f"input-remapper {VERSION} {COMMIT_HASH[:7]}"
-            f"\npython-evdev {EVDEV_VERSION}"
-            if EVDEV_VERSION
+            f"\npython-evdev {evdev_version}"
+            if evdev_version
             else ""
         )
 
@@ -23,23 +23,28 @@
 from __future__ import annotations
 
 from collections import defaultdict
-from typing import List, Dict, Set, Hashable
+from typing import List, Dict, Hashable, Optional, Tuple
 
 import evdev
 
 from inputremapper.configs.input_config import DeviceHash
 from inputremapper.input_event import InputEvent
 from inputremapper.configs.preset import Preset
-from inputremapper.injection.mapping_handlers.mapping_handler import (
-    EventListener,
-    NotifyCallback,
-)
+from inputremapper.injection.event_listeners import EventListeners
+from inputremapper.injection.macros.macro import Macro
+from inputremapper.injection.macros.profiler import MacroProfiler
+from inputremapper.injection.mapping_handlers.mapping_handler import NotifyCallback
 from inputremapper.injection.mapping_handlers.mapping_parser import (
-    parse_mappings,
+    parse_mapping_groups,
+    get_event_pipelines,
     EventPipelines,
+    MappingGroups,
 )
 from inputremapper.logger import logger
 
+# everything that is needed to handle the events of a preset
+Pipeline = Tuple[MappingGroups, EventPipelines, Dict[Hashable, List[NotifyCallback]]]
+
 
 class Context:
     """Stores injection-process wide information.
@@ -47,7 +52,9 @@ class Context:
     In some ways this is a wrapper for the preset that derives some
     information that is specifically important to the injection.
 
-    The information in the context does not change during the injection.
+    The information in the context does not change during the injection, unless
+    the preset is reloaded or switched. Other presets can be compiled in advance
+    with preload_preset, to switch to them without delay.
 
     One Context exists for each injection process, which is shared
     with all coroutines and used objects.
@@ -65,15 +72,23 @@ class Context:
     -------
     preset : Preset
         The preset holds all Mappings for the injection process
-    listeners : Set[EventListener]
-        A set of callbacks which receive all events
+    listeners : EventListeners
+        Callbacks which receive events before the handlers, e.g. for if_single
     callbacks : Dict[Tuple[int, int], List[NotifyCallback]]
         All entry points to the event pipeline sorted by InputEvent.type_and_code
+    macro_profiler : Optional[MacroProfiler]
+        Collects runtime statistics of macros, if profiling is enabled
+    active_preset : Optional[str]
+        The name of the preset whose handlers are currently used
     """
 
-    listeners: Set[EventListener]
+    listeners: EventListeners
+    macro_profiler: Optional[MacroProfiler]
+    active_preset: Optional[str]
+    _preloaded: Dict[Optional[str], Pipeline]
     _notify_callbacks: Dict[Hashable, List[NotifyCallback]]
     _handlers: EventPipelines
+    _mapping_groups: MappingGroups
     _forward_devices: Dict[DeviceHash, evdev.UInput]
     _source_devices: Dict[DeviceHash, evdev.InputDevice]
 
@@ -82,6 +97,8 @@ class Context:
         preset: Preset,
         source_devices: Dict[DeviceHash, evdev.InputDevice],
         forward_devices: Dict[DeviceHash, evdev.UInput],
+        macro_profiler: Optional[MacroProfiler] = None,
+        macros: Optional[Dict[int, Macro]] = None,
     ):
         if len(forward_devices) == 0:
             logger.warning("Not forward_devices set")
@@ -89,13 +106,103 @@ class Context:
         if len(source_devices) == 0:
             logger.warning("Not source_devices set")
 
-        self.listeners = set()
+        self.listeners = EventListeners()
+        self.macro_profiler = macro_profiler
         self._source_devices = source_devices
         self._forward_devices = forward_devices
-        self._notify_callbacks = defaultdict(list)
-        self._handlers = parse_mappings(preset, self)
+        self.active_preset = preset.name
+        self._preloaded = {}
+        (
+            self._mapping_groups,
+            self._handlers,
+            self._notify_callbacks,
+        ) = self._compile(preset, macros)
+
+    def update_preset(
+        self,
+        preset: Preset,
+        macros: Optional[Dict[int, Macro]] = None,
+    ) -> None:
+        """Use the mappings of the new preset.
+
+        Only mappings that changed, and those that share input events with them, get
+        new handlers. All others keep their handlers, and their state.
+        """
+        mapping_groups, handlers, notify_callbacks = self._compile(
+            preset,
+            macros,
+            previous=self._mapping_groups,
+        )
+
+        reused = 0
+        for key, previous_handlers in self._mapping_groups.items():
+            if key in mapping_groups:
+                reused += 1
+                continue
+
+            # release what they are holding down
+            for handler in previous_handlers:
+                handler.reset()
 
-        self._create_callbacks()
+        # events are handled with either the old or the new handlers, never a mix
+        self._mapping_groups = mapping_groups
+        self._handlers = handlers
+        self._notify_callbacks = notify_callbacks
+        self.active_preset = preset.name
+        # it replaced the active preset, an older compiled version is outdated
+        self._preloaded.pop(preset.name, None)
+        logger.debug(
+            "Reused the handlers of %d of %d mapping groups",
+            reused,
+            len(mapping_groups),
+        )
+
+    def preload_preset(
+        self,
+        preset: Preset,
+        macros: Optional[Dict[int, Macro]] = None,
+    ) -> None:
+        """Compile the handlers of the preset, to switch to it later."""
+        if preset.name == self.active_preset:
+            self.update_preset(preset, macros)
+            return
+
+        previous = self._preloaded.get(preset.name)
+        self._preloaded[preset.name] = self._compile(
+            preset,
+            macros,
+            previous=previous[0] if previous else None,
+        )
+
+    def switch_preset(self, name: Optional[str]) -> bool:
+        """Use the handlers of a preloaded preset.
+
+        The handlers of the preset that was active before are reset, and kept for
+        switching back to it. Returns False if the preset wasn't preloaded.
+        """
+        if name == self.active_preset:
+            return True
+
+        pipeline = self._preloaded.pop(name, None)
+        if pipeline is None:
+            logger.error('Cannot switch to "%s", it was not preloaded', name)
+            return False
+
+        # release what they are holding down
+        self.reset()
+        self._preloaded[self.active_preset] = (
+            self._mapping_groups,
+            self._handlers,
+            self._notify_callbacks,
+        )
+        (
+            self._mapping_groups,
+            self._handlers,
+            self._notify_callbacks,
+        ) = pipeline
+        logger.debug('Switched from "%s" to "%s"', self.active_preset, name)
+        self.active_preset = name
+        return True
 
     def reset(self) -> None:
         """Call the reset method for each handler in the context."""
@@ -103,15 +210,32 @@ class Context:
             for handler in handlers:
                 handler.reset()
 
-    def _create_callbacks(self) -> None:
-        """Add the notify method from all _handlers to self.callbacks."""
-        for input_config, handler_list in self._handlers.items():
+    def _compile(
+        self,
+        preset: Preset,
+        macros: Optional[Dict[int, Macro]] = None,
+        previous: Optional[MappingGroups] = None,
+    ) -> Pipeline:
+        """Create the handlers of the preset, reusing those found in previous."""
+        mapping_groups = parse_mapping_groups(preset, self, macros, previous)
+        handlers = get_event_pipelines(mapping_groups)
+        return mapping_groups, handlers, self._create_callbacks(handlers)
+
+    @staticmethod
+    def _create_callbacks(
+        handlers: EventPipelines,
+    ) -> Dict[Hashable, List[NotifyCallback]]:
+        """Get the notify methods of all handlers by input_match_hash."""
+        notify_callbacks = defaultdict(list)
+        for input_config, handler_list in handlers.items():
             input_match_hash = input_config.input_match_hash
             logger.debug("Adding NotifyCallback for %s", input_match_hash)
-            self._notify_callbacks[input_match_hash].extend(
+            notify_callbacks[input_match_hash].extend(
                 handler.notify for handler in handler_list
             )
 
+        return notify_callbacks
+
     def get_notify_callbacks(self, input_event: InputEvent) -> List[NotifyCallback]:
         input_match_hash = input_event.input_match_hash
         return self._notify_callbacks[input_match_hash]
@@ -122,3 +246,7 @@ class Context:
 
     def get_source(self, key: DeviceHash) -> evdev.InputDevice:
         return self._source_devices[key]
+
+    def set_source(self, key: DeviceHash, source: evdev.InputDevice) -> None:
+        """Replace the source, after it has been plugged in again."""
+        self._source_devices[key] = source
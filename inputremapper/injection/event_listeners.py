@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# input-remapper - GUI for device specific keyboard mappings
+# Copyright (C) 2023 sezanzeb <proxima@sezanzeb.de>
+#
+# This file is part of input-remapper.
+#
+# input-remapper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# input-remapper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Callbacks that observe events before they reach the mapping handlers."""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Protocol, Tuple, Iterator
+
+from inputremapper.input_event import InputEvent
+from inputremapper.logger import logger
+
+
+class EventListener(Protocol):
+    def __call__(self, event: InputEvent) -> None:
+        ...
+
+
+# type, code and value an event needs to have to be passed to the listener.
+# None matches anything.
+EventFilter = Tuple[Optional[int], Optional[int], Optional[int]]
+
+
+class EventListeners:
+    """Listeners indexed by the type of the events they want to receive.
+
+    Listeners are synchronous and called inline by the EventReader, before the
+    handlers are notified. They must not block, but can set an asyncio.Event or
+    similar to wake up a waiting macro.
+    """
+
+    _filters: Dict[EventListener, EventFilter]
+    _by_type: Dict[Optional[int], Tuple[Tuple[EventListener, EventFilter], ...]]
+
+    def __init__(self):
+        self._filters = {}
+        self._by_type = {}
+
+    def add(
+        self,
+        listener: EventListener,
+        type_: Optional[int] = None,
+        code: Optional[int] = None,
+        value: Optional[int] = None,
+    ) -> None:
+        """Call the listener for each event that matches type_, code and value."""
+        if listener in self._filters:
+            self.remove(listener)
+
+        event_filter = (type_, code, value)
+        self._filters[listener] = event_filter
+        # tuples are rebuilt on change, so that listeners can remove themselves
+        # while being notified without copying anything for each event.
+        self._by_type[type_] = (
+            *self._by_type.get(type_, ()),
+            (listener, event_filter),
+        )
+
+    def remove(self, listener: EventListener) -> None:
+        """Stop calling the listener."""
+        type_ = self._filters.pop(listener)[0]
+        remaining = tuple(
+            entry for entry in self._by_type[type_] if entry[0] is not listener
+        )
+        if remaining:
+            self._by_type[type_] = remaining
+        else:
+            del self._by_type[type_]
+
+    def notify(self, event: InputEvent) -> bool:
+        """Call all listeners that are interested in the event.
+
+        Returns True if at least one listener was called.
+        """
+        if not self._by_type:
+            return False
+
+        notified = False
+        for type_ in (event.type, None):
+            for listener, (_, code, value) in self._by_type.get(type_, ()):
+                if code is not None and code != event.code:
+                    continue
+
+                if value is not None and value != event.value:
+                    continue
+
+                notified = True
+                try:
+                    listener(event)
+                except Exception as exception:
+                    logger.error("Listener %s failed: %s", listener, exception)
+
+        return notified
+
+    def __contains__(self, listener: EventListener) -> bool:
+        return listener in self._filters
+
+    def __iter__(self) -> Iterator[EventListener]:
+        return iter(list(self._filters))
+
+    def __len__(self) -> int:
+        return len(self._filters)
@@ -22,22 +22,22 @@
 
 import asyncio
 import os
+import time
 import traceback
-from typing import AsyncIterator, Protocol, Set, List
+from typing import AsyncIterator, Protocol, List
 
 import evdev
 
 from inputremapper.utils import get_device_hash, DeviceHash
-from inputremapper.injection.mapping_handlers.mapping_handler import (
-    EventListener,
-    NotifyCallback,
-)
+from inputremapper.injection.event_listeners import EventListeners
+from inputremapper.injection.stats import current_stats
+from inputremapper.injection.mapping_handlers.mapping_handler import NotifyCallback
 from inputremapper.input_event import InputEvent
 from inputremapper.logger import logger
 
 
 class Context(Protocol):
-    listeners: Set[EventListener]
+    listeners: EventListeners
 
     def reset(self):
         ...
@@ -48,6 +48,9 @@ class Context(Protocol):
     def get_forward_uinput(self, origin_hash: DeviceHash) -> evdev.UInput:
         ...
 
+    def set_source(self, key: DeviceHash, source: evdev.InputDevice) -> None:
+        ...
+
 
 class EventReader:
     """Reads input events from a single device and distributes them.
@@ -58,8 +61,16 @@ class EventReader:
 
     Other devnodes may be present for the hardware device, in which case this
     needs to be created multiple times.
+
+    If the device is unplugged, it waits a moment for it to be plugged in again,
+    and then continues to read from it with the same context.
     """
 
+    # seconds to wait for an unplugged device to appear again
+    reattach_timeout = 2
+    # seconds between looking for it
+    reattach_interval = 0.05
+
     def __init__(
         self,
         context: Context,
@@ -77,6 +88,7 @@ class EventReader:
         self._source = source
         self.context = context
         self.stop_event = stop_event
+        self._stats = current_stats.get()
 
     def stop(self):
         """Stop the reader."""
@@ -100,6 +112,10 @@ class EventReader:
                 # usage because events_ready.set is called repeatedly forever,
                 # while read_loop will hang at self._source.read_one().
                 logger.error("fd broke, was the device unplugged?")
+                loop.remove_reader(self._source.fileno())
+                if not stop_task.done() and await self._reattach():
+                    loop.add_reader(self._source.fileno(), events_ready.set)
+                    continue
 
             if stop_task.done() or fd_broken:
                 for task in pending:
@@ -112,6 +128,59 @@ class EventReader:
             while event := self._source.read_one():
                 yield event
 
+    async def _reattach(self) -> bool:
+        """Wait for the unplugged device to appear again, and grab it.
+
+        Returns False if it didn't appear in time, or if the reader was stopped.
+        """
+        unplugged = self._source
+        logger.info("Waiting for %s to be plugged in again", unplugged.path)
+        start = time.time()
+
+        # only new device nodes can be the device
+        known_paths = set(evdev.list_devices()) - {unplugged.path}
+        while time.time() - start < self.reattach_timeout:
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), self.reattach_interval)
+                return False
+            except asyncio.TimeoutError:
+                pass
+
+            for path in set(evdev.list_devices()) - known_paths:
+                try:
+                    device = evdev.InputDevice(path)
+                    device_hash = get_device_hash(device)
+                except OSError as error:
+                    # it might not be ready yet
+                    logger.debug("Failed to open %s: %s", path, error)
+                    continue
+
+                if device_hash != self._device_hash:
+                    known_paths.add(path)
+                    device.close()
+                    continue
+
+                try:
+                    device.grab()
+                except OSError as error:
+                    logger.debug("Failed to grab %s: %s", path, error)
+                    device.close()
+                    continue
+
+                unplugged.close()
+                self._source = device
+                self.context.set_source(self._device_hash, device)
+                logger.info(
+                    "Reattached %s as %s after %.3fs",
+                    unplugged.path,
+                    path,
+                    time.time() - start,
+                )
+                return True
+
+        logger.info("%s was not plugged in again", unplugged.path)
+        return False
+
     def send_to_handlers(self, event: InputEvent) -> bool:
         """Send the event to the NotifyCallbacks.
 
@@ -128,7 +197,10 @@ class EventReader:
 
         if notify_callbacks:
             for notify_callback in notify_callbacks:
-                handled = notify_callback(event, source=self._source) | handled
+                if notify_callback(event, source=self._source):
+                    handler = getattr(notify_callback, "__self__", notify_callback)
+                    self._stats.events_handled[type(handler).__name__] += 1
+                    handled = True
 
         return handled
 
@@ -140,25 +212,23 @@ class EventReader:
         if event.type == evdev.ecodes.EV_SYN:
             return
 
-        for listener in self.context.listeners.copy():
-            # use a copy, since the listeners might remove themselves form the set
-
-            # fire and forget, run them in parallel and don't wait for them, since
-            # a listener might be blocking forever while waiting for more events.
-            asyncio.ensure_future(listener(event))
-
-            # Running macros have priority, give them a head-start for processing the
-            # event.  If if_single injects a modifier, this modifier should be active
-            # before the next handler injects an "a" or something, so that it is
-            # possible to capitalize it via if_single.
-            # 1. Event from keyboard arrives (e.g. an "a")
-            # 2. the listener for if_single is called
-            # 3. if_single decides runs then (e.g. injects shift_L)
-            # 4. The original event is forwarded (or whatever it is supposed to do)
-            # 5. Capitalized "A" is injected.
-            # So make sure to call the listeners before notifying the handlers.
-            for _ in range(5):
-                await asyncio.sleep(0)
+        # Listeners are called inline, they only wake up macros that are waiting
+        # for them.
+        if not self.context.listeners.notify(event):
+            return
+
+        # Running macros have priority, give them a head-start for processing the
+        # event.  If if_single injects a modifier, this modifier should be active
+        # before the next handler injects an "a" or something, so that it is
+        # possible to capitalize it via if_single.
+        # 1. Event from keyboard arrives (e.g. an "a")
+        # 2. the listener for if_single is called
+        # 3. if_single decides runs then (e.g. injects shift_L)
+        # 4. The original event is forwarded (or whatever it is supposed to do)
+        # 5. Capitalized "A" is injected.
+        # So make sure to call the listeners before notifying the handlers.
+        for _ in range(5):
+            await asyncio.sleep(0)
 
     def forward(self, event: InputEvent) -> None:
         """Forward an event, which injects it unmodified."""
@@ -168,6 +238,11 @@ class EventReader:
             logger.write(event, forward_to)
 
         forward_to.write(*event.event_tuple)
+        self._stats.events_forwarded += 1
+        if event.type == evdev.ecodes.EV_SYN:
+            self._stats.syn_reports += 1
+        else:
+            self._stats.uinput_writes += 1
 
     async def handle(self, event: InputEvent) -> None:
         if event.type == evdev.ecodes.EV_KEY and event.value == 2:
@@ -194,12 +269,16 @@ class EventReader:
             self._source.fd,
         )
 
+        events_read = self._stats.events_read
+        path = self._source.path
         async for event in self.read_loop():
+            events_read[path] += 1
             try:
                 await self.handle(
                     InputEvent.from_event(event, origin_hash=self._device_hash)
                 )
             except Exception as e:
+                self._stats.exceptions += 1
                 logger.error("Handling event %s failed: %s", event, e)
                 traceback.print_exception(e)
 
@@ -23,6 +23,7 @@ import evdev
 
 import inputremapper.exceptions
 import inputremapper.utils
+from inputremapper.injection.stats import current_stats
 from inputremapper.logger import logger
 
 MIN_ABS = -(2**15)  # -32768
@@ -181,6 +182,28 @@ class GlobalUInputs:
         logger.write(event, uinput)
         uinput.write(*event)
         uinput.syn()
+        stats = current_stats.get()
+        stats.uinput_writes += 1
+        stats.syn_reports += 1
+
+    def write_frame(self, events: List[Tuple[int, int, int]], target_uinput):
+        """Write multiple events to the target uinput, followed by a single syn."""
+        uinput = self.get_uinput(target_uinput)
+        if not uinput:
+            raise inputremapper.exceptions.UinputNotAvailable(target_uinput)
+
+        for event in events:
+            if not uinput.can_emit(event):
+                raise inputremapper.exceptions.EventNotHandled(event)
+
+        for event in events:
+            logger.write(event, uinput)
+            uinput.write(*event)
+
+        uinput.syn()
+        stats = current_stats.get()
+        stats.uinput_writes += len(events)
+        stats.syn_reports += 1
 
     def get_uinput(self, name: str) -> Optional[evdev.UInput]:
         """UInput with name
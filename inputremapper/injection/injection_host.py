@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+# input-remapper - GUI for device specific keyboard mappings
+# Copyright (C) 2023 sezanzeb <proxima@sezanzeb.de>
+#
+# This file is part of input-remapper.
+#
+# input-remapper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# input-remapper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Runs the injections of many groups within a single process.
+
+Each Injector is a fork of the service, which costs memory for every device that
+is being mapped. Set "injection_host" to true in the config.json to run all
+injections on the event loop of a single InjectionHost process instead.
+
+An InjectionHost that runs a single injection and then ends is an Injector process
+that can be started before it is needed. Set "injector_pool_size" in the
+config.json to keep that many of them ready, so that starting an injection doesn't
+need to wait for a new process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import enum
+import multiprocessing
+from multiprocessing.connection import Connection
+from multiprocessing.reduction import send_handle, recv_handle
+from typing import Dict, Tuple, Set
+
+from inputremapper.configs.preset import Preset
+from inputremapper.configs.system_mapping import system_mapping
+from inputremapper.groups import _Group
+from inputremapper.injection.global_uinputs import global_uinputs
+from inputremapper.injection.injector import Injector, InjectorState
+from inputremapper.logger import logger
+
+
+# messages sent to the host process
+class HostCommand(str, enum.Enum):
+    INJECT = "INJECT"
+    QUIT = "QUIT"
+
+
+class HostedInjector(Injector):
+    """Controls an injection that runs within the InjectionHost.
+
+    To the service it behaves like an Injector that runs in its own process. The
+    host receives the ends of its pipes, so states and statistics are exchanged
+    with the injection like they are with an Injector process.
+    """
+
+    def __init__(self, group: _Group, preset: Preset, host: InjectionHost) -> None:
+        super().__init__(group, preset)
+        self._host = host
+        self._started = False
+
+    def start(self) -> None:
+        """Start injecting within the host."""
+        self._host.inject(self)
+        self._started = True
+
+    def is_alive(self) -> bool:
+        """If the injection is still running within the host."""
+        if not self._started or not self._host.is_alive():
+            return False
+
+        # the host keeps running when the injection ended
+        return self._state not in (
+            InjectorState.STOPPED,
+            InjectorState.NO_GRAB,
+            InjectorState.FAILED,
+            InjectorState.UPGRADE_EVDEV,
+        )
+
+    @property
+    def sentinel(self) -> int:
+        """Readable once the host process ended."""
+        return self._host.sentinel
+
+    def get_release_sentinel(self) -> None:
+        """The host keeps running, it waits for the previous injection itself."""
+        return None
+
+    def get_connections(self) -> Tuple[Connection, Connection]:
+        """The ends of the message and statistics pipes that belong into the host."""
+        return self._msg_pipe[0], self._statistics_pipe[0]
+
+
+class _Injection(Injector):
+    """The part of a HostedInjector that runs within the host."""
+
+    def __init__(
+        self,
+        group: _Group,
+        preset: Preset,
+        msg_connection: Connection,
+        statistics_connection: Connection,
+    ) -> None:
+        super().__init__(group, preset)
+
+        # talk to the HostedInjector in the service instead
+        for connection in (*self._msg_pipe, *self._statistics_pipe):
+            connection.close()
+
+        self._msg_pipe = (msg_connection, msg_connection)
+        self._statistics_pipe = (statistics_connection, statistics_connection)
+
+    def stop(self) -> None:
+        """Stop the injection, as if the service called stop_injecting."""
+        self._stop_event.set()
+
+    def _send_state(self, state: InjectorState) -> None:
+        try:
+            super()._send_state(state)
+        except BrokenPipeError:
+            # the service already forgot about this injection, because it started
+            # a new one for the group
+            logger.debug('Nobody is waiting for the state of "%s"', self.group.key)
+
+    async def inject(self) -> None:
+        try:
+            await super().inject()
+        except SystemExit:
+            # don't take the other injections of the host down with this one
+            pass
+        except Exception as error:
+            logger.error('Injection of "%s" failed: %s', self.group.key, error)
+            self._send_state(InjectorState.FAILED)
+        finally:
+            for connection in (self._msg_pipe[0], self._statistics_pipe[0]):
+                connection.close()
+
+
+class InjectionHost(multiprocessing.Process):
+    """A process that runs the injections of many groups on a single event loop.
+
+    The service starts it once the first hosted injection is started, and tells it
+    to quit in stop_all.
+    """
+
+    # where the xmodmap.json of the users session can be found
+    config_dir: str
+    # the uinputs of the service, which the host inherited
+    uinputs: Set[str]
+
+    def __init__(self, config_dir: str, single: bool = False) -> None:
+        """
+
+        Parameters
+        ----------
+        config_dir
+            where the xmodmap.json of the users session can be found
+        single
+            end the process after the first injection ended, like an Injector
+        """
+        self.config_dir = config_dir
+        self.uinputs = set(global_uinputs.devices.keys())
+        self._single = single
+
+        # Commands for the host. Pipes are unix sockets, so the ends of the pipes
+        # of new HostedInjectors can be passed through it.
+        self._pipe = multiprocessing.Pipe()
+
+        # only used within the host process, by group key
+        self._injections: Dict[str, Tuple[_Injection, asyncio.Task]] = {}
+
+        super().__init__(name="injection-host")
+
+    """Functions to interact with the running process."""
+
+    def create_injector(self, group: _Group, preset: Preset) -> HostedInjector:
+        """Make an injector that runs within this host once it is started."""
+        return HostedInjector(group, preset, self)
+
+    def inject(self, injector: HostedInjector) -> None:
+        """Start the injection of the injector.
+
+        Can be safely called from the main process.
+        """
+        logger.info('Starting to inject "%s" within the host', injector.group.key)
+        self._pipe[1].send(
+            (HostCommand.INJECT, injector.group, injector.preset, self.config_dir)
+        )
+        for connection in injector.get_connections():
+            send_handle(self._pipe[1], connection.fileno(), self.pid)
+
+    def quit(self) -> None:
+        """Stop all remaining injections and end the process.
+
+        Can be safely called from the main process.
+        """
+        if self.is_alive():
+            self._pipe[1].send((HostCommand.QUIT,))
+
+    """Process internal stuff."""
+
+    def run(self) -> None:
+        """Run injections until the service tells the host to quit."""
+        logger.info("Starting the injection host")
+        # the end of the service, so that the host notices when the service is gone
+        self._pipe[1].close()
+
+        # Prepare what doesn't depend on the injection, before it is needed. The
+        # service starts new idle processes when the user session tells it about
+        # its config dir, after the session wrote its xmodmap.
+        system_mapping.load_session_xmodmap(self.config_dir)
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self._command_listener())
+        logger.info("The injection host stopped")
+
+    async def _command_listener(self) -> None:
+        loop = asyncio.get_event_loop()
+        command_available = asyncio.Event()
+        loop.add_reader(self._pipe[0].fileno(), command_available.set)
+        while True:
+            await command_available.wait()
+            command_available.clear()
+            while self._pipe[0].poll():
+                try:
+                    command, *args = self._pipe[0].recv()
+                except EOFError:
+                    # the service is gone
+                    command, args = HostCommand.QUIT, []
+
+                if command == HostCommand.INJECT:
+                    msg_connection = Connection(recv_handle(self._pipe[0]))
+                    statistics_connection = Connection(recv_handle(self._pipe[0]))
+                    task = await self._inject(
+                        *args, msg_connection, statistics_connection
+                    )
+
+                    if self._single:
+                        loop.remove_reader(self._pipe[0].fileno())
+                        await task
+                        return
+
+                if command == HostCommand.QUIT:
+                    loop.remove_reader(self._pipe[0].fileno())
+                    await self._stop_all()
+                    return
+
+    async def _inject(
+        self,
+        group: _Group,
+        preset: Preset,
+        config_dir: str,
+        msg_connection: Connection,
+        statistics_connection: Connection,
+    ) -> asyncio.Task:
+        # the previous injection of the group has to release the devices first
+        await self._stop(group.key)
+
+        if not self._single:
+            system_mapping.load_session_xmodmap(config_dir)
+
+        for mapping in preset:
+            # the injections of the host write into the uinputs of the host
+            global_uinputs.prepare_single(mapping.target_uinput)
+
+        injection = _Injection(group, preset, msg_connection, statistics_connection)
+        # copies the context, so that each injection counts its own stats
+        task = asyncio.ensure_future(injection.inject())
+        self._injections[group.key] = (injection, task)
+
+        def forget(_):
+            if self._injections.get(group.key, (None, None))[1] is task:
+                del self._injections[group.key]
+
+        task.add_done_callback(forget)
+        return task
+
+    async def _stop(self, group_key: str) -> None:
+        if group_key not in self._injections:
+            return
+
+        injection, task = self._injections.pop(group_key)
+        # Give it the chance to set itself up, if it didn't yet. It doesn't wait
+        # for anything until it runs, so then it can be stopped.
+        await asyncio.sleep(0)
+        if not task.done():
+            injection.stop()
+            await task
+
+    async def _stop_all(self) -> None:
+        for group_key in list(self._injections.keys()):
+            await self._stop(group_key)
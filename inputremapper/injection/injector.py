@@ -33,8 +33,10 @@ from typing import Dict, List, Optional, Tuple, Union
 
 import evdev
 
+from inputremapper.configs.global_config import global_config
 from inputremapper.configs.input_config import InputCombination, InputConfig, DeviceHash
 from inputremapper.configs.preset import Preset
+from inputremapper.configs.system_mapping import system_mapping
 from inputremapper.groups import (
     _Group,
     classify,
@@ -43,9 +45,13 @@ from inputremapper.groups import (
 from inputremapper.gui.messages.message_broker import MessageType
 from inputremapper.injection.context import Context
 from inputremapper.injection.event_reader import EventReader
-from inputremapper.injection.numlock import set_numlock, is_numlock_on, ensure_numlock
+from inputremapper.injection.global_uinputs import global_uinputs
+from inputremapper.injection.macros.parse import compile_macros
+from inputremapper.injection.macros.profiler import MacroProfiler
+from inputremapper.injection.numlock import set_numlock, is_numlock_on
+from inputremapper.injection.stats import InjectorStats, current_stats
 from inputremapper.logger import logger
-from inputremapper.utils import get_device_hash
+from inputremapper.utils import get_device_hash, get_device_capabilities
 
 CapabilitiesDict = Dict[int, List[int]]
 
@@ -55,6 +61,15 @@ DEV_NAME = "input-remapper"
 # messages sent to the injector process
 class InjectorCommand(str, enum.Enum):
     CLOSE = "CLOSE"
+    RELOAD = "RELOAD"
+    PRELOAD = "PRELOAD"
+    SWITCH = "SWITCH"
+
+
+# what can be requested from the injector process over its statistics pipe
+class StatisticsRequest(str, enum.Enum):
+    MACROS = "MACROS"
+    INJECTOR = "INJECTOR"
 
 
 # messages the injector process reports back to the service
@@ -111,38 +126,84 @@ class Injector(multiprocessing.Process):
     group: _Group
     preset: Preset
     context: Optional[Context]
+    # the other presets that the injection can switch to, by name
+    _preloaded: Dict[Optional[str], Preset]
     _devices: List[evdev.InputDevice]
+    # Collected once per injection, because each capabilities query is an ioctl
+    # sweep and each hash an md5 over them. By path, except for _devices_by_hash.
+    _capabilities: Dict[str, CapabilitiesDict]
+    _device_hashes: Dict[str, DeviceHash]
+    _device_types: Dict[str, DeviceType]
+    _devices_by_hash: Dict[DeviceHash, evdev.InputDevice]
     _state: InjectorState
     _msg_pipe: Tuple[Connection, Connection]
+    _statistics_pipe: Tuple[Connection, Connection]
+    _statistics_request_id: int
     _event_readers: List[EventReader]
+    _reader_tasks: List[asyncio.Task]
+    # shared with the context
+    _sources: Dict[DeviceHash, evdev.InputDevice]
+    _forward_devices: Dict[DeviceHash, evdev.UInput]
     _stop_event: asyncio.Event
+    _stats: InjectorStats
 
-    regrab_timeout = 0.2
+    _previous_sentinel: Optional[int]
 
-    def __init__(self, group: _Group, preset: Preset) -> None:
+    # seconds until a busy device is tried to be grabbed again, doubled each time
+    regrab_timeout = 0.01
+    # seconds after which devices that are still busy are not grabbed
+    grab_deadline = 2
+
+    def __init__(
+        self,
+        group: _Group,
+        preset: Preset,
+        previous: Optional[Injector] = None,
+    ) -> None:
         """
 
         Parameters
         ----------
         group
             the device group
+        previous
+            the injection of the group that is being stopped for this one
         """
         self.group = group
         self._state = InjectorState.UNKNOWN
 
+        # the process inherits it to know when the previous one released the devices
+        self._previous_sentinel = (
+            previous.get_release_sentinel() if previous is not None else None
+        )
+
         # used to interact with the parts of this class that are running within
         # the new process
         self._msg_pipe = multiprocessing.Pipe()
+        # Requests for statistics are answered on their own pipe, so that
+        # late replies can't be mistaken for state messages. Each request has an id
+        # to recognize replies to requests that already timed out.
+        self._statistics_pipe = multiprocessing.Pipe()
+        self._statistics_request_id = 0
 
         self.preset = preset
+        self._preloaded = {}
         self.context = None  # only needed inside the injection process
 
         self._event_readers = []
+        self._reader_tasks = []
 
         super().__init__(name=group.key)
 
     """Functions to interact with the running process."""
 
+    def get_release_sentinel(self) -> Optional[int]:
+        """Readable once the injection released its devices, if it is running.
+
+        Can be safely called from the main process.
+        """
+        return self.sentinel if self.is_alive() else None
+
     def get_state(self) -> InjectorState:
         """Get the state of the injection.
 
@@ -151,7 +212,9 @@ class Injector(multiprocessing.Process):
         # before we try to we try to guess anything lets check if there is a message
         state = self._state
         while self._msg_pipe[1].poll():
-            state = self._msg_pipe[1].recv()
+            msg = self._msg_pipe[1].recv()
+            if isinstance(msg, InjectorState):
+                state = msg
 
         # figure out what is going on step by step
         alive = self.is_alive()
@@ -179,7 +242,52 @@ class Injector(multiprocessing.Process):
         self._state = state
         return self._state
 
-    @ensure_numlock
+    def fileno(self) -> int:
+        """A file descriptor that is readable when the injector sent its state.
+
+        Can be used to wait for messages in the main process, get_state reads them.
+        """
+        return self._msg_pipe[1].fileno()
+
+    def get_macro_statistics(self, timeout: float = 1) -> Dict[str, Dict[str, float]]:
+        """Get the statistics of the macro profiler, if it is enabled.
+
+        Can be safely called from the main process. Empty if the injector doesn't
+        respond within the timeout.
+        """
+        return self._request_statistics(StatisticsRequest.MACROS, timeout)
+
+    def get_stats(self, timeout: float = 1) -> Dict:
+        """Get the counters of the injection, and its cpu time and memory usage.
+
+        Can be safely called from the main process. Empty if the injector doesn't
+        respond within the timeout.
+        """
+        return self._request_statistics(StatisticsRequest.INJECTOR, timeout)
+
+    def _request_statistics(self, request: StatisticsRequest, timeout: float) -> Dict:
+        if not self.is_alive():
+            return {}
+
+        self._statistics_request_id += 1
+        request_id = self._statistics_request_id
+        self._statistics_pipe[1].send((request_id, request))
+
+        deadline = time.time() + timeout
+        while self._statistics_pipe[1].poll(max(deadline - time.time(), 0)):
+            reply_id, statistics = self._statistics_pipe[1].recv()
+            if reply_id == request_id:
+                return statistics
+
+            logger.debug("Discarding the stale statistics %d", reply_id)
+
+        logger.error(
+            'Injector "%s" did not send %s statistics',
+            self.group.key,
+            request.value.lower(),
+        )
+        return {}
+
     def stop_injecting(self) -> None:
         """Stop injecting keycodes.
 
@@ -188,21 +296,98 @@ class Injector(multiprocessing.Process):
         logger.info('Stopping injecting keycodes for group "%s"', self.group.key)
         self._msg_pipe[1].send(InjectorCommand.CLOSE)
 
+    def reload_preset(self, preset: Preset, config_dir: Optional[str] = None) -> None:
+        """Replace the mappings of the running injection, without regrabbing.
+
+        Can be safely called from the main process.
+
+        Parameters
+        ----------
+        preset
+            The preset to inject from now on
+        config_dir
+            If set, the injection first reads the keyboard layout of the users
+            session from the xmodmap.json in it
+        """
+        logger.info('Reloading the preset for group "%s"', self.group.key)
+        self.preset = preset
+        self._preloaded.pop(preset.name, None)
+        self._msg_pipe[1].send((InjectorCommand.RELOAD, (preset, config_dir)))
+
+    def preload_preset(self, preset: Preset, config_dir: Optional[str] = None) -> None:
+        """Prepare the running injection to switch to the preset later.
+
+        Can be safely called from the main process. See reload_preset for the
+        parameters.
+        """
+        logger.info(
+            'Preloading "%s" for group "%s"',
+            preset.name,
+            self.group.key,
+        )
+        if preset.name == self.preset.name:
+            self.preset = preset
+        else:
+            self._preloaded[preset.name] = preset
+
+        self._msg_pipe[1].send((InjectorCommand.PRELOAD, (preset, config_dir)))
+
+    def is_preloaded(self, preset_name: str) -> bool:
+        """If the running injection can switch to the preset without loading it."""
+        return preset_name == self.preset.name or preset_name in self._preloaded
+
+    def switch_preset(self, preset_name: str) -> None:
+        """Switch the running injection to a preloaded preset.
+
+        Can be safely called from the main process.
+        """
+        logger.info(
+            'Switching group "%s" to "%s"',
+            self.group.key,
+            preset_name,
+        )
+        if preset_name in self._preloaded:
+            self._preloaded[self.preset.name] = self.preset
+            self.preset = self._preloaded.pop(preset_name)
+
+        # Send it in any case. The macros of the injection can switch presets as
+        # well, without telling the service about it.
+        self._msg_pipe[1].send((InjectorCommand.SWITCH, preset_name))
+
     """Process internal stuff."""
 
+    def _load_devices(self) -> None:
+        """Get the devices of the group and what is needed to look them up."""
+        self._devices = self.group.get_devices()
+        self._capabilities = {}
+        self._device_hashes = {}
+        self._device_types = {}
+        self._devices_by_hash = {}
+        for device in self._devices:
+            self._capabilities[device.path] = get_device_capabilities(device)
+            device_hash = get_device_hash(device)
+            self._device_hashes[device.path] = device_hash
+            self._devices_by_hash[device_hash] = device
+
+    def _can_emit(self, device: evdev.InputDevice, input_config: InputConfig) -> bool:
+        capabilities = self._capabilities[device.path]
+        return input_config.code in capabilities.get(input_config.type, [])
+
+    def _get_device_type(self, device: evdev.InputDevice) -> DeviceType:
+        if device.path not in self._device_types:
+            self._device_types[device.path] = classify(device)
+
+        return self._device_types[device.path]
+
     def _find_input_device(
         self, input_config: InputConfig
     ) -> Optional[evdev.InputDevice]:
         """find the InputDevice specified by the InputConfig
 
         ensures the devices supports the type and code specified by the InputConfig"""
-        devices_by_hash = {get_device_hash(device): device for device in self._devices}
-
         # mypy thinks None is the wrong type for dict.get()
-        if device := devices_by_hash.get(input_config.origin_hash):  # type: ignore
-            if input_config.code in device.capabilities(absinfo=False).get(
-                input_config.type, []
-            ):
+        if device := self._devices_by_hash.get(input_config.origin_hash):  # type: ignore
+            if self._can_emit(device, input_config):
                 return device
         return None
 
@@ -220,30 +405,51 @@ class Injector(multiprocessing.Process):
             DeviceType.UNKNOWN,
         ]
         candidates: List[evdev.InputDevice] = [
-            device
-            for device in self._devices
-            if input_config.code
-            in device.capabilities(absinfo=False).get(input_config.type, [])
+            device for device in self._devices if self._can_emit(device, input_config)
         ]
 
         if len(candidates) > 1:
             # there is more than on input device which can be used for this
             # event we choose only one determined by the ranking
-            return sorted(candidates, key=lambda d: ranking.index(classify(d)))[0]
+            return sorted(
+                candidates, key=lambda d: ranking.index(self._get_device_type(d))
+            )[0]
         if len(candidates) == 1:
             return candidates.pop()
 
         logger.error(f"Could not find input for {input_config}")
         return None
 
-    def _grab_devices(self) -> Dict[DeviceHash, evdev.InputDevice]:
-        """Grab all InputDevices that match a mappings' origin_hash."""
+    async def _grab_devices(self) -> Dict[DeviceHash, evdev.InputDevice]:
+        """Grab all InputDevices that match a mappings' origin_hash.
+
+        They are grabbed concurrently, so that a busy device doesn't hold up the
+        others.
+        """
+        grabbed_devices = await asyncio.gather(
+            *[self._grab_device(device) for device in self._get_needed_devices()]
+        )
+
+        return {
+            self._device_hashes[device.path]: device
+            for device in grabbed_devices
+            if device is not None
+        }
+
+    def _get_needed_devices(
+        self,
+        preset: Optional[Preset] = None,
+    ) -> List[evdev.InputDevice]:
+        """Find the InputDevices that match a mappings' origin_hash.
+
+        Of the injected preset, unless another one is given.
+        """
         # use a dict because the InputDevice is not directly hashable
         needed_devices = {}
         input_configs = set()
 
         # find all unique input_config's
-        for mapping in self.preset:
+        for mapping in preset if preset is not None else self.preset:
             for input_config in mapping.input_combination:
                 input_configs.add(input_config)
 
@@ -255,18 +461,15 @@ class Injector(multiprocessing.Process):
                 continue
             needed_devices[device.path] = device
 
-        grabbed_devices = {}
-        for device in needed_devices.values():
-            if device := self._grab_device(device):
-                grabbed_devices[get_device_hash(device)] = device
-
-        return grabbed_devices
+        return list(needed_devices.values())
 
-    def _update_preset(self):
+    def _update_preset(self, preset: Optional[Preset] = None):
         """Update all InputConfigs in the preset to include correct origin_hash
-        information."""
+        information.
+
+        Of the injected preset, unless another one is given."""
         mappings_by_input = defaultdict(list)
-        for mapping in self.preset:
+        for mapping in preset if preset is not None else self.preset:
             for input_config in mapping.input_combination:
                 mappings_by_input[input_config].append(mapping)
 
@@ -280,33 +483,57 @@ class Injector(multiprocessing.Process):
 
             for mapping in mappings_by_input[input_config]:
                 combination: List[InputConfig] = list(mapping.input_combination)
-                device_hash = get_device_hash(device)
+                device_hash = self._device_hashes[device.path]
                 idx = combination.index(input_config)
                 combination[idx] = combination[idx].modify(origin_hash=device_hash)
                 mapping.input_combination = combination
 
-    def _grab_device(self, device: evdev.InputDevice) -> Optional[evdev.InputDevice]:
+    async def _grab_device(
+        self,
+        device: evdev.InputDevice,
+    ) -> Optional[evdev.InputDevice]:
         """Try to grab the device, return None if not possible.
 
         Without grab, original events from it would reach the display server
         even though they are mapped.
         """
-        error = None
-        for attempt in range(10):
+        deadline = time.time() + self.grab_deadline
+        delay = self.regrab_timeout
+        attempt = 0
+        while True:
+            attempt += 1
             try:
                 device.grab()
                 logger.debug("Grab %s", device.path)
                 return device
-            except IOError as err:
+            except IOError as error:
                 # it might take a little time until the device is free if
                 # it was previously grabbed.
-                error = err
-                logger.debug("Failed attempts to grab %s: %d", device.path, attempt + 1)
-                time.sleep(self.regrab_timeout)
+                logger.debug("Failed attempts to grab %s: %d", device.path, attempt)
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.error("Cannot grab %s, it is possibly in use", device.path)
+                    logger.error(str(error))
+                    return None
+
+            await asyncio.sleep(min(delay, remaining))
+            delay *= 2
+
+    async def _wait_for_previous(self) -> None:
+        """Wait until the previous injection of the group released its devices."""
+        if self._previous_sentinel is None:
+            return
 
-        logger.error("Cannot grab %s, it is possibly in use", device.path)
-        logger.error(str(error))
-        return None
+        loop = asyncio.get_running_loop()
+        released = asyncio.Event()
+        loop.add_reader(self._previous_sentinel, released.set)
+        try:
+            await asyncio.wait_for(released.wait(), self.grab_deadline)
+        except asyncio.TimeoutError:
+            # try to grab anyway, it might have released them already
+            logger.debug("The previous injection didn't end in time")
+        finally:
+            loop.remove_reader(self._previous_sentinel)
 
     @staticmethod
     def _copy_capabilities(input_device: evdev.InputDevice) -> CapabilitiesDict:
@@ -334,24 +561,54 @@ class Injector(multiprocessing.Process):
     async def _msg_listener(self) -> None:
         """Wait for messages from the main process to do special stuff."""
         loop = asyncio.get_event_loop()
-        while True:
-            frame_available = asyncio.Event()
-            loop.add_reader(self._msg_pipe[0].fileno(), frame_available.set)
-            await frame_available.wait()
-            frame_available.clear()
-            msg = self._msg_pipe[0].recv()
-            if msg == InjectorCommand.CLOSE:
-                logger.debug("Received close signal")
-                self._stop_event.set()
-                # give the event pipeline some time to reset devices
-                # before shutting the loop down
-                await asyncio.sleep(0.1)
-
-                # stop the event loop and cause the process to reach its end
-                # cleanly. Using .terminate prevents coverage from working.
-                loop.stop()
-                self._msg_pipe[0].send(InjectorState.STOPPED)
-                return
+        frame_available = asyncio.Event()
+        loop.add_reader(self._msg_pipe[0].fileno(), frame_available.set)
+        try:
+            while True:
+                await frame_available.wait()
+                frame_available.clear()
+                while self._msg_pipe[0].poll():
+                    message = self._msg_pipe[0].recv()
+                    if message == InjectorCommand.CLOSE:
+                        logger.debug("Received close signal")
+                        self._stop_event.set()
+                        return
+
+                    if not isinstance(message, tuple):
+                        continue
+
+                    command, argument = message
+                    if command == InjectorCommand.RELOAD:
+                        await self._reload_preset(*argument)
+
+                    if command == InjectorCommand.PRELOAD:
+                        await self._preload_preset(*argument)
+
+                    if command == InjectorCommand.SWITCH:
+                        self._switch_preset(argument)
+        finally:
+            loop.remove_reader(self._msg_pipe[0].fileno())
+
+    async def _statistics_listener(self) -> None:
+        """Answer requests for statistics from the main process."""
+        loop = asyncio.get_event_loop()
+        request_available = asyncio.Event()
+        loop.add_reader(self._statistics_pipe[0].fileno(), request_available.set)
+        try:
+            while True:
+                await request_available.wait()
+                request_available.clear()
+                while self._statistics_pipe[0].poll():
+                    request_id, request = self._statistics_pipe[0].recv()
+                    if request == StatisticsRequest.INJECTOR:
+                        statistics = self._stats.to_dict()
+                    else:
+                        profiler = self.context.macro_profiler
+                        statistics = profiler.to_dict() if profiler else {}
+
+                    self._statistics_pipe[0].send((request_id, statistics))
+        finally:
+            loop.remove_reader(self._statistics_pipe[0].fileno())
 
     def _create_forwarding_device(self, source: evdev.InputDevice) -> evdev.UInput:
         # copy as much information as possible, because libinput uses the extra
@@ -376,12 +633,99 @@ class Injector(multiprocessing.Process):
                 # UInput constructor doesn't support input_props and
                 # source.input_props doesn't exist with old python-evdev versions.
                 logger.error("Please upgrade your python-evdev version. Exiting")
-                self._msg_pipe[0].send(InjectorState.UPGRADE_EVDEV)
+                self._send_state(InjectorState.UPGRADE_EVDEV)
                 sys.exit(12)
 
             raise e
         return forward_to
 
+    async def _reload_preset(self, preset: Preset, config_dir: Optional[str]) -> None:
+        """Use the new preset, without regrabbing the devices."""
+        start = time.time()
+        self.preset = preset
+        await self._prepare_preset(preset, config_dir)
+        self.context.update_preset(preset)
+        self._drop_mappings()
+        logger.info(
+            'Reloaded the preset for "%s" in %.3fs',
+            self.group.key,
+            time.time() - start,
+        )
+
+    async def _preload_preset(self, preset: Preset, config_dir: Optional[str]) -> None:
+        """Compile the preset, to switch to it without delay later."""
+        start = time.time()
+        await self._prepare_preset(preset, config_dir)
+        self.context.preload_preset(preset)
+        logger.info(
+            'Preloaded "%s" for "%s" in %.3fs',
+            preset.name,
+            self.group.key,
+            time.time() - start,
+        )
+
+    def _switch_preset(self, preset_name: str) -> None:
+        start = time.time()
+        if self.context.switch_preset(preset_name):
+            logger.info(
+                'Switched "%s" to "%s" in %.3fms',
+                self.group.key,
+                preset_name,
+                (time.time() - start) * 1000,
+            )
+
+    def _drop_mappings(self) -> None:
+        """Only keep the name of the injected preset.
+
+        The handlers got a MappingSpec of everything they need, so the Mappings
+        can be freed.
+        """
+        self.preset = Preset(self.preset.path)
+
+    async def _prepare_preset(self, preset: Preset, config_dir: Optional[str]) -> None:
+        """Get everything ready that the preset needs, besides the handlers."""
+        if config_dir is not None:
+            # the layout might have changed since the injection started
+            system_mapping.load_session_xmodmap(config_dir)
+
+        self._update_preset(preset)
+
+        for mapping in preset:
+            # the process only has the uinputs that existed when it was started
+            global_uinputs.prepare_single(mapping.target_uinput)
+
+        # the devices stay grabbed even if they aren't needed anymore, but those
+        # that weren't needed before have to be grabbed now
+        new_devices = [
+            device
+            for device in self._get_needed_devices(preset)
+            if self._device_hashes[device.path] not in self._sources
+        ]
+        for device in await asyncio.gather(*map(self._grab_device, new_devices)):
+            if device is not None:
+                self._add_source(device)
+
+    def _add_source(self, source: evdev.InputDevice) -> None:
+        """Start reading from a grabbed device."""
+        device_hash = self._device_hashes[source.path]
+        forward_device = self._create_forwarding_device(source)
+        # set the numlock state to what it was before injecting, because
+        # grabbing devices screws this up
+        set_numlock(forward_device, is_numlock_on(source))
+        self._sources[device_hash] = source
+        self._forward_devices[device_hash] = forward_device
+
+        if self.context is None:
+            # the first readers are started once the context exists
+            return
+
+        event_reader = EventReader(self.context, source, self._stop_event)
+        self._reader_tasks.append(asyncio.ensure_future(event_reader.run()))
+        self._event_readers.append(event_reader)
+
+    def _send_state(self, state: InjectorState) -> None:
+        self._msg_pipe[0].send(state)
+
     def run(self) -> None:
         """The injection worker that keeps injecting until terminated.
 
@@ -391,81 +735,130 @@ class Injector(multiprocessing.Process):
         Use this function as starting point in a process. It creates
         the loops needed to read and map events and keeps running them.
         """
-        logger.info('Starting injecting the preset for "%s"', self.group.key)
-
         # create a new event loop, because somehow running an infinite loop
         # that sleeps on iterations (joystick_to_mouse) in one process causes
         # another injection process to screw up reading from the grabbed
         # device.
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        loop.run_until_complete(self.inject())
 
-        self._devices = self.group.get_devices()
+    async def inject(self) -> None:
+        """Grab the devices and inject until stop_injecting is called.
+
+        Runs within the process of the injector, or within the InjectionHost
+        together with the injections of other groups.
+        """
+        logger.info('Starting injecting the preset for "%s"', self.group.key)
+
+        # The injection may be stopped while it waits for the previous one or for
+        # its grabs, before it runs.
+        self._stop_event = asyncio.Event()
+
+        # all tasks of this injection, which are created afterwards, count into this
+        self._stats = InjectorStats()
+        current_stats.set(self._stats)
+
+        self._load_devices()
 
         # InputConfigs may not contain the origin_hash information, this will try to make a
         # good guess if the origin_hash information is missing or invalid.
         self._update_preset()
 
+        # Parsing macros is slow, do it before grabbing so that the devices don't
+        # stay unusable for longer than needed.
+        macros = compile_macros(self.preset)
+
+        # the previous injection of the group has to release the devices first
+        await self._wait_for_previous()
+        if self._stop_event.is_set():
+            logger.debug("Stopped before grabbing")
+            self._send_state(InjectorState.STOPPED)
+            return
+
         # grab devices as early as possible. If events appear that won't get
         # released anymore before the grab they appear to be held down forever
-        sources = self._grab_devices()
-        forward_devices = {}
-        for device_hash, device in sources.items():
-            forward_devices[device_hash] = self._create_forwarding_device(device)
+        grab_start = time.time()
+        self._sources = {}
+        self._forward_devices = {}
+        for device in (await self._grab_devices()).values():
+            self._add_source(device)
+
+        if self._stop_event.is_set():
+            logger.debug("Stopped while grabbing")
+            self._release_sources()
+            self._send_state(InjectorState.STOPPED)
+            return
 
         # create this within the process after the event loop creation,
         # so that the macros use the correct loop
-        self.context = Context(self.preset, sources, forward_devices)
-        self._stop_event = asyncio.Event()
+        macro_profiler = None
+        if global_config.get("profile_macros", log_unknown=False):
+            logger.info("Profiling macros")
+            macro_profiler = MacroProfiler()
+
+        self.context = Context(
+            self.preset,
+            self._sources,
+            self._forward_devices,
+            macro_profiler=macro_profiler,
+            macros=macros,
+        )
+        self._drop_mappings()
 
-        if len(sources) == 0:
+        if len(self._sources) == 0:
             # maybe the preset was empty or something
             logger.error("Did not grab any device")
-            self._msg_pipe[0].send(InjectorState.NO_GRAB)
+            self._send_state(InjectorState.NO_GRAB)
             return
 
-        numlock_state = is_numlock_on()
-        coroutines = []
-
-        for device_hash in sources:
+        for source in self._sources.values():
             # actually doing things
-            event_reader = EventReader(
-                self.context,
-                sources[device_hash],
-                self._stop_event,
-            )
-            coroutines.append(event_reader.run())
+            event_reader = EventReader(self.context, source, self._stop_event)
+            self._reader_tasks.append(asyncio.ensure_future(event_reader.run()))
             self._event_readers.append(event_reader)
 
-        coroutines.append(self._msg_listener())
-
-        # set the numlock state to what it was before injecting, because
-        # grabbing devices screws this up
-        set_numlock(numlock_state)
+        listeners = [
+            asyncio.ensure_future(self._msg_listener()),
+            asyncio.ensure_future(self._statistics_listener()),
+        ]
 
-        self._msg_pipe[0].send(InjectorState.RUNNING)
+        self._send_state(InjectorState.RUNNING)
+        logger.debug("Took %.3fs from grabbing to running", time.time() - grab_start)
 
+        state = InjectorState.STOPPED
         try:
-            loop.run_until_complete(asyncio.gather(*coroutines))
-        except RuntimeError as error:
-            # the loop might have been stopped via a `CLOSE` message,
-            # which causes the error message below. This is expected behavior
-            if str(error) != "Event loop stopped before Future completed.":
-                raise error
+            # The readers keep running until the CLOSE message sets the stop event,
+            # even if they all stopped before because their devices are gone.
+            await asyncio.gather(*self._reader_tasks, self._stop_event.wait())
         except OSError as error:
             logger.error("Failed to run injector coroutines: %s", str(error))
+            state = InjectorState.FAILED
+
+        # expected when stop_injecting is called,
+        # during normal operation as well as tests this point is not
+        # reached otherwise.
+        logger.debug("Injector coroutines ended")
 
-        if len(coroutines) > 0:
-            # expected when stop_injecting is called,
-            # during normal operation as well as tests this point is not
-            # reached otherwise.
-            logger.debug("Injector coroutines ended")
+        for listener in listeners:
+            listener.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+        # including those of devices that were grabbed for a reloaded preset
+        await asyncio.gather(*self._reader_tasks, return_exceptions=True)
+
+        self._release_sources()
+        self._send_state(state)
+
+    def _release_sources(self) -> None:
+        """Ungrab all devices, so that the next injection doesn't fail its grabs."""
+        for device_hash, source in self._sources.items():
+            # the numlock might have been toggled while the forwarded device was used
+            numlock_state = is_numlock_on(self._forward_devices[device_hash].device)
 
-        for source in sources.values():
-            # ungrab at the end to make the next injection process not fail
-            # its grabs
             try:
                 source.ungrab()
             except OSError as error:
                 # it might have disappeared
                 logger.debug("OSError for ungrab on %s: %s", source.path, str(error))
+
+            set_numlock(source, numlock_state)
@@ -60,6 +60,7 @@ from inputremapper.configs.validation_errors import (
     MacroParsingError,
 )
 from inputremapper.injection.global_uinputs import can_default_uinput_emit
+from inputremapper.injection.macros.profiler import measure
 from inputremapper.ipc.shared_dict import SharedDict
 from inputremapper.logger import logger
 
@@ -68,6 +69,9 @@ MacroTask = Callable[[Handler], Awaitable]
 
 macro_variables = SharedDict()
 
+# the pause of hold(macro) between repetitions without an interval, in milliseconds
+DEFAULT_HOLD_PAUSE_MS = 1
+
 
 class Variable:
     """Can be used as function parameter in the various add_... functions.
@@ -83,7 +87,8 @@ class Variable:
 
     def resolve(self):
         """Get the variables value from memory."""
-        return macro_variables.get(self.name)
+        with measure("variable_time"):
+            return macro_variables.get(self.name)
 
     def __repr__(self):
         return f'<Variable "{self.name}" at {hex(id(self))}>'
@@ -142,6 +147,21 @@ def _type_check_variablename(name: str):
         raise MacroParsingError(msg=f'"{name}" is not a legit variable name')
 
 
+def _write_frame(handler: Callable, events: List[Tuple[int, int, int]]):
+    """Write multiple events at once, followed by a single syn if possible.
+
+    Handlers that are able to write frames provide a `write_frame` attribute. Others
+    receive each event individually.
+    """
+    write_frame = getattr(handler, "write_frame", None)
+    if write_frame is not None:
+        write_frame(events)
+        return
+
+    for event in events:
+        handler(*event)
+
+
 def _resolve(argument, allowed_types=None):
     """If the argument is a variable, figure out its value and cast it.
 
@@ -223,6 +243,19 @@ class Macro:
         self.child_macros: List[Macro] = []
         self.keystroke_sleep_ms = None
 
+    def bind_context(self, context, mapping=None):
+        """Use this context for the macro and all of its child macros.
+
+        For macros that were parsed before the context existed. If a mapping is
+        provided, it replaces the one that the macro was parsed with.
+        """
+        self.context = context
+        if mapping is not None:
+            self.mapping = mapping
+
+        for macro in self.child_macros:
+            macro.bind_context(context, mapping)
+
     def is_holding(self):
         """Check if the macro is waiting for a key to be released."""
         return not self._trigger_release_event.is_set()
@@ -297,7 +330,21 @@ class Macro:
         This was needed at some point because it appeared that injecting keys too
         fast will prevent them from working. It probably depends on the environment.
         """
-        await asyncio.sleep(self.keystroke_sleep_ms / 1000)
+        with measure("pause_time"):
+            await asyncio.sleep(self.keystroke_sleep_ms / 1000)
+
+    async def _wait_for_release(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the user releases the trigger key.
+
+        Returns False if the timeout in seconds passed before that.
+        """
+        with measure("trigger_wait_time"):
+            try:
+                await asyncio.wait_for(self._trigger_release_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+
+        return True
 
     def __repr__(self):
         return f'<Macro "{self.code}" at {hex(id(self))}>'
@@ -323,6 +370,39 @@ class Macro:
 
         self.tasks.append(task)
 
+    def add_type(self, text: str, delay: Optional[Union[int, float]] = None):
+        """Write the text, using shift and AltGr if needed.
+
+        Each key is pressed and released in its own frame, and the delay in
+        milliseconds is only awaited once per character, instead of running `key`
+        and `modify` for each character.
+        """
+        text = _type_check(text, [str], "type", 1)
+        delay = _type_check(delay, [int, float, None], "type", 2)
+
+        # Compile the frames now to show errors in the gui before the injection starts
+        characters = None
+        if not isinstance(text, Variable):
+            characters = self._get_text_frames(text)
+
+        async def task(handler: Callable):
+            resolved_characters = characters
+            if resolved_characters is None:
+                resolved_characters = self._get_text_frames(_resolve(text, [str]))
+
+            resolved_delay = _resolve(delay, [int, float, None])
+            if resolved_delay is None:
+                resolved_delay = self.keystroke_sleep_ms
+
+            for press, release in resolved_characters:
+                _write_frame(handler, press)
+                _write_frame(handler, release)
+                # even without a delay, give other events a chance to be injected
+                # while long texts are written
+                await asyncio.sleep(resolved_delay / 1000)
+
+        self.tasks.append(task)
+
     def add_key_down(self, symbol: str):
         """Press the symbol."""
         self._type_check_symbol(symbol)
@@ -349,12 +429,19 @@ class Macro:
 
         self.tasks.append(task)
 
-    def add_hold(self, macro=None):
+    def add_hold(self, macro=None, interval=None):
         """Loops the execution until key release."""
         _type_check(macro, [Macro, str, None], "hold", 1)
+        interval = _type_check(interval, [int, float, None], "hold", 2)
+
+        if interval is not None and not isinstance(macro, Macro):
+            # keys are held down, not repeated
+            raise MacroParsingError(
+                msg="hold only accepts an interval for repeating a child macro"
+            )
 
         if macro is None:
-            self.tasks.append(lambda _: self._trigger_release_event.wait())
+            self.tasks.append(lambda _: self._wait_for_release())
             return
 
         if not isinstance(macro, Macro):
@@ -369,20 +456,36 @@ class Macro:
 
                 resolved_code = _resolve(code, [int])
                 handler(EV_KEY, resolved_code, 1)
-                await self._trigger_release_event.wait()
+                await self._wait_for_release()
                 handler(EV_KEY, resolved_code, 0)
 
             self.tasks.append(task)
 
         if isinstance(macro, Macro):
-            # repeat the macro forever while the key is held down
+            # repeat the macro while the key is held down
             async def task(handler: Callable):
+                resolved_interval = _resolve(interval, [int, float, None])
+
+                loop = asyncio.get_running_loop()
+                next_run = loop.time()
                 while self.is_holding():
                     # run the child macro completely to avoid
                     # not-releasing any key
                     await macro.run(handler)
-                    # give some other code a chance to run
-                    await asyncio.sleep(1 / 1000)
+
+                    if resolved_interval is None:
+                        # pause after each repetition, like it always did
+                        next_run = loop.time() + DEFAULT_HOLD_PAUSE_MS / 1000
+                    else:
+                        # Schedule relative to the previous start, so that the time
+                        # the child macro takes doesn't add to the interval. At most
+                        # once per millisecond, it's not supposed to spin.
+                        period = max(resolved_interval, 1) / 1000
+                        next_run = max(next_run + period, loop.time())
+
+                    # sleeps until then, unless the trigger is released
+                    if await self._wait_for_release(next_run - loop.time()):
+                        break
 
             self.tasks.append(task)
             self.child_macros.append(macro)
@@ -426,7 +529,7 @@ class Macro:
                 handler(EV_KEY, code, 1)
                 await self._keycode_pause()
 
-            await self._trigger_release_event.wait()
+            await self._wait_for_release()
 
             for code in codes[::-1]:
                 handler(EV_KEY, code, 0)
@@ -531,7 +634,8 @@ class Macro:
             # can also copy with set(a, $b)
             resolved_value = _resolve(value)
             logger.debug('"%s" set to "%s"', variable, resolved_value)
-            macro_variables[variable] = value
+            with measure("variable_time"):
+                macro_variables[variable] = value
 
         self.tasks.append(task)
 
@@ -541,10 +645,13 @@ class Macro:
         _type_check(value, [int, float], "value", 1)
 
         async def task(_):
-            current = macro_variables[variable]
+            with measure("variable_time"):
+                current = macro_variables[variable]
+
             if current is None:
                 logger.debug('"%s" initialized with 0', variable)
-                macro_variables[variable] = 0
+                with measure("variable_time"):
+                    macro_variables[variable] = 0
                 current = 0
 
             resolved_value = _resolve(value)
@@ -561,7 +668,19 @@ class Macro:
                 return
 
             logger.debug('"%s" += "%s"', variable, resolved_value)
-            macro_variables[variable] += value
+            with measure("variable_time"):
+                macro_variables[variable] += value
+
+        self.tasks.append(task)
+
+    def add_switch_preset(self, preset: str):
+        """Switch the injection to another preset that has been preloaded."""
+        preset = _type_check(preset, [str], "switch_preset", 1)
+
+        async def task(_):
+            # The handlers of the current preset are reset, which releases the
+            # trigger of this macro. It won't stop the macro though.
+            self.context.switch_preset(_resolve(preset, [str]))
 
         self.tasks.append(task)
 
@@ -576,7 +695,8 @@ class Macro:
         _type_check(else_, [Macro, None], "ifeq", 4)
 
         async def task(handler: Callable):
-            set_value = macro_variables.get(variable)
+            with measure("variable_time"):
+                set_value = macro_variables.get(variable)
             logger.debug('"%s" is "%s"', variable, set_value)
             if set_value == value:
                 if then is not None:
@@ -631,11 +751,12 @@ class Macro:
 
         async def wait():
             """Wait for a release, or if nothing pressed yet, a press and release."""
-            if self.is_holding():
-                await self._trigger_release_event.wait()
-            else:
-                await self._trigger_press_event.wait()
-                await self._trigger_release_event.wait()
+            with measure("trigger_wait_time"):
+                if self.is_holding():
+                    await self._trigger_release_event.wait()
+                else:
+                    await self._trigger_press_event.wait()
+                    await self._trigger_release_event.wait()
 
         async def task(handler: Callable):
             resolved_timeout = _resolve(timeout, [int, float]) / 1000
@@ -662,27 +783,23 @@ class Macro:
         async def task(handler: Callable):
             listener_done = asyncio.Event()
 
-            async def listener(event):
-                if event.type != EV_KEY:
-                    # ignore anything that is not a key
-                    return
-
-                if event.value == 1:
-                    # another key was pressed, trigger else
-                    listener_done.set()
-                    return
+            def listener(_):
+                # another key was pressed, trigger else
+                listener_done.set()
 
-            self.context.listeners.add(listener)
+            # only key presses are relevant, anything else won't call the listener
+            self.context.listeners.add(listener, type_=EV_KEY, value=1)
 
             resolved_timeout = _resolve(timeout, allowed_types=[int, float, None])
-            await asyncio.wait(
-                [
-                    asyncio.Task(listener_done.wait()),
-                    asyncio.Task(self._trigger_release_event.wait()),
-                ],
-                timeout=resolved_timeout / 1000 if resolved_timeout else None,
-                return_when=asyncio.FIRST_COMPLETED,
-            )
+            with measure("trigger_wait_time"):
+                await asyncio.wait(
+                    [
+                        asyncio.Task(listener_done.wait()),
+                        asyncio.Task(self._trigger_release_event.wait()),
+                    ],
+                    timeout=resolved_timeout / 1000 if resolved_timeout else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
 
             self.context.listeners.remove(listener)
 
@@ -695,6 +812,40 @@ class Macro:
 
         self.tasks.append(task)
 
+    def _get_text_frames(
+        self, text: str
+    ) -> List[Tuple[List[Tuple[int, int, int]], List[Tuple[int, int, int]]]]:
+        """Translate the text into frames of key events that will write it.
+
+        Every character results in a pair of frames, one that presses the modifiers
+        and the key, and one that releases them.
+        """
+        frames = []
+        for character in text:
+            keys = system_mapping.get_character_keys(character)
+            if keys is None:
+                raise MacroParsingError(msg=f'Cannot type "{character}"')
+
+            code, modifiers = keys
+            for key in [*modifiers, code]:
+                self._check_target_can_emit(character, key)
+
+            frames.append(
+                (
+                    [*((EV_KEY, key, 1) for key in modifiers), (EV_KEY, code, 1)],
+                    [(EV_KEY, code, 0), *((EV_KEY, key, 0) for key in modifiers)],
+                )
+            )
+
+        return frames
+
+    def _check_target_can_emit(self, symbol: str, code: int):
+        """Raise if the mappings target_uinput can't write the key."""
+        if self.mapping is not None:
+            target = self.mapping.target_uinput
+            if target is not None and not can_default_uinput_emit(target, EV_KEY, code):
+                raise SymbolNotAvailableInTargetError(symbol, target)
+
     def _type_check_symbol(self, keyname: Union[str, Variable]) -> Union[Variable, int]:
         """Same as _type_check, but checks if the key-name is valid."""
         if isinstance(keyname, Variable):
@@ -707,9 +858,6 @@ class Macro:
         if code is None:
             raise MacroParsingError(msg=f'Unknown key "{symbol}"')
 
-        if self.mapping is not None:
-            target = self.mapping.target_uinput
-            if target is not None and not can_default_uinput_emit(target, EV_KEY, code):
-                raise SymbolNotAvailableInTargetError(symbol, target)
+        self._check_target_can_emit(symbol, code)
 
         return code
@@ -23,7 +23,7 @@
 
 import inspect
 import re
-from typing import Optional, Any
+from typing import Optional, Any, Dict, Iterable
 
 from inputremapper.configs.validation_errors import MacroParsingError
 from inputremapper.injection.macros.macro import Macro, Variable
@@ -48,6 +48,7 @@ TASK_FACTORIES = {
     "key": Macro.add_key,
     "key_down": Macro.add_key_down,
     "key_up": Macro.add_key_up,
+    "type": Macro.add_type,
     "event": Macro.add_event,
     "wait": Macro.add_wait,
     "hold": Macro.add_hold,
@@ -59,6 +60,7 @@ TASK_FACTORIES = {
     "if_tap": Macro.add_if_tap,
     "if_single": Macro.add_if_single,
     "add": Macro.add_add,
+    "switch_preset": Macro.add_switch_preset,
     # Those are only kept for backwards compatibility with old macros. The space for
     # writing macro was very constrained in the past, so shorthands were introduced:
     "m": Macro.add_modify,
@@ -462,3 +464,23 @@ def parse(macro: str, context=None, mapping=None, verbose: bool = True):
         raise MacroParsingError(macro, "The provided code was not a macro")
 
     return macro_obj
+
+
+def compile_macros(mappings: Iterable) -> Dict[int, Macro]:
+    """Parse the macros of all mappings ahead of time.
+
+    Returns the macros by the id of their mapping. They don't have a context yet,
+    see Macro.bind_context. Broken macros are skipped, they will raise their error
+    again when the MacroHandler tries to parse them.
+    """
+    macros = {}
+    for mapping in mappings:
+        if not is_this_a_macro(mapping.output_symbol):
+            continue
+
+        try:
+            macros[id(mapping)] = parse(mapping.output_symbol, None, mapping)
+        except MacroParsingError:
+            continue
+
+    return macros
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# input-remapper - GUI for device specific keyboard mappings
+# Copyright (C) 2023 sezanzeb <proxima@sezanzeb.de>
+#
+# This file is part of input-remapper.
+#
+# input-remapper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# input-remapper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Measure where running macros spend their time.
+
+Enable it by setting "profile_macros": true in the config.json, and get the
+results via the `get_macro_statistics` method of the daemon.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Iterator
+
+
+@dataclass
+class MacroStatistics:
+    """Runtime statistics of the macro of a single mapping, times in seconds."""
+
+    runs: int = 0
+    total_time: float = 0
+    max_time: float = 0
+    # awaiting the keystroke_sleep_ms between key events
+    pause_time: float = 0
+    # waiting for the trigger to be pressed or released
+    trigger_wait_time: float = 0
+    # blocked while reading or writing $variables from the shared memory
+    variable_time: float = 0
+
+    def add_run(self, duration: float) -> None:
+        self.runs += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+
+
+# The statistics of the macro that is running in the current asyncio task. Each
+# MacroHandler runs its macro in its own task, so child macros and deeply nested
+# functions like _resolve don't need to know about the mapping.
+current_statistics: contextvars.ContextVar[
+    Optional[MacroStatistics]
+] = contextvars.ContextVar("current_statistics", default=None)
+
+
+@contextmanager
+def measure(field: str) -> Iterator[None]:
+    """Add the time spent within the block to the field of the current statistics."""
+    statistics = current_statistics.get()
+    if statistics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        setattr(statistics, field, getattr(statistics, field) + duration)
+
+
+class MacroProfiler:
+    """Collects the MacroStatistics of all mappings of an injection."""
+
+    def __init__(self):
+        self._statistics: Dict[str, MacroStatistics] = {}
+
+    def get_statistics(self, mapping_name: str) -> MacroStatistics:
+        """Get the statistics of a mapping, they are created if needed."""
+        if mapping_name not in self._statistics:
+            self._statistics[mapping_name] = MacroStatistics()
+
+        return self._statistics[mapping_name]
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """Serialize all statistics, for sending them to the daemon."""
+        return {name: asdict(stats) for name, stats in self._statistics.items()}
@@ -24,7 +24,6 @@ from evdev.ecodes import EV_ABS
 
 from inputremapper.configs.input_config import InputCombination, InputConfig
 from inputremapper import exceptions
-from inputremapper.configs.mapping import Mapping
 from inputremapper.injection.global_uinputs import global_uinputs
 from inputremapper.injection.mapping_handlers.axis_transform import Transformation
 from inputremapper.injection.mapping_handlers.mapping_handler import (
@@ -32,6 +31,7 @@ from inputremapper.injection.mapping_handlers.mapping_handler import (
     HandlerEnums,
     InputEventHandler,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent, EventActions
 from inputremapper.logger import logger
 from inputremapper.utils import get_evdev_constant_name
@@ -48,7 +48,7 @@ class AbsToAbsHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         **_,
     ) -> None:
         super().__init__(combination, mapping)
@@ -79,8 +79,8 @@ class AbsToAbsHandler(MappingHandler):
     @property
     def child(self):  # used for logging
         return (
-            f"maps to: {self.mapping.get_output_name_constant()} "
-            f"{self.mapping.get_output_type_code()} at "
+            f"maps to: {self.mapping.output_name_constant} "
+            f"{self.mapping.output_type_code} at "
             f"{self.mapping.target_uinput}"
         )
 
@@ -24,11 +24,11 @@ import evdev
 from evdev.ecodes import EV_ABS
 
 from inputremapper.configs.input_config import InputCombination, InputConfig
-from inputremapper.configs.mapping import Mapping
 from inputremapper.injection.mapping_handlers.mapping_handler import (
     MappingHandler,
     InputEventHandler,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent, EventActions
 from inputremapper.utils import get_evdev_constant_name
 
@@ -43,7 +43,7 @@ class AbsToBtnHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         **_,
     ):
         super().__init__(combination, mapping)
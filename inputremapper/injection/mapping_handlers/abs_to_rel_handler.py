@@ -35,7 +35,6 @@ from evdev.ecodes import (
 
 from inputremapper.configs.input_config import InputCombination, InputConfig
 from inputremapper.configs.mapping import (
-    Mapping,
     REL_XY_SCALING,
     WHEEL_SCALING,
     WHEEL_HI_RES_SCALING,
@@ -48,6 +47,7 @@ from inputremapper.injection.mapping_handlers.mapping_handler import (
     HandlerEnums,
     InputEventHandler,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent, EventActions
 from inputremapper.logger import logger
 from inputremapper.utils import get_evdev_constant_name
@@ -84,7 +84,7 @@ async def _run_normal_output(self) -> None:
         self._write(EV_REL, self.mapping.output_code, value)
 
         time_taken = time.time() - start
-        sleep = max(0.0, (1 / self.mapping.rel_rate) - time_taken)
+        sleep = max(0.0, self.mapping.rel_interval - time_taken)
         await asyncio.sleep(sleep)
         start = time.time()
 
@@ -115,7 +115,7 @@ async def _run_wheel_output(self, codes: Tuple[int, int]) -> None:
             self._write(EV_REL, codes[i], value)
 
         time_taken = time.time() - start
-        await asyncio.sleep(max(0.0, (1 / self.mapping.rel_rate) - time_taken))
+        await asyncio.sleep(max(0.0, self.mapping.rel_interval - time_taken))
         start = time.time()
 
     self._running = False
@@ -133,7 +133,7 @@ class AbsToRelHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         **_,
     ) -> None:
         super().__init__(combination, mapping)
@@ -174,8 +174,8 @@ class AbsToRelHandler(MappingHandler):
     @property
     def child(self):  # used for logging
         return (
-            f"maps to: {self.mapping.get_output_name_constant()} "
-            f"{self.mapping.get_output_type_code()} at "
+            f"maps to: {self.mapping.output_name_constant} "
+            f"{self.mapping.output_type_code} at "
             f"{self.mapping.target_uinput}"
         )
 
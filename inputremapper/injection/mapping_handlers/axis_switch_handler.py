@@ -23,13 +23,13 @@ import evdev
 from inputremapper.configs.input_config import InputConfig
 
 from inputremapper.configs.input_config import InputCombination
-from inputremapper.configs.mapping import Mapping
 from inputremapper.injection.mapping_handlers.mapping_handler import (
     MappingHandler,
     HandlerEnums,
     InputEventHandler,
     ContextProtocol,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent, EventActions
 from inputremapper.logger import logger
 from inputremapper.utils import get_device_hash
@@ -57,7 +57,7 @@ class AxisSwitchHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         context: ContextProtocol,
         **_,
     ):
@@ -159,7 +159,9 @@ class AxisSwitchHandler(MappingHandler):
             self._axis_source = source
 
         if self._forward_device is None:
-            device_hash = get_device_hash(source)
+            # known since the injector prepared the preset, without asking the
+            # device again
+            device_hash = self._map_axis.origin_hash or get_device_hash(source)
             self._forward_device = self.context.get_forward_uinput(device_hash)
 
         # always cache the value
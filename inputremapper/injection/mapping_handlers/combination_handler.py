@@ -24,12 +24,13 @@ import evdev
 from evdev.ecodes import EV_ABS, EV_REL
 
 from inputremapper.configs.input_config import InputCombination
-from inputremapper.configs.mapping import Mapping
 from inputremapper.injection.mapping_handlers.mapping_handler import (
     MappingHandler,
     InputEventHandler,
     HandlerEnums,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
+from inputremapper.injection.stats import current_stats
 from inputremapper.input_event import InputEvent
 from inputremapper.logger import logger
 
@@ -49,7 +50,7 @@ class CombinationHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         context: Context,
         **_,
     ) -> None:
@@ -122,7 +123,7 @@ class CombinationHandler(MappingHandler):
             self.forward_release()
             event = event.modify(value=1)
         else:
-            if self._output_state or self.mapping.is_axis_mapping():
+            if self._output_state or self.mapping.is_axis_mapping:
                 # we ignore the suppress argument for release events
                 # otherwise we might end up with stuck keys
                 # (test_event_pipeline.test_combination)
@@ -176,6 +177,9 @@ class CombinationHandler(MappingHandler):
             logger.write(input_config, forward_to)
             forward_to.write(*input_config.type_and_code, 0)
             forward_to.syn()
+            stats = current_stats.get()
+            stats.uinput_writes += 1
+            stats.syn_reports += 1
 
     def needs_ranking(self) -> bool:
         return bool(self.input_configs)
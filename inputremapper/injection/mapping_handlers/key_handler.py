@@ -21,13 +21,13 @@ from typing import Tuple, Dict
 
 from inputremapper.configs.input_config import InputCombination
 from inputremapper import exceptions
-from inputremapper.configs.mapping import Mapping
 from inputremapper.exceptions import MappingParsingError
 from inputremapper.injection.global_uinputs import global_uinputs
 from inputremapper.injection.mapping_handlers.mapping_handler import (
     MappingHandler,
     HandlerEnums,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent
 from inputremapper.logger import logger
 from inputremapper.utils import get_evdev_constant_name
@@ -42,11 +42,11 @@ class KeyHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         **_,
     ):
         super().__init__(combination, mapping)
-        maps_to = mapping.get_output_type_code()
+        maps_to = mapping.output_type_code
         if not maps_to:
             raise MappingParsingError(
                 "Unable to create key handler from mapping", mapping=mapping
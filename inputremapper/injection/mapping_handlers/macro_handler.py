@@ -18,18 +18,24 @@
 # along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
 
 import asyncio
-from typing import Dict, Callable
+import time
+from typing import Dict, Callable, Optional
 
 from inputremapper.configs.input_config import InputCombination
-from inputremapper.configs.mapping import Mapping
 from inputremapper.injection.global_uinputs import global_uinputs
 from inputremapper.injection.macros.macro import Macro
 from inputremapper.injection.macros.parse import parse
+from inputremapper.injection.macros.profiler import (
+    MacroProfiler,
+    MacroStatistics,
+    current_statistics,
+)
 from inputremapper.injection.mapping_handlers.mapping_handler import (
     ContextProtocol,
     MappingHandler,
     HandlerEnums,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent
 from inputremapper.logger import logger
 
@@ -40,18 +46,31 @@ class MacroHandler(MappingHandler):
     # TODO: replace this by the macro itself
     _macro: Macro
     _active: bool
+    _statistics: Optional[MacroStatistics]
 
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         *,
         context: ContextProtocol,
+        macro: Optional[Macro] = None,
     ):
         super().__init__(combination, mapping)
         self._active = False
         assert self.mapping.output_symbol is not None
-        self._macro = parse(self.mapping.output_symbol, context, mapping)
+        if macro is None:
+            self._macro = parse(self.mapping.output_symbol, context, mapping)
+        else:
+            # it was compiled before the context existed, from the Mapping that
+            # isn't needed anymore
+            macro.bind_context(context, mapping)
+            self._macro = macro
+
+        self._statistics = None
+        profiler = getattr(context, "macro_profiler", None)
+        if isinstance(profiler, MacroProfiler):
+            self._statistics = profiler.get_statistics(mapping.format_name())
 
     def __str__(self):
         return f"MacroHandler"
@@ -65,10 +84,24 @@ class MacroHandler(MappingHandler):
 
     async def run_macro(self, handler: Callable):
         """Run the macro with the provided function."""
+        if self._statistics is None:
+            try:
+                await self._macro.run(handler)
+            except Exception as exception:
+                logger.error('Macro "%s" failed: %s', self._macro.code, exception)
+
+            return
+
+        # only affects the task of this macro, other macros have their own statistics
+        token = current_statistics.set(self._statistics)
+        start = time.perf_counter()
         try:
             await self._macro.run(handler)
         except Exception as exception:
             logger.error('Macro "%s" failed: %s', self._macro.code, exception)
+        finally:
+            self._statistics.add_run(time.perf_counter() - start)
+            current_statistics.reset(token)
 
     def notify(self, event: InputEvent, *_, **__) -> bool:
         if event.value == 1:
@@ -81,6 +114,12 @@ class MacroHandler(MappingHandler):
                 """Handler for macros."""
                 global_uinputs.write((type_, code, value), self.mapping.target_uinput)
 
+            def write_frame(events) -> None:
+                """Write multiple events followed by a single syn."""
+                global_uinputs.write_frame(events, self.mapping.target_uinput)
+
+            handler.write_frame = write_frame
+
             asyncio.ensure_future(self.run_macro(handler))
             return True
         else:
@@ -61,26 +61,22 @@ Step 2 and 3:
 from __future__ import annotations
 
 import enum
-from typing import Dict, Protocol, Set, Optional, List
+from typing import Dict, Protocol, Optional, List
 
 import evdev
 
 from inputremapper.configs.input_config import InputCombination, InputConfig
-from inputremapper.configs.mapping import Mapping
 from inputremapper.exceptions import MappingParsingError
+from inputremapper.injection.event_listeners import EventListener, EventListeners
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent
 from inputremapper.logger import logger
 
 
-class EventListener(Protocol):
-    async def __call__(self, event: evdev.InputEvent) -> None:
-        ...
-
-
 class ContextProtocol(Protocol):
     """The parts from context needed for handlers."""
 
-    listeners: Set[EventListener]
+    listeners: EventListeners
 
     def get_forward_uinput(self, origin_hash) -> evdev.UInput:
         pass
@@ -146,7 +142,7 @@ class MappingHandler:
     dynamically integrated in an event-pipeline by the mapping parser
     """
 
-    mapping: Mapping
+    mapping: MappingSpec
     # all input events this handler cares about
     # should always be a subset of mapping.input_combination
     input_configs: List[InputConfig]
@@ -156,7 +152,7 @@ class MappingHandler:
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         **_,
     ) -> None:
         """Initialize the handler
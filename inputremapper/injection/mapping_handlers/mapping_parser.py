@@ -20,7 +20,19 @@
 """Functions to assemble the mapping handler tree."""
 
 from collections import defaultdict
-from typing import Dict, List, Type, Optional, Set, Iterable, Sized, Tuple, Sequence
+from typing import (
+    Dict,
+    FrozenSet,
+    Hashable,
+    List,
+    Type,
+    Optional,
+    Set,
+    Iterable,
+    Sized,
+    Tuple,
+    Sequence,
+)
 
 from evdev.ecodes import EV_KEY, EV_ABS, EV_REL
 
@@ -29,6 +41,7 @@ from inputremapper.configs.mapping import Mapping
 from inputremapper.configs.preset import Preset
 from inputremapper.configs.system_mapping import DISABLE_CODE, DISABLE_NAME
 from inputremapper.exceptions import MappingParsingError
+from inputremapper.injection.macros.macro import Macro
 from inputremapper.injection.macros.parse import is_this_a_macro
 from inputremapper.injection.mapping_handlers.abs_to_abs_handler import AbsToAbsHandler
 from inputremapper.injection.mapping_handlers.abs_to_btn_handler import AbsToBtnHandler
@@ -48,6 +61,7 @@ from inputremapper.injection.mapping_handlers.mapping_handler import (
     ContextProtocol,
     InputEventHandler,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.injection.mapping_handlers.null_handler import NullHandler
 from inputremapper.injection.mapping_handlers.rel_to_abs_handler import RelToAbsHandler
 from inputremapper.injection.mapping_handlers.rel_to_btn_handler import RelToBtnHandler
@@ -57,6 +71,11 @@ from inputremapper.utils import get_evdev_constant_name
 
 EventPipelines = Dict[InputConfig, Set[InputEventHandler]]
 
+# The handlers of mappings that share input events with each other, by the specs
+# of those mappings. Handlers of such mappings depend on each other, because they
+# are ranked against each other.
+MappingGroups = Dict[FrozenSet[MappingSpec], List[MappingHandler]]
+
 mapping_handler_classes: Dict[HandlerEnums, Optional[Type[MappingHandler]]] = {
     # all available mapping_handlers
     HandlerEnums.abs2btn: AbsToBtnHandler,
@@ -76,27 +95,116 @@ mapping_handler_classes: Dict[HandlerEnums, Optional[Type[MappingHandler]]] = {
 }
 
 
-def parse_mappings(preset: Preset, context: ContextProtocol) -> EventPipelines:
-    """Create a dict with a list of MappingHandler for each InputEvent."""
-    handlers = []
+def parse_mapping_groups(
+    preset: Preset,
+    context: ContextProtocol,
+    macros: Optional[Dict[int, Macro]] = None,
+    previous: Optional[MappingGroups] = None,
+) -> MappingGroups:
+    """Create the handlers for each group of mappings that share input events.
+
+    Groups that can be found in previous are not parsed again. Their handlers are
+    reused as they are, including their state.
+
+    macros can contain the already parsed macros of the preset, see compile_macros.
+    """
+    previous = previous or {}
+    mapping_groups: MappingGroups = {}
+    macros = macros or {}
+    for mappings in _group_mappings(preset):
+        # the handlers only keep what they need of the mappings
+        specs = [MappingSpec.from_mapping(mapping) for mapping in mappings]
+        key = frozenset(specs)
+        if key in previous:
+            mapping_groups[key] = previous[key]
+            continue
+
+        group_macros = {
+            spec: macros[id(mapping)]
+            for spec, mapping in zip(specs, mappings)
+            if id(mapping) in macros
+        }
+        mapping_groups[key] = _parse_mapping_group(specs, context, group_macros)
+
+    return mapping_groups
+
+
+def get_event_pipelines(mapping_groups: MappingGroups) -> EventPipelines:
+    """Group all handlers by the input events they take care of."""
+    # One handler might end up in multiple groups if it takes care of multiple
+    # InputEvents
+    event_pipelines: EventPipelines = defaultdict(set)
+    for handlers in mapping_groups.values():
+        for handler in handlers:
+            assert handler.input_configs
+            for input_config in handler.input_configs:
+                logger.debug(
+                    "event-pipeline with entry point: %s %s",
+                    get_evdev_constant_name(*input_config.type_and_code),
+                    input_config.input_match_hash,
+                )
+                logger.debug_mapping_handler(handler)
+                event_pipelines[input_config].add(handler)
+
+    return event_pipelines
+
+
+def _group_mappings(preset: Iterable[Mapping]) -> List[List[Mapping]]:
+    """Find the groups of mappings that are connected by common input events."""
+    groups: List[List[Mapping]] = []
+    # the index of the group that each input event is in, by input_match_hash
+    group_of_input: Dict[Hashable, int] = {}
     for mapping in preset:
+        connected = {
+            group_of_input[input_config.input_match_hash]
+            for input_config in mapping.input_combination
+            if input_config.input_match_hash in group_of_input
+        }
+
+        # merge all groups that the mapping connects into a new one
+        group = [mapping]
+        for index in connected:
+            group.extend(groups[index])
+            groups[index] = []
+
+        groups.append(group)
+        for grouped_mapping in group:
+            for input_config in grouped_mapping.input_combination:
+                group_of_input[input_config.input_match_hash] = len(groups) - 1
+
+    return [group for group in groups if len(group) > 0]
+
+
+def _parse_mapping_group(
+    specs: List[MappingSpec],
+    context: ContextProtocol,
+    macros: Dict[MappingSpec, Macro],
+) -> List[MappingHandler]:
+    """Create the top level handlers of mappings that share input events."""
+    handlers = []
+    for spec in specs:
         # start with the last handler in the chain, each mapping only has one output,
         # but may have multiple inputs, therefore the last handler is a good starting
         # point to assemble the pipeline
-        handler_enum = _get_output_handler(mapping)
+        handler_enum = _get_output_handler(spec)
         constructor = mapping_handler_classes[handler_enum]
         if not constructor:
             logger.warning(
                 "a mapping handler '%s' for %s is not implemented",
                 handler_enum,
-                mapping.format_name(),
+                spec.format_name(),
             )
             continue
 
+        kwargs = {}
+        if handler_enum == HandlerEnums.macro and spec in macros:
+            kwargs["macro"] = macros[spec]
+
         output_handler = constructor(
-            mapping.input_combination,
-            mapping,
+            spec.input_combination,
+            spec,
             context=context,
+            **kwargs,
         )
 
         # layer other handlers on top until the outer handler needs ranking or can
@@ -124,21 +232,7 @@ def parse_mappings(preset: Preset, context: ContextProtocol) -> EventPipelines:
     for handler in ranked_handlers:
         handlers.extend(_create_event_pipeline(handler, context, ignore_ranking=True))
 
-    # group all handlers by the input events they take care of. One handler might end
-    # up in multiple groups if it takes care of multiple InputEvents
-    event_pipelines: EventPipelines = defaultdict(set)
-    for handler in handlers:
-        assert handler.input_configs
-        for input_config in handler.input_configs:
-            logger.debug(
-                "event-pipeline with entry point: %s %s",
-                get_evdev_constant_name(*input_config.type_and_code),
-                input_config.input_match_hash,
-            )
-            logger.debug_mapping_handler(handler)
-            event_pipelines[input_config].add(handler)
-
-    return event_pipelines
+    return handlers
 
 
 def _create_event_pipeline(
@@ -175,7 +269,7 @@ def _create_event_pipeline(
     return handlers
 
 
-def _get_output_handler(mapping: Mapping) -> HandlerEnums:
+def _get_output_handler(mapping: MappingSpec) -> HandlerEnums:
     """Determine the correct output handler.
 
     this is used as a starting point for the mapping parser
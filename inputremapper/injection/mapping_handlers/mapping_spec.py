@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# input-remapper - GUI for device specific keyboard mappings
+# Copyright (C) 2023 sezanzeb <proxima@sezanzeb.de>
+#
+# This file is part of input-remapper.
+#
+# input-remapper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# input-remapper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""What the handlers need to know about a mapping while injecting."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from inputremapper.configs.input_config import InputCombination
+from inputremapper.configs.mapping import Mapping, EMPTY_MAPPING_NAME
+
+
+@dataclass(frozen=True)
+class MappingSpec:
+    """The parts of a Mapping that are used to handle events.
+
+    Reading attributes of a pydantic model is slower than reading them from a
+    plain object, and values that are derived from them would be computed again
+    for each event. So they are computed once when the handlers are created, and
+    the Mapping itself isn't needed anymore afterwards.
+    """
+
+    # Todo: use slots=True instead, as soon as python 3.10 is in common distros
+    __slots__ = (
+        "input_combination",
+        "target_uinput",
+        "output_symbol",
+        "output_type",
+        "output_code",
+        "output_type_code",
+        "output_name_constant",
+        "name",
+        "is_axis_mapping",
+        "is_wheel_output",
+        "is_high_res_wheel_output",
+        "release_combination_keys",
+        "macro_key_sleep_ms",
+        "deadzone",
+        "gain",
+        "expo",
+        "rel_rate",
+        "rel_interval",
+        "rel_to_abs_input_cutoff",
+        "release_timeout",
+        "force_release_timeout",
+    )
+
+    input_combination: InputCombination
+    target_uinput: str
+    output_symbol: Optional[str]
+    output_type: Optional[int]
+    output_code: Optional[int]
+    # see Mapping.get_output_type_code
+    output_type_code: Optional[Tuple[int, int]]
+    output_name_constant: str
+    # the custom name, see format_name for something readable in any case
+    name: Optional[str]
+    is_axis_mapping: bool
+    is_wheel_output: bool
+    is_high_res_wheel_output: bool
+    release_combination_keys: bool
+    macro_key_sleep_ms: int
+    deadzone: float
+    gain: float
+    expo: float
+    rel_rate: int
+    # seconds between two events of the rel_rate
+    rel_interval: float
+    rel_to_abs_input_cutoff: int
+    release_timeout: float
+    force_release_timeout: bool
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping) -> MappingSpec:
+        return cls(
+            input_combination=mapping.input_combination,
+            target_uinput=mapping.target_uinput,
+            output_symbol=mapping.output_symbol,
+            output_type=mapping.output_type,
+            output_code=mapping.output_code,
+            output_type_code=mapping.get_output_type_code(),
+            output_name_constant=mapping.get_output_name_constant(),
+            name=mapping.name,
+            is_axis_mapping=mapping.is_axis_mapping(),
+            is_wheel_output=mapping.is_wheel_output(),
+            is_high_res_wheel_output=mapping.is_high_res_wheel_output(),
+            release_combination_keys=mapping.release_combination_keys,
+            macro_key_sleep_ms=mapping.macro_key_sleep_ms,
+            deadzone=mapping.deadzone,
+            gain=mapping.gain,
+            expo=mapping.expo,
+            rel_rate=mapping.rel_rate,
+            rel_interval=1 / mapping.rel_rate,
+            rel_to_abs_input_cutoff=mapping.rel_to_abs_input_cutoff,
+            release_timeout=mapping.release_timeout,
+            force_release_timeout=mapping.force_release_timeout,
+        )
+
+    def format_name(self) -> str:
+        """Get the custom-name or a readable representation of the combination."""
+        if self.name:
+            return self.name
+
+        if self.input_combination == InputCombination.empty_combination():
+            return EMPTY_MAPPING_NAME
+
+        return self.input_combination.beautify()
@@ -33,7 +33,6 @@ from evdev.ecodes import (
 from inputremapper.configs.input_config import InputCombination, InputConfig
 from inputremapper import exceptions
 from inputremapper.configs.mapping import (
-    Mapping,
     WHEEL_SCALING,
     WHEEL_HI_RES_SCALING,
     REL_XY_SCALING,
@@ -46,6 +45,7 @@ from inputremapper.injection.mapping_handlers.mapping_handler import (
     HandlerEnums,
     InputEventHandler,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent, EventActions
 from inputremapper.logger import logger
 
@@ -73,7 +73,7 @@ class RelToAbsHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         **_,
     ) -> None:
         super().__init__(combination, mapping)
@@ -115,8 +115,8 @@ class RelToAbsHandler(MappingHandler):
     @property
     def child(self):  # used for logging
         return (
-            f"maps to: {self.mapping.get_output_name_constant()} "
-            f"{self.mapping.get_output_type_code()} at "
+            f"maps to: {self.mapping.output_name_constant} "
+            f"{self.mapping.output_type_code} at "
             f"{self.mapping.target_uinput}"
         )
 
@@ -24,11 +24,11 @@ import evdev
 from evdev.ecodes import EV_REL
 
 from inputremapper.configs.input_config import InputCombination, InputConfig
-from inputremapper.configs.mapping import Mapping
 from inputremapper.injection.mapping_handlers.mapping_handler import (
     MappingHandler,
     InputEventHandler,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent, EventActions
 from inputremapper.logger import logger
 
@@ -48,7 +48,7 @@ class RelToBtnHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         **_,
     ) -> None:
         super().__init__(combination, mapping)
@@ -76,7 +76,7 @@ class RelToBtnHandler(MappingHandler):
         suppress: bool,
     ):
         while time.time() < self._last_activation + self.mapping.release_timeout:
-            await asyncio.sleep(1 / self.mapping.rel_rate)
+            await asyncio.sleep(self.mapping.rel_interval)
 
         if self._abort_release:
             self._abort_release = False
@@ -32,7 +32,6 @@ from evdev.ecodes import (
 from inputremapper.configs.input_config import InputCombination, InputConfig
 from inputremapper import exceptions
 from inputremapper.configs.mapping import (
-    Mapping,
     REL_XY_SCALING,
     WHEEL_SCALING,
     WHEEL_HI_RES_SCALING,
@@ -44,6 +43,7 @@ from inputremapper.injection.mapping_handlers.mapping_handler import (
     HandlerEnums,
     InputEventHandler,
 )
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.input_event import InputEvent
 from inputremapper.logger import logger
 
@@ -90,7 +90,7 @@ class RelToRelHandler(MappingHandler):
     def __init__(
         self,
         combination: InputCombination,
-        mapping: Mapping,
+        mapping: MappingSpec,
         **_,
     ) -> None:
         super().__init__(combination, mapping)
@@ -215,8 +215,8 @@ class RelToRelHandler(MappingHandler):
         transformed = self._transform(input_value / self._max_observed_input)
         transformed *= self._max_observed_input
 
-        is_wheel_output = self.mapping.is_wheel_output()
-        is_hi_res_wheel_output = self.mapping.is_high_res_wheel_output()
+        is_wheel_output = self.mapping.is_wheel_output
+        is_hi_res_wheel_output = self.mapping.is_high_res_wheel_output
 
         horizontal = self.mapping.output_code in (
             REL_HWHEEL_HI_RES,
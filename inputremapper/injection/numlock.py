@@ -21,63 +21,42 @@
 """Functions to handle numlocks.
 
 For unknown reasons the numlock status can change when starting injections,
-which is why these functions exist.
+which is why these functions exist. They use the numlock leds of the devices,
+which works without a display server, and without starting any process.
 """
 
+from typing import Optional, Union
 
-import re
-import subprocess
+import evdev
+from evdev.ecodes import EV_LED, EV_SYN, LED_NUML, SYN_REPORT
 
 from inputremapper.logger import logger
+from inputremapper.utils import get_device_capabilities
 
 
-def is_numlock_on():
-    """Get the current state of the numlock."""
-    try:
-        xset_q = subprocess.check_output(
-            ["xset", "q"],
-            stderr=subprocess.STDOUT,
-        ).decode()
-        num_lock_status = re.search(r"Num Lock:\s+(.+?)\s", xset_q)
-
-        if num_lock_status is not None:
-            return num_lock_status[1] == "on"
+def is_numlock_on(device: evdev.InputDevice) -> Optional[bool]:
+    """Get the state of the numlock led, None if the device has none."""
+    if LED_NUML not in get_device_capabilities(device).get(EV_LED, []):
+        return None
 
-        return False
-    except (FileNotFoundError, subprocess.CalledProcessError):
-        # tty
+    try:
+        return LED_NUML in device.leds()
+    except OSError as error:
+        # it might have disappeared
+        logger.debug("Failed to read the leds of %s: %s", device.path, error)
         return None
 
 
-def set_numlock(state):
-    """Set the numlock to a given state of True or False."""
+def set_numlock(
+    device: Union[evdev.InputDevice, evdev.UInput],
+    state: Optional[bool],
+) -> None:
+    """Set the numlock led of the device or uinput to True or False."""
     if state is None:
         return
 
-    value = {True: "on", False: "off"}[state]
-
     try:
-        subprocess.check_output(["numlockx", value])
-    except subprocess.CalledProcessError:
-        # might be in a tty
-        pass
-    except FileNotFoundError:
-        # doesn't seem to be installed everywhere
-        logger.debug("numlockx not found")
-
-
-def ensure_numlock(func):
-    """Decorator to reset the numlock to its initial state afterwards."""
-
-    def wrapped(*args, **kwargs):
-        # for some reason, grabbing a device can modify the num lock state.
-        # remember it and apply back later
-        numlock_before = is_numlock_on()
-
-        result = func(*args, **kwargs)
-
-        set_numlock(numlock_before)
-
-        return result
-
-    return wrapped
+        device.write(EV_LED, LED_NUML, int(state))
+        device.write(EV_SYN, SYN_REPORT, 0)
+    except OSError as error:
+        logger.debug("Failed to set the numlock led: %s", error)
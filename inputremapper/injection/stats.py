@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# input-remapper - GUI for device specific keyboard mappings
+# Copyright (C) 2023 sezanzeb <proxima@sezanzeb.de>
+#
+# This file is part of input-remapper.
+#
+# input-remapper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# input-remapper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""Counters about the work of the injection process.
+
+They are always collected, because incrementing them is cheap compared to
+reading and writing events. Get them via the `get_stats` method of the daemon.
+
+The counters of the injection that is currently running are found via the
+`current_stats` context variable, because multiple injections can share a process
+in the injection host. The cpu time and rss are those of the whole process though.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Union
+
+
+def get_rss() -> int:
+    """The resident set size of this process in bytes."""
+    with open("/proc/self/statm", "r") as file:
+        pages = int(file.read().split()[1])
+
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class InjectorStats:
+    """Counters of a single injection."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Start counting from zero."""
+        # by path of the source device
+        self.events_read: Dict[str, int] = defaultdict(int)
+        self.events_forwarded = 0
+        # by the class name of the mapping handler that took care of the event
+        self.events_handled: Dict[str, int] = defaultdict(int)
+        # events that have been written to any uinput, except for EV_SYN
+        self.uinput_writes = 0
+        self.syn_reports = 0
+        # errors while handling events, that were logged and ignored
+        self.exceptions = 0
+
+    def to_dict(self) -> Dict[str, Union[int, float, Dict[str, int]]]:
+        """The counters, and the cpu time in seconds and rss in bytes."""
+        return {
+            "events_read": dict(self.events_read),
+            "events_forwarded": self.events_forwarded,
+            "events_handled": dict(self.events_handled),
+            "uinput_writes": self.uinput_writes,
+            "syn_reports": self.syn_reports,
+            "exceptions": self.exceptions,
+            "cpu_time": time.process_time(),
+            "rss": get_rss(),
+        }
+
+
+# Every injection sets its own InjectorStats before it creates its tasks, which
+# inherit it. The default collects what happens outside of any injection.
+current_stats: contextvars.ContextVar[InjectorStats] = contextvars.ContextVar(
+    "current_stats", default=InjectorStats()
+)
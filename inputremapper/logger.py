@@ -240,21 +240,29 @@ logger.setLevel(logging.INFO)
 logging.getLogger("asyncio").setLevel(logging.WARNING)
 
 
-# using pkg_resources to figure out the version fails in many cases,
+# using the package metadata to figure out the version fails in many cases,
 # so we hardcode it instead
 VERSION = "2.0.1"
-EVDEV_VERSION = None
-try:
-    # pkg_resources very commonly fails/breaks
-    import pkg_resources
 
-    EVDEV_VERSION = pkg_resources.require("evdev")[0].version
-except Exception as error:
-    # there have been pkg_resources.DistributionNotFound and
-    # pkg_resources.ContextualVersionConflict errors so far.
-    # We can safely ignore all Exceptions here
-    logger.info("Could not figure out the version")
-    logger.debug(error)
+
+def get_evdev_version():
+    """Get the version of python-evdev, or None if it can't be figured out.
+
+    This is not done on import, because it is slow and commands like
+    input-remapper-control should start fast.
+    """
+    # pylint: disable=import-outside-toplevel
+    from importlib.metadata import version
+
+    try:
+        return version("evdev")
+    except Exception as error:
+        # there have been various errors with broken installations so far.
+        # We can safely ignore all Exceptions here
+        logger.info("Could not figure out the version")
+        logger.debug(error)
+        return None
+
 
 # check if the version is something like 1.5.0-beta or 1.5.0-beta.5
 IS_BETA = "beta" in VERSION
@@ -269,8 +277,9 @@ def log_info(name="input-remapper"):
         COMMIT_HASH,
     )
 
-    if EVDEV_VERSION:
-        logger.info("python-evdev %s", EVDEV_VERSION)
+    evdev_version = get_evdev_version()
+    if evdev_version:
+        logger.info("python-evdev %s", evdev_version)
 
     if is_debug():
         logger.warning(
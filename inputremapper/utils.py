@@ -20,27 +20,79 @@
 
 """Utility functions."""
 
+import os
 import sys
 from hashlib import md5
-from typing import Optional
+from typing import Optional, Dict, List, Tuple
 
 import evdev
 
 
 DeviceHash = str
 
+# What is known about the device nodes by path: the identity of the node, its hash
+# and its capabilities without absinfo.
+_device_cache: Dict[str, Tuple[str, DeviceHash, Dict[int, List[int]]]] = {}
+
 
 def is_service() -> bool:
     return sys.argv[0].endswith("input-remapper-service")
 
 
-def get_device_hash(device: evdev.InputDevice) -> DeviceHash:
-    """get a unique hash for the given device"""
+def get_device_identity(path: os.PathLike) -> Optional[str]:
+    """Something cheap that changes when a different device appears at the path."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return f"{stat.st_rdev}:{stat.st_ino}"
+
+
+def _get_device_info(
+    device: evdev.InputDevice,
+) -> Tuple[DeviceHash, Dict[int, List[int]]]:
+    identity = get_device_identity(device.path)
+    cached = _device_cache.get(device.path)
+    if cached is not None and identity is not None and cached[0] == identity:
+        return cached[1], cached[2]
+
+    capabilities = device.capabilities(absinfo=False)
     # the builtin hash() function can not be used because it is randomly
     # seeded at python startup.
     # a non-cryptographic hash would be faster but there is none in the standard lib
-    s = str(device.capabilities(absinfo=False)) + device.name
-    return md5(s.encode()).hexdigest().lower()
+    s = str(capabilities) + device.name
+    device_hash = md5(s.encode()).hexdigest().lower()
+
+    if identity is None:
+        # the node is gone, or the device isn't a node
+        _device_cache.pop(device.path, None)
+    else:
+        _device_cache[device.path] = (identity, device_hash, capabilities)
+
+    return device_hash, capabilities
+
+
+def get_device_hash(device: evdev.InputDevice) -> DeviceHash:
+    """get a unique hash for the given device
+
+    Computed once for each device node, until a different device appears at its
+    path.
+    """
+    return _get_device_info(device)[0]
+
+
+def get_device_capabilities(device: evdev.InputDevice) -> Dict[int, List[int]]:
+    """The capabilities of the device without absinfo, cached like its hash.
+
+    Don't modify them.
+    """
+    return _get_device_info(device)[1]
+
+
+def forget_device(path: os.PathLike) -> None:
+    """Drop what is known about the device node, because it was removed."""
+    _device_cache.pop(path, None)
 
 
 def get_evdev_constant_name(type_: Optional[int], code: Optional[int], *_) -> str:
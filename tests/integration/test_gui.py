@@ -1774,7 +1774,7 @@ class TestGui(GuiTestBase):
         self.controller.load_group("Foo Device 2")
 
         with spy(self.daemon, "set_config_dir") as spy1:
-            with spy(self.daemon, "start_injecting") as spy2:
+            with spy(self.daemon, "queue_start_injecting") as spy2:
                 self.start_injector_btn.clicked()
                 gtk_iteration()
                 # correctly uses group.key, not group.name
@@ -23,7 +23,7 @@ from __future__ import annotations
 import dataclasses
 import json
 from hashlib import md5
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 import time
 
 import evdev
@@ -50,6 +50,9 @@ class Fixture:
     # uniq is typically empty
     uniq: str = ""
 
+    # the leds that are on, if it has EV_LED capabilities
+    leds: List[int] = dataclasses.field(default_factory=list)
+
     def __hash__(self):
         return hash(self.path)
 
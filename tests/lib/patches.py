@@ -22,12 +22,14 @@ from __future__ import annotations
 
 import asyncio
 import copy
+import itertools
 import os
 import subprocess
 import time
 from pickle import UnpicklingError
 
 import evdev
+from pydbus.generic import signal
 
 from inputremapper.utils import get_evdev_constant_name
 from tests.lib.constants import EVENT_READ_TIMEOUT, MIN_ABS, MAX_ABS
@@ -105,6 +107,21 @@ class InputDevice:
     def ungrab(self):
         logger.info("ungrab %s %s", self.name, self.path)
 
+    def close(self):
+        # the pipe of the fixture stays open for other InputDevices
+        pass
+
+    def leds(self, verbose=False):
+        return list(self._fixture.leds)
+
+    def write(self, type, code, value):
+        logger.info("%s written to %s", (type, code, value), self.path)
+        if type == evdev.ecodes.EV_LED:
+            if value and code not in self._fixture.leds:
+                self._fixture.leds.append(code)
+            if not value and code in self._fixture.leds:
+                self._fixture.leds.remove(code)
+
     async def async_read_loop(self):
         logger.info("starting read loop for %s", self.path)
         new_frame = asyncio.Event()
@@ -304,7 +321,7 @@ def patch_regrab_timeout():
     # no need for a high number in tests
     from inputremapper.injection.injector import Injector
 
-    Injector.regrab_timeout = 0.05
+    Injector.grab_deadline = 0.5
 
 
 def is_running_patch():
@@ -319,17 +336,26 @@ def patch_is_running():
 
 
 class FakeDaemonProxy:
+    injector_state_changed = signal()
+    job_changed = signal()
+
     def __init__(self):
         self.calls = {
             "stop_injecting": [],
             "get_state": [],
             "start_injecting": [],
+            "queue_stop_injecting": [],
+            "queue_start_injecting": [],
+            "reload_preset": [],
             "stop_all": 0,
             "set_config_dir": [],
             "autoload": 0,
             "autoload_single": [],
             "hello": [],
         }
+        self._job_ids = itertools.count(1)
+        # the final state of all queued jobs
+        self.job_result = "DONE"
 
     def stop_injecting(self, group_key: str) -> None:
         self.calls["stop_injecting"].append(group_key)
@@ -344,6 +370,27 @@ class FakeDaemonProxy:
         self.calls["start_injecting"].append((group_key, preset))
         return True
 
+    def queue_stop_injecting(self, group_key: str) -> str:
+        self.calls["queue_stop_injecting"].append(group_key)
+        return self._finish_job(group_key)
+
+    def queue_start_injecting(self, group_key: str, preset: str) -> str:
+        self.calls["queue_start_injecting"].append((group_key, preset))
+        return self._finish_job(group_key)
+
+    def reload_preset(self, group_key: str, preset: str) -> bool:
+        # nothing is being injected
+        self.calls["reload_preset"].append((group_key, preset))
+        return False
+
+    def _finish_job(self, group_key: str) -> str:
+        from gi.repository import GLib
+
+        job_id = str(next(self._job_ids))
+        # like the daemon, announce it after the job id was returned
+        GLib.idle_add(self.job_changed, job_id, group_key, self.job_result)
+        return job_id
+
     def stop_all(self) -> None:
         self.calls["stop_all"] += 1
 
@@ -19,6 +19,7 @@
 # along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
 from inputremapper.input_event import InputEvent
 from tests.lib.cleanup import quick_cleanup
+from tests.lib.logger import logger
 from evdev.ecodes import (
     EV_REL,
     EV_ABS,
@@ -28,8 +29,14 @@ from evdev.ecodes import (
     REL_HWHEEL_HI_RES,
 )
 import unittest
+import logging
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
 
 from inputremapper.injection.context import Context
+from inputremapper.logger import logger as inputremapper_logger
+from inputremapper.injection.macros.parse import compile_macros
 from inputremapper.configs.preset import Preset
 from inputremapper.configs.mapping import Mapping
 from inputremapper.configs.input_config import InputConfig, InputCombination
@@ -110,6 +117,152 @@ class TestContext(unittest.TestCase):
         # 7 unique input events in the preset
         self.assertEqual(7, len(context._handlers))
 
+    def test_compiled_macros(self):
+        preset = Preset()
+        macro_mapping = Mapping.from_combination(
+            InputCombination.from_tuples((1, 31)), "keyboard", "if_single(k(a), k(b))"
+        )
+        preset.add(macro_mapping)
+        preset.add(
+            Mapping.from_combination(
+                InputCombination.from_tuples((1, 32)), "keyboard", "b"
+            )
+        )
+
+        macros = compile_macros(preset)
+        self.assertEqual(list(macros.keys()), [id(macro_mapping)])
+        macro = macros[id(macro_mapping)]
+        self.assertIsNone(macro.context)
+
+        context = Context(preset, {}, {}, macros=macros)
+        self.assertEqual(len(context.get_notify_callbacks(InputEvent.key(31, 1))), 1)
+
+        # the handler uses the precompiled macro instead of parsing it again
+        self.assertIs(macro.context, context)
+        for child in macro.child_macros:
+            self.assertIs(child.context, context)
+
+    def test_update_preset(self):
+        preset = Preset()
+        preset.add(
+            Mapping.from_combination(
+                InputCombination.from_tuples((1, 31)), "keyboard", "a"
+            )
+        )
+        preset.add(
+            Mapping.from_combination(
+                InputCombination.from_tuples((1, 32)), "keyboard", "b"
+            )
+        )
+        # shares an input with the previous mapping
+        preset.add(
+            Mapping.from_combination(
+                InputCombination.from_tuples((1, 32), (1, 33)), "keyboard", "c"
+            )
+        )
+        context = Context(preset, {}, {})
+        self.assertEqual(len(context._mapping_groups), 2)
+        unchanged = context.get_notify_callbacks(InputEvent.key(31, 1))
+        changed = context.get_notify_callbacks(InputEvent.key(33, 1))
+
+        new_preset = Preset()
+        for mapping in preset:
+            new_preset.add(mapping.copy())
+        new_preset.get_mapping(
+            InputCombination.from_tuples((1, 32))
+        ).output_symbol = "d"
+
+        with patch.object(changed[0].__self__, "reset") as reset:
+            context.update_preset(new_preset)
+            reset.assert_called()
+
+        # the handlers of the mapping that didn't change are still the same
+        self.assertEqual(
+            context.get_notify_callbacks(InputEvent.key(31, 1)),
+            unchanged,
+        )
+        # the others were created again, including those of the connected mapping
+        self.assertNotEqual(
+            context.get_notify_callbacks(InputEvent.key(33, 1)),
+            changed,
+        )
+        self.assertEqual(len(context.get_notify_callbacks(InputEvent.key(32, 1))), 1)
+
+    def test_switch_preset(self):
+        presets = {}
+        for name, output_symbol in (("default", "a"), ("gaming", "b")):
+            presets[name] = Preset(f"/presets/{name}.json")
+            presets[name].add(
+                Mapping.from_combination(
+                    InputCombination.from_tuples((1, 31)), "keyboard", output_symbol
+                )
+            )
+
+        context = Context(presets["default"], {}, {})
+        default_callbacks = context.get_notify_callbacks(InputEvent.key(31, 1))
+        self.assertFalse(context.switch_preset("gaming"))
+        self.assertEqual(context.active_preset, "default")
+
+        context.preload_preset(presets["gaming"])
+        # preloading doesn't change anything yet
+        self.assertEqual(context.active_preset, "default")
+        self.assertIs(
+            context.get_notify_callbacks(InputEvent.key(31, 1)),
+            default_callbacks,
+        )
+
+        with patch.object(default_callbacks[0].__self__, "reset") as reset:
+            self.assertTrue(context.switch_preset("gaming"))
+            # the handlers of the previous preset release what they hold down
+            reset.assert_called()
+
+        self.assertEqual(context.active_preset, "gaming")
+        gaming_callbacks = context.get_notify_callbacks(InputEvent.key(31, 1))
+        self.assertNotEqual(gaming_callbacks, default_callbacks)
+
+        # the previous one can be switched back to
+        self.assertTrue(context.switch_preset("default"))
+        self.assertIs(
+            context.get_notify_callbacks(InputEvent.key(31, 1)),
+            default_callbacks,
+        )
+
+    def test_switch_preset_latency(self):
+        presets = []
+        for name in ("default", "gaming"):
+            preset = Preset(f"/presets/{name}.json")
+            for code in range(1, 100):
+                preset.add(
+                    Mapping.from_combination(
+                        InputCombination.from_tuples((1, code)), "keyboard", "a"
+                    )
+                )
+            presets.append(preset)
+
+        context = Context(presets[0], {}, {})
+        context.preload_preset(presets[1])
+
+        # without debug logs, like the service usually runs
+        self.addCleanup(inputremapper_logger.setLevel, inputremapper_logger.level)
+        inputremapper_logger.setLevel(logging.INFO)
+        switches = 1000
+        start = time.perf_counter()
+        for i in range(switches):
+            context.switch_preset(presets[(i + 1) % 2].name)
+        latency = (time.perf_counter() - start) / switches
+
+        logger.info(
+            "switching between presets with %d mappings: %.3f ms",
+            len(presets[0]),
+            latency * 1000,
+        )
+        self.assertLess(latency, 0.001)
+
+    def test_compile_broken_macro(self):
+        # usually prevented by the validation of Mapping
+        mapping = SimpleNamespace(output_symbol="k(a")
+        self.assertEqual(compile_macros([mapping]), {})
+
 
 if __name__ == "__main__":
     unittest.main()
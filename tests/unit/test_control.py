@@ -25,7 +25,11 @@
 from tests.lib.cleanup import quick_cleanup
 from tests.lib.tmp import tmp
 
+import io
+import json
 import os
+import subprocess
+import sys
 import time
 import unittest
 from unittest import mock
@@ -33,35 +37,58 @@ import collections
 from importlib.util import spec_from_loader, module_from_spec
 from importlib.machinery import SourceFileLoader
 
+from gi.repository import GLib, Gio
+
 from inputremapper.configs.global_config import global_config
-from inputremapper.daemon import Daemon
+from inputremapper.daemon import Daemon, BUS_NAME
 from inputremapper.configs.preset import Preset
 from inputremapper.configs.paths import get_preset_path
 from inputremapper.groups import groups
 
 
-def import_control():
-    """Import the core function of the input-remapper-control command."""
-    bin_path = os.path.join(
+# milliseconds. udev runs input-remapper-control for each new input device
+IMPORT_TIME_BUDGET = 100
+
+
+def get_bin_path():
+    return os.path.join(
         os.getcwd().replace("/tests", ""),
         "bin",
         "input-remapper-control",
     )
 
+
+def import_control():
+    """Import the core function of the input-remapper-control command."""
+    bin_path = get_bin_path()
+
     loader = SourceFileLoader("__not_main_idk__", bin_path)
     spec = spec_from_loader("__not_main_idk__", loader)
     module = module_from_spec(spec)
     spec.loader.exec_module(module)
 
-    return module.communicate, module.utils, module.internals
+    return module
 
 
-communicate, utils, internals = import_control()
+control = import_control()
+communicate, utils, internals = control.communicate, control.utils, control.internals
 
 
 options = collections.namedtuple(
     "options",
-    ["command", "config_dir", "preset", "device", "list_devices", "key_names", "debug"],
+    [
+        "command",
+        "config_dir",
+        "preset",
+        "device",
+        "list_devices",
+        "key_names",
+        "debug",
+        "wait",
+        "version",
+        "json",
+    ],
+    defaults=[False, False, False],
 )
 
 
@@ -69,6 +96,93 @@ class TestControl(unittest.TestCase):
     def tearDown(self):
         quick_cleanup()
 
+    def test_autoload_udev(self):
+        # udev runs it as root for each new device, without a config dir
+        bus = mock.MagicMock()
+        with mock.patch.object(
+            Gio, "bus_get_sync", return_value=bus
+        ) as bus_get_sync, mock.patch("inputremapper.user.USER", "root"), mock.patch(
+            "inputremapper.daemon.Daemon.connect"
+        ) as connect:
+            control.main(
+                options(
+                    "autoload", None, None, ["/dev/input/event3"], False, False, False
+                )
+            )
+
+        # the daemon is called directly, without connecting via pydbus
+        connect.assert_not_called()
+        bus_get_sync.assert_called_once_with(Gio.BusType.SYSTEM, None)
+        bus.call_sync.assert_called_once()
+        args = bus.call_sync.call_args[0]
+        self.assertEqual(
+            args[:4],
+            (control.BUS_NAME, control.BUS_PATH, control.BUS_NAME, "autoload_single"),
+        )
+        self.assertEqual(args[4].unpack(), ("/dev/input/event3",))
+        # it doesn't start the daemon if it isn't running
+        self.assertEqual(args[6], Gio.DBusCallFlags.NO_AUTO_START)
+        self.assertEqual(args[7], control.AUTOLOAD_TIMEOUT)
+        # like pydbus publishes the daemon
+        self.assertEqual(control.BUS_NAME, BUS_NAME)
+        self.assertEqual(control.BUS_PATH, "/" + BUS_NAME.replace(".", "/"))
+
+    def test_autoload_udev_daemon_not_running(self):
+        bus = mock.MagicMock()
+        bus.call_sync.side_effect = GLib.Error("The name is not activatable")
+        with mock.patch.object(Gio, "bus_get_sync", return_value=bus), mock.patch(
+            "inputremapper.user.USER", "root"
+        ):
+            # this happens while booting, it is not an error
+            control.main(
+                options(
+                    "autoload", None, None, ["/dev/input/event3"], False, False, False
+                )
+            )
+
+        bus.call_sync.assert_called_once()
+
+    def test_import_time(self):
+        code = (
+            "from importlib.machinery import SourceFileLoader\n"
+            "from importlib.util import spec_from_loader, module_from_spec\n"
+            f"loader = SourceFileLoader('control', {repr(get_bin_path())})\n"
+            "spec = spec_from_loader('control', loader)\n"
+            "spec.loader.exec_module(module_from_spec(spec))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            stderr=subprocess.PIPE,
+            check=True,
+        )
+
+        # lines look like "import time:  self [us] |  cumulative | imported package"
+        total = 0
+        modules = []
+        for line in result.stderr.decode().splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+
+            _, cumulative, name = line.split("|")
+            modules.append(name.strip())
+            if not name.startswith("  "):
+                # nested imports are part of the cumulative time of their parent
+                total += int(cumulative)
+
+        # those are imported later, and only if needed
+        for module in [
+            "evdev",
+            "pydantic",
+            "pkg_resources",
+            "gi",
+            "pydbus",
+            "inputremapper.daemon",
+            "inputremapper.groups",
+        ]:
+            self.assertNotIn(module, modules)
+
+        self.assertLess(total / 1000, IMPORT_TIME_BUDGET)
+
     def test_autoload(self):
         device_keys = ["Foo Device 2", "Bar Device"]
         groups_ = [groups.find(key=key) for key in device_keys]
@@ -94,12 +208,12 @@ class TestControl(unittest.TestCase):
                 nonlocal stop_counter
                 stop_counter += 1
 
-        def start_injecting(device: str, preset: str):
-            print(f'\033[90mstart_injecting "{device}" "{preset}"\033[0m')
-            start_history.append((device, preset))
-            daemon.injectors[device] = Injector()
+        def start_injector(group, preset):
+            print(f'\033[90mstart_injector "{group.key}" "{preset.name}"\033[0m')
+            start_history.append((group.key, preset.name))
+            daemon.injectors[group.key] = Injector()
 
-        daemon.start_injecting = start_injecting
+        daemon._start_injector = start_injector
 
         global_config.set_autoload_preset(groups_[0].key, presets[0])
         global_config.set_autoload_preset(groups_[1].key, presets[1])
@@ -130,7 +244,7 @@ class TestControl(unittest.TestCase):
 
         # unless the injection in question ist stopped
         communicate(
-            options("stop", None, None, groups_[0].key, False, False, False),
+            options("stop", None, None, [groups_[0].key], False, False, False),
             daemon,
         )
         self.assertEqual(stop_counter, 1)
@@ -161,9 +275,11 @@ class TestControl(unittest.TestCase):
         self.assertEqual(stop_counter, 3)
         global_config.set_autoload_preset(groups_[1].key, presets[2])
         communicate(
-            options("autoload", None, None, groups_[1].key, False, False, False),
+            options("autoload", None, None, [groups_[1].key], False, False, False),
             daemon,
         )
+        # requests of single devices are debounced
+        daemon._process_autoload_queue()
         self.assertEqual(len(start_history), 4)
         self.assertEqual(start_history[3], (groups_[1].key, presets[2]))
         self.assertTrue(
@@ -176,9 +292,11 @@ class TestControl(unittest.TestCase):
         # autoloading for the same device again redundantly will not autoload
         # again
         communicate(
-            options("autoload", None, None, groups_[1].key, False, False, False),
+            options("autoload", None, None, [groups_[1].key], False, False, False),
             daemon,
         )
+        # requests of single devices are debounced
+        daemon._process_autoload_queue()
         self.assertEqual(len(start_history), 4)
         self.assertEqual(stop_counter, 3)
         self.assertFalse(
@@ -213,7 +331,9 @@ class TestControl(unittest.TestCase):
         daemon = Daemon()
 
         start_history = []
-        daemon.start_injecting = lambda *args: start_history.append(args)
+        daemon._start_injector = lambda group, preset: start_history.append(
+            (group.key, preset.name)
+        )
 
         global_config.path = os.path.join(config_dir, "config.json")
         global_config.load_config()
@@ -243,14 +363,14 @@ class TestControl(unittest.TestCase):
         daemon.stop_all = lambda *args: stop_all_history.append(args)
 
         communicate(
-            options("start", None, preset, group.paths[0], False, False, False),
+            options("start", None, preset, [group.paths[0]], False, False, False),
             daemon,
         )
         self.assertEqual(len(start_history), 1)
         self.assertEqual(start_history[0], (group.key, preset))
 
         communicate(
-            options("stop", None, None, group.paths[1], False, False, False),
+            options("stop", None, None, [group.paths[1]], False, False, False),
             daemon,
         )
         self.assertEqual(len(stop_history), 1)
@@ -262,6 +382,115 @@ class TestControl(unittest.TestCase):
         self.assertEqual(len(stop_all_history), 1)
         self.assertEqual(stop_all_history[0], ())
 
+    def test_start_stop_wait(self):
+        group = groups.find(key="Foo Device 2")
+        preset = "preset9"
+        daemon = Daemon()
+
+        def announce(*states):
+            # the daemon emits signals from its main loop
+            for state in states:
+                GLib.idle_add(daemon.injector_state_changed, group.key, state)
+
+        daemon.start_injecting = lambda *_: announce("STARTING", "RUNNING")
+        daemon.stop_injecting = lambda *_: announce("STOPPED")
+        start = options("start", None, preset, [group.key], False, False, False, True)
+        stop = options("stop", None, None, [group.key], False, False, False, True)
+        communicate(start, daemon)
+        communicate(stop, daemon)
+
+        daemon.start_injecting = lambda *_: announce("STARTING", "NO_GRAB")
+        with self.assertRaises(SystemExit) as context:
+            communicate(start, daemon)
+
+        self.assertEqual(context.exception.code, 7)
+
+    def test_many_devices(self):
+        group_1 = groups.find(key="Foo Device 2")
+        group_2 = groups.find(key="Bar Device")
+        devices = [group_1.paths[0], group_2.key]
+        preset = "preset9"
+        daemon = Daemon()
+
+        calls = []
+        daemon.start_injecting_many = lambda *args: calls.append(("start", *args))
+        daemon.stop_injecting_many = lambda *args: calls.append(("stop", *args))
+        daemon.get_states = lambda: {group_1.key: "RUNNING", group_2.key: "FAILED"}
+
+        communicate(
+            options("start", None, preset, devices, False, False, False), daemon
+        )
+        communicate(options("stop", None, None, devices, False, False, False), daemon)
+        self.assertEqual(
+            calls,
+            [
+                ("start", [(group_1.key, preset), (group_2.key, preset)]),
+                ("stop", [group_1.key, group_2.key]),
+            ],
+        )
+
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            communicate(
+                options("states", None, None, None, False, False, False), daemon
+            )
+
+        self.assertEqual(
+            stdout.getvalue(),
+            f"{group_1.key}: RUNNING\n{group_2.key}: FAILED\n",
+        )
+
+    def test_preload_switch(self):
+        group = groups.find(key="Foo Device 2")
+        daemon = Daemon()
+
+        calls = []
+        daemon.preload_preset = lambda *args: calls.append(("preload", *args)) or True
+        daemon.switch_preset = lambda *args: calls.append(("switch", *args)) or True
+
+        communicate(
+            options("preload", None, "b", [group.paths[0]], False, False, False),
+            daemon,
+        )
+        communicate(
+            options("switch", None, "b", [group.key], False, False, False),
+            daemon,
+        )
+        self.assertEqual(
+            calls,
+            [("preload", group.key, "b"), ("switch", group.key, "b")],
+        )
+
+        # the group is not being injected into
+        daemon.switch_preset = lambda *args: False
+        with self.assertRaises(SystemExit) as context:
+            communicate(
+                options("switch", None, "b", [group.key], False, False, False),
+                daemon,
+            )
+
+        self.assertEqual(context.exception.code, 8)
+
+    def test_stats(self):
+        daemon = Daemon()
+        stats = {"Foo Device 2": {"events_forwarded": 3, "events_handled": {}}}
+        daemon.get_stats = lambda: json.dumps(stats)
+
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            communicate(
+                options("stats", None, None, None, False, False, False, json=True),
+                daemon,
+            )
+
+        self.assertEqual(json.loads(stdout.getvalue()), stats)
+
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            communicate(options("stats", None, None, None, False, False, False), daemon)
+
+        self.assertEqual(
+            stdout.getvalue(),
+            "Foo Device 2\n  events_forwarded: 3\n  events_handled: {}\n",
+        )
+
     def test_config_not_found(self):
         key = "Foo Device 2"
         path = "~/a/preset.json"
@@ -274,10 +503,10 @@ class TestControl(unittest.TestCase):
         daemon.start_injecting = lambda *args: start_history.append(args)
         daemon.stop_injecting = lambda *args: stop_history.append(args)
 
-        options_1 = options("start", config_dir, path, key, False, False, False)
+        options_1 = options("start", config_dir, path, [key], False, False, False)
         self.assertRaises(SystemExit, lambda: communicate(options_1, daemon))
 
-        options_2 = options("stop", config_dir, None, key, False, False, False)
+        options_2 = options("stop", config_dir, None, [key], False, False, False)
         self.assertRaises(SystemExit, lambda: communicate(options_2, daemon))
 
     def test_autoload_config_dir(self):
@@ -70,11 +70,12 @@ class TestController(unittest.TestCase):
         self.message_broker = MessageBroker()
         uinputs = GlobalUInputs()
         uinputs.prepare_all()
+        self.daemon = FakeDaemonProxy()
         self.data_manager = DataManager(
             self.message_broker,
             GlobalConfig(),
             ReaderClient(self.message_broker, _Groups()),
-            FakeDaemonProxy(),
+            self.daemon,
             uinputs,
             system_mapping,
         )
@@ -899,15 +900,18 @@ class TestController(unittest.TestCase):
             calls.append(data)
 
         self.message_broker.subscribe(MessageType.status_msg, f)
-        mock = MagicMock(return_value=False)
-        self.data_manager.start_injecting = mock
+        # e.g. because the preset doesn't exist for the daemon
+        self.daemon.job_result = "FAILED"
         self.controller.start_injecting()
+        gtk_iteration(50)
 
-        mock.assert_called()
+        self.assertEqual(
+            self.daemon.calls["queue_start_injecting"], [("Foo Device 2", "preset2")]
+        )
         self.assertEqual(
             calls[-1],
             StatusData(
-                CTX_APPLY,
+                CTX_ERROR,
                 _("Failed to apply preset %s") % self.data_manager.active_preset.name,
             ),
         )
@@ -936,6 +940,9 @@ class TestController(unittest.TestCase):
         mock = MagicMock(return_value=InjectorState.STOPPED)
         self.data_manager.get_state = mock
         self.controller.stop_injecting()
+        # the job is done
+        gtk_iteration(50)
+        self.daemon.injector_state_changed("Foo Device 2", "STOPPED")
         gtk_iteration(50)
 
         mock.assert_called()
@@ -946,7 +953,7 @@ class TestController(unittest.TestCase):
         self.data_manager.load_group("Foo Device 2")
         self.data_manager.load_preset("preset2")
 
-        mock = MagicMock(return_value=InjectorState.RUNNING)
+        mock = MagicMock(return_value=InjectorState.STARTING)
         self.data_manager.get_state = mock
         calls: List[StatusData] = []
 
@@ -956,22 +963,36 @@ class TestController(unittest.TestCase):
         self.message_broker.subscribe(MessageType.status_msg, f)
 
         self.controller.start_injecting()
+        # the job is done
+        gtk_iteration(50)
+        # the daemon sends the new states, the gui doesn't poll them
+        self.daemon.injector_state_changed("Foo Device 2", "STARTING")
+        gtk_iteration(50)
+        self.assertEqual(calls[-1].msg, _("Starting injection..."))
+        mock.return_value = InjectorState.RUNNING
+        self.daemon.injector_state_changed("Foo Device 2", "RUNNING")
         gtk_iteration(50)
         self.assertEqual(calls[-1].msg, _("Applied preset %s") % "preset2")
 
         mock.return_value = InjectorState.FAILED
         self.controller.start_injecting()
         gtk_iteration(50)
+        self.daemon.injector_state_changed("Foo Device 2", "FAILED")
+        gtk_iteration(50)
         self.assertEqual(calls[-1].msg, _("Failed to apply preset %s") % "preset2")
 
         mock.return_value = InjectorState.NO_GRAB
         self.controller.start_injecting()
         gtk_iteration(50)
+        self.daemon.injector_state_changed("Foo Device 2", "NO_GRAB")
+        gtk_iteration(50)
         self.assertEqual(calls[-1].msg, "The device was not grabbed")
 
         mock.return_value = InjectorState.UPGRADE_EVDEV
         self.controller.start_injecting()
         gtk_iteration(50)
+        self.daemon.injector_state_changed("Foo Device 2", "UPGRADE_EVDEV")
+        gtk_iteration(50)
         self.assertEqual(calls[-1].msg, "Upgrade python-evdev")
 
     def test_close(self):
@@ -29,14 +29,18 @@ from tests.lib.tmp import tmp
 from tests.lib.fixtures import fixtures
 
 import os
+import threading
 import unittest
 import time
 import subprocess
 import json
+from typing import Callable
+from unittest.mock import patch
 
 import evdev
 from evdev.ecodes import EV_KEY, KEY_B, KEY_A, ABS_X, BTN_A, BTN_B
 from pydbus import SystemBus
+from gi.repository import GLib
 
 from inputremapper.configs.system_mapping import system_mapping
 from inputremapper.configs.mapping import Mapping
@@ -46,7 +50,7 @@ from inputremapper.configs.paths import get_config_path, mkdir, get_preset_path
 from inputremapper.configs.input_config import InputCombination, InputConfig
 from inputremapper.configs.preset import Preset
 from inputremapper.injection.injector import InjectorState
-from inputremapper.daemon import Daemon
+from inputremapper.daemon import Daemon, JobState
 from inputremapper.injection.global_uinputs import global_uinputs
 
 
@@ -55,6 +59,28 @@ os_system = os.system
 dbus_get = type(SystemBus()).get
 
 
+def prepare_preset(group_key: str, preset_name: str = "preset7"):
+    """Save a preset for the group that maps KEY_A to "a"."""
+    preset = Preset(groups.find(key=group_key).get_preset_path(preset_name))
+    preset.add(
+        Mapping.from_combination(
+            InputCombination([InputConfig(type=EV_KEY, code=KEY_A)]),
+            "keyboard",
+            "a",
+        )
+    )
+    preset.save()
+
+
+def iterate_main_loop(until: Callable[[], bool], timeout: float = 5):
+    """Handle pending events of the main loop until the condition is met."""
+    start = time.time()
+    while not until() and time.time() - start < timeout:
+        time.sleep(0.01)
+        while GLib.MainContext.default().iteration(False):
+            pass
+
+
 class TestDaemon(unittest.TestCase):
     new_fixture_path = "/dev/input/event9876"
 
@@ -306,7 +332,7 @@ class TestDaemon(unittest.TestCase):
             path=self.new_fixture_path,
         )
 
-        self.daemon._autoload("25v7j9q4vtj")
+        self.daemon._autoload_batch(["25v7j9q4vtj"])
         # this is unknown, so the daemon will scan the devices again
 
         # test if the injector called groups.refresh successfully
@@ -463,14 +489,14 @@ class TestDaemon(unittest.TestCase):
         preset.save()
 
         # no autoloading is configured yet
-        self.daemon._autoload(group_key)
+        self.daemon._autoload_batch([group_key])
         self.assertNotIn(group_key, daemon.autoload_history._autoload_history)
         self.assertTrue(daemon.autoload_history.may_autoload(group_key, preset_name))
 
         global_config.set_autoload_preset(group_key, preset_name)
         len_before = len(self.daemon.autoload_history._autoload_history)
         # now autoloading is configured, so it will autoload
-        self.daemon._autoload(group_key)
+        self.daemon._autoload_batch([group_key])
         len_after = len(self.daemon.autoload_history._autoload_history)
         self.assertEqual(
             daemon.autoload_history._autoload_history[group_key][1], preset_name
@@ -480,7 +506,7 @@ class TestDaemon(unittest.TestCase):
         self.assertEqual(len_before + 1, len_after)
 
         # calling duplicate get_autoload does nothing
-        self.daemon._autoload(group_key)
+        self.daemon._autoload_batch([group_key])
         self.assertEqual(
             daemon.autoload_history._autoload_history[group_key][1], preset_name
         )
@@ -493,7 +519,7 @@ class TestDaemon(unittest.TestCase):
 
         # calling autoload for (yet) unknown devices does nothing
         len_before = len(self.daemon.autoload_history._autoload_history)
-        self.daemon._autoload("unknown-key-1234")
+        self.daemon._autoload_batch(["unknown-key-1234"])
         len_after = len(self.daemon.autoload_history._autoload_history)
         self.assertEqual(len_before, len_after)
 
@@ -557,6 +583,365 @@ class TestDaemon(unittest.TestCase):
         self.assertEqual(self.daemon.get_state(group.key), InjectorState.STARTING)
         self.assertIsNotNone(groups.find(key="Foo Device 2"))
 
+    def test_autoload_debounce(self):
+        preset_name = "preset7"
+        group_keys = ["Foo Device 2", "Qux/Device?"]
+        for group_key in group_keys:
+            prepare_preset(group_key, preset_name)
+            global_config.set_autoload_preset(group_key, preset_name)
+
+        self.daemon = Daemon()
+        history = self.daemon.autoload_history._autoload_history
+
+        with patch.object(GLib, "timeout_add") as timeout_add:
+            timeout_add.return_value = 1234
+            # udev requests autoloading for each event node of a device
+            for _ in range(3):
+                for group_key in group_keys:
+                    self.daemon.autoload_single(group_key)
+
+        # nothing happened yet, but the batch is scheduled once
+        self.assertEqual(len(history), 0)
+        self.assertEqual(len(self.daemon.injectors), 0)
+        timeout_add.assert_called_once()
+        self.assertEqual(
+            timeout_add.call_args[0][1], self.daemon._process_autoload_queue
+        )
+
+        with patch.object(GLib, "source_remove") as source_remove, patch.object(
+            groups, "update", wraps=groups.update
+        ) as update:
+            self.daemon._process_autoload_queue()
+            source_remove.assert_called_once_with(1234)
+
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(list(history), group_keys)
+        for group_key in group_keys:
+            self.assertEqual(self.daemon.get_state(group_key), InjectorState.STARTING)
+
+        # the queue is empty now
+        self.daemon._process_autoload_queue()
+        self.assertEqual(len(history), 2)
+
+        # autoloading everything takes care of pending requests as well
+        with patch.object(GLib, "timeout_add") as timeout_add:
+            timeout_add.return_value = 5678
+            self.daemon.autoload_single(group_keys[0])
+
+        with patch.object(GLib, "source_remove") as source_remove:
+            self.daemon.autoload()
+            source_remove.assert_called_once_with(5678)
+
+        self.assertIsNone(self.daemon._autoload_source)
+        self.assertEqual(len(self.daemon._autoload_queue), 0)
+
+    def test_autoload_path(self):
+        preset_name = "preset7"
+        group = groups.find(key="Foo Device 2")
+        prepare_preset(group.key, preset_name)
+        global_config.set_autoload_preset(group.key, preset_name)
+
+        self.daemon = Daemon()
+        history = self.daemon.autoload_history._autoload_history
+
+        # udev passes the paths of all new nodes, which belong to the same group
+        self.daemon.autoload_single("/dev/input/event11")
+        self.daemon.autoload_single("/dev/input/event10")
+        # nodes without a group are ignored
+        self.daemon.autoload_single("/dev/input/mouse0")
+        with patch.object(self.daemon, "_start_injector") as start_injector:
+            self.daemon._process_autoload_queue()
+            start_injector.assert_called_once()
+            self.assertEqual(start_injector.call_args[0][0].key, group.key)
+            self.assertEqual(start_injector.call_args[0][1].name, preset_name)
+
+        self.assertEqual(list(history), [group.key])
+
+    def test_injector_state_changed(self):
+        preset_name = "preset7"
+        group = groups.find(key="Foo Device 2")
+        prepare_preset(group.key, preset_name)
+
+        self.daemon = Daemon()
+        changes = []
+        self.daemon.injector_state_changed.connect(lambda *args: changes.append(args))
+
+        self.daemon.start_injecting(group.key, preset_name)
+        iterate_main_loop(lambda: (group.key, "RUNNING") in changes)
+        # the injector might already be running by the time it is watched
+        self.assertIn(
+            changes,
+            (
+                [(group.key, "STARTING"), (group.key, "RUNNING")],
+                [(group.key, "RUNNING")],
+            ),
+        )
+        num_changes = len(changes)
+
+        self.daemon.stop_injecting(group.key)
+        iterate_main_loop(lambda: group.key not in self.daemon._injector_watches)
+        self.assertEqual(changes[num_changes:], [(group.key, "STOPPED")])
+        # the process ended, so there is nothing left to watch
+        self.assertNotIn(group.key, self.daemon._injector_watches)
+
+    def test_jobs(self):
+        preset_name = "preset7"
+        group = groups.find(key="Foo Device 2")
+        prepare_preset(group.key, preset_name)
+
+        self.daemon = Daemon()
+        changes = []
+        self.daemon.job_changed.connect(lambda *args: changes.append(args))
+
+        start_job = self.daemon.queue_start_injecting(group.key, preset_name)
+        unknown_job = self.daemon.queue_start_injecting("unknown", preset_name)
+        # nothing is done until the main loop is idle
+        self.assertEqual(self.daemon.get_job_state(start_job), JobState.QUEUED)
+        self.assertNotIn(group.key, self.daemon.injectors)
+
+        iterate_main_loop(lambda: len(self.daemon._job_queue) == 0)
+        self.assertEqual(self.daemon.get_job_state(start_job), JobState.DONE)
+        self.assertEqual(self.daemon.get_job_state(unknown_job), JobState.FAILED)
+        self.assertIn(
+            self.daemon.get_state(group.key),
+            [InjectorState.STARTING, InjectorState.RUNNING],
+        )
+
+        stop_job = self.daemon.queue_stop_injecting(group.key)
+        iterate_main_loop(lambda: len(self.daemon._job_queue) == 0)
+        self.assertEqual(self.daemon.get_job_state(stop_job), JobState.DONE)
+        self.assertIsNone(self.daemon._job_source)
+
+        time.sleep(0.2)
+        self.assertEqual(self.daemon.get_state(group.key), InjectorState.STOPPED)
+        self.assertEqual(self.daemon.get_job_state("1234"), JobState.UNKNOWN)
+
+        for job_id, group_key, final_state in [
+            (start_job, group.key, "DONE"),
+            (unknown_job, "unknown", "FAILED"),
+            (stop_job, group.key, "DONE"),
+        ]:
+            self.assertEqual(
+                [change for change in changes if change[0] == job_id],
+                [
+                    (job_id, group_key, "QUEUED"),
+                    (job_id, group_key, "RUNNING"),
+                    (job_id, group_key, final_state),
+                ],
+            )
+
+    def test_job_loads_preset_off_the_main_loop(self):
+        preset_name = "preset7"
+        group = groups.find(key="Foo Device 2")
+        prepare_preset(group.key, preset_name)
+
+        self.daemon = Daemon()
+        loading = threading.Event()
+        loaded = threading.Event()
+        load_preset = self.daemon._load_preset
+
+        def slow_load_preset(*args):
+            loading.set()
+            loaded.wait(5)
+            return load_preset(*args)
+
+        with patch.object(self.daemon, "_load_preset", slow_load_preset):
+            start_job = self.daemon.queue_start_injecting(group.key, preset_name)
+            iterate_main_loop(loading.is_set)
+
+            # the main loop continues to handle other things in the meantime
+            handled = []
+            GLib.idle_add(lambda: handled.append(True))
+            iterate_main_loop(lambda: len(handled) > 0)
+            self.assertEqual(handled, [True])
+            self.assertEqual(self.daemon.get_job_state(start_job), JobState.RUNNING)
+            self.assertIsNone(self.daemon._job_source)
+
+            # other jobs wait for it
+            stop_job = self.daemon.queue_stop_injecting(group.key)
+            iterate_main_loop(lambda: False, timeout=0.1)
+            self.assertEqual(self.daemon.get_job_state(stop_job), JobState.QUEUED)
+
+            loaded.set()
+            iterate_main_loop(lambda: len(self.daemon._job_queue) == 0)
+
+        self.assertEqual(self.daemon.get_job_state(start_job), JobState.DONE)
+        self.assertEqual(self.daemon.get_job_state(stop_job), JobState.DONE)
+
+    def test_many(self):
+        preset_name = "preset7"
+        group_keys = ["Foo Device 2", "Bar Device"]
+        for group_key in group_keys:
+            prepare_preset(group_key, preset_name)
+
+        self.daemon = Daemon()
+        self.assertEqual(self.daemon.get_states(), {})
+
+        with patch.object(groups, "update", wraps=groups.update) as update:
+            results = self.daemon.start_injecting_many(
+                [(group_keys[0], preset_name), (group_keys[1], preset_name)]
+                + [("unknown", preset_name)]
+            )
+            # the devices are only checked once
+            update.assert_called_once()
+
+        self.assertEqual(
+            results, {group_keys[0]: True, group_keys[1]: True, "unknown": False}
+        )
+        iterate_main_loop(lambda: set(self.daemon.get_states().values()) == {"RUNNING"})
+        self.assertEqual(
+            self.daemon.get_states(),
+            {group_keys[0]: "RUNNING", group_keys[1]: "RUNNING"},
+        )
+
+        self.daemon.stop_injecting_many(group_keys)
+        iterate_main_loop(lambda: set(self.daemon.get_states().values()) == {"STOPPED"})
+        self.assertEqual(
+            self.daemon.get_states(),
+            {group_keys[0]: "STOPPED", group_keys[1]: "STOPPED"},
+        )
+
+    def test_reload_preset(self):
+        group_key = "Foo Device 2"
+        prepare_preset(group_key, "preset7")
+        preset = Preset(groups.find(key=group_key).get_preset_path("preset8"))
+        preset.add(
+            Mapping.from_combination(
+                InputCombination([InputConfig(type=EV_KEY, code=KEY_A)]),
+                "keyboard",
+                "b",
+            )
+        )
+        preset.save()
+
+        self.daemon = Daemon()
+        # there is nothing to reload yet
+        self.assertFalse(self.daemon.reload_preset(group_key, "preset8"))
+
+        self.daemon.start_injecting(group_key, "preset7")
+        injector = self.daemon.injectors[group_key]
+        iterate_main_loop(lambda: injector.get_state() == InjectorState.RUNNING)
+
+        # the keyboard layout of the session changed in the meantime
+        b_keycode = 100
+        xmodmap_path = os.path.join(self.daemon.config_dir, "xmodmap.json")
+        with open(xmodmap_path, "w") as file:
+            json.dump({"b": b_keycode}, file)
+
+        start = time.time()
+        with patch.object(
+            self.daemon, "_load_xmodmap", wraps=self.daemon._load_xmodmap
+        ) as load_xmodmap:
+            self.assertTrue(self.daemon.reload_preset(group_key, "preset8"))
+            load_xmodmap.assert_called_once()
+
+        self.assertIs(self.daemon.injectors[group_key], injector)
+        self.assertEqual(injector.preset.name, "preset8")
+
+        # the same process maps the key to the new output, in the new layout
+        keyboard = fixtures.foo_device_2_keyboard
+        push_events(keyboard, [InputEvent.key(KEY_A, 1, keyboard.get_device_hash())])
+        self.assertTrue(uinput_write_history_pipe[0].poll(timeout=1))
+        logger.info("reload to new output: %.1f ms", (time.time() - start) * 1000)
+        event = uinput_write_history_pipe[0].recv()
+        self.assertEqual(event.event_tuple, (EV_KEY, b_keycode, 1))
+        self.assertTrue(injector.is_alive())
+        self.assertEqual(injector.get_state(), InjectorState.RUNNING)
+
+    def test_switch_preset(self):
+        group_key = "Foo Device 2"
+        prepare_preset(group_key, "preset7")
+        preset = Preset(groups.find(key=group_key).get_preset_path("preset8"))
+        preset.add(
+            Mapping.from_combination(
+                InputCombination([InputConfig(type=EV_KEY, code=KEY_A)]),
+                "keyboard",
+                "b",
+            )
+        )
+        preset.save()
+
+        self.daemon = Daemon()
+        self.assertFalse(self.daemon.switch_preset(group_key, "preset8"))
+
+        self.daemon.start_injecting(group_key, "preset7")
+        injector = self.daemon.injectors[group_key]
+        iterate_main_loop(lambda: injector.get_state() == InjectorState.RUNNING)
+
+        keyboard = fixtures.foo_device_2_keyboard
+
+        def press_a():
+            push_events(
+                keyboard,
+                [
+                    InputEvent.key(KEY_A, 1, keyboard.get_device_hash()),
+                    InputEvent.key(KEY_A, 0, keyboard.get_device_hash()),
+                ],
+            )
+            self.assertTrue(uinput_write_history_pipe[0].poll(timeout=1))
+            time.sleep(0.05)
+            event = uinput_write_history_pipe[0].recv()
+            while uinput_write_history_pipe[0].poll():
+                uinput_write_history_pipe[0].recv()
+
+            return event.code
+
+        self.assertTrue(self.daemon.preload_preset(group_key, "preset8"))
+        self.assertTrue(injector.is_preloaded("preset8"))
+        # still maps to the output of the active preset
+        self.assertEqual(press_a(), system_mapping.get("a"))
+
+        # switching back and forth
+        for preset_name, output_symbol in [("preset8", "b"), ("preset7", "a")]:
+            self.assertTrue(self.daemon.switch_preset(group_key, preset_name))
+            self.assertEqual(injector.preset.name, preset_name)
+            self.assertEqual(press_a(), system_mapping.get(output_symbol))
+
+        self.assertIs(self.daemon.injectors[group_key], injector)
+        self.assertEqual(injector.get_state(), InjectorState.RUNNING)
+
+    def test_stop_all_cancels_jobs(self):
+        preset_name = "preset7"
+        group = groups.find(key="Foo Device 2")
+        prepare_preset(group.key, preset_name)
+
+        self.daemon = Daemon()
+        job = self.daemon.queue_start_injecting(group.key, preset_name)
+        self.daemon.stop_all()
+
+        self.assertEqual(self.daemon.get_job_state(job), JobState.FAILED)
+        self.assertIsNone(self.daemon._job_source)
+        iterate_main_loop(lambda: False, timeout=0.1)
+        self.assertNotIn(group.key, self.daemon.injectors)
+
+    def test_autoload_many(self):
+        preset_name = "preset7"
+        group_keys = ["Foo Device 2", "Qux/Device?", "Bar Device"]
+        for group_key in group_keys:
+            prepare_preset(group_key, preset_name)
+            global_config.set_autoload_preset(group_key, preset_name)
+
+        self.daemon = Daemon()
+        with patch.object(groups, "update", wraps=groups.update) as update:
+            with patch.object(
+                self.daemon, "_load_xmodmap", wraps=self.daemon._load_xmodmap
+            ) as load_xmodmap:
+                self.daemon.autoload()
+
+        # the devices are looked at once, and the xmodmap is loaded once
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(load_xmodmap.call_count, 1)
+
+        # the injectors might already be running by the time they are asked
+        iterate_main_loop(
+            lambda: all(
+                self.daemon.get_state(group_key) == InjectorState.RUNNING
+                for group_key in group_keys
+            )
+        )
+        for group_key in group_keys:
+            self.assertEqual(self.daemon.get_state(group_key), InjectorState.RUNNING)
+
 
 if __name__ == "__main__":
     unittest.main()
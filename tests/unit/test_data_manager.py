@@ -40,6 +40,7 @@ from inputremapper.gui.messages.message_data import (
 )
 from inputremapper.gui.reader_client import ReaderClient
 from inputremapper.injection.global_uinputs import GlobalUInputs
+from inputremapper.injection.injector import InjectorState
 from tests.lib.cleanup import quick_cleanup
 from tests.lib.patches import FakeDaemonProxy
 from tests.lib.fixtures import prepare_presets
@@ -951,5 +952,21 @@ class TestDataManager(unittest.TestCase):
         self.data_manager.load_group("Foo Device")
         self.assertRaises(DataManagementError, self.data_manager.start_injecting)
 
+    def test_do_when_injector_state(self):
+        prepare_presets()
+        self.data_manager.load_group("Foo Device 2")
+        # the FakeDaemonProxy says that it is stopped
+        stopped = MagicMock()
+        self.data_manager.do_when_injector_state({InjectorState.STOPPED}, stopped)
+        stopped.assert_called_once()
+
+        running = MagicMock()
+        self.data_manager.do_when_injector_state({InjectorState.RUNNING}, running)
+        running.assert_not_called()
+        self.data_manager._daemon.injector_state_changed("Foo Device 2", "RUNNING")
+        running.assert_called_once()
+        self.data_manager._daemon.injector_state_changed("Foo Device 2", "RUNNING")
+        running.assert_called_once()
+
     def test_cannot_get_injector_state_without_group(self):
         self.assertRaises(DataManagementError, self.data_manager.get_state)
@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# input-remapper - GUI for device specific keyboard mappings
+# Copyright (C) 2023 sezanzeb <proxima@sezanzeb.de>
+#
+# This file is part of input-remapper.
+#
+# input-remapper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# input-remapper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+
+from evdev.ecodes import EV_KEY, EV_ABS, KEY_A, KEY_B, ABS_X
+
+from inputremapper.injection.event_listeners import EventListeners
+from inputremapper.input_event import InputEvent
+from tests.lib.cleanup import quick_cleanup
+
+
+class TestEventListeners(unittest.TestCase):
+    def tearDown(self):
+        quick_cleanup()
+
+    def test_filters(self):
+        listeners = EventListeners()
+        received = {"any": [], "presses": [], "b": []}
+
+        def listener(name):
+            return lambda event: received[name].append(event)
+
+        listeners.add(listener("any"))
+        listeners.add(listener("presses"), type_=EV_KEY, value=1)
+        listeners.add(listener("b"), type_=EV_KEY, code=KEY_B)
+        self.assertEqual(len(listeners), 3)
+
+        events = [
+            InputEvent.key(KEY_A, 1),
+            InputEvent.key(KEY_A, 0),
+            InputEvent.abs(ABS_X, 1),
+            InputEvent.key(KEY_B, 1),
+        ]
+        for event in events:
+            self.assertTrue(listeners.notify(event))
+
+        self.assertListEqual(received["any"], events)
+        self.assertListEqual(received["presses"], [events[0], events[3]])
+        self.assertListEqual(received["b"], [events[3]])
+
+    def test_not_notified(self):
+        listeners = EventListeners()
+        self.assertFalse(listeners.notify(InputEvent.key(KEY_A, 1)))
+
+        received = []
+        listeners.add(lambda event: received.append(event), type_=EV_ABS)
+        self.assertFalse(listeners.notify(InputEvent.key(KEY_A, 1)))
+        self.assertListEqual(received, [])
+
+    def test_remove_while_notifying(self):
+        listeners = EventListeners()
+        received = []
+
+        def listener(event):
+            received.append(event)
+            listeners.remove(listener)
+
+        def other_listener(event):
+            received.append(event)
+
+        listeners.add(listener, type_=EV_KEY)
+        listeners.add(other_listener, type_=EV_KEY)
+        event = InputEvent.key(KEY_A, 1)
+
+        listeners.notify(event)
+        self.assertListEqual(received, [event, event])
+        self.assertNotIn(listener, listeners)
+        self.assertIn(other_listener, listeners)
+
+        listeners.notify(event)
+        self.assertListEqual(received, [event, event, event])
+
+        listeners.remove(other_listener)
+        self.assertEqual(len(listeners), 0)
+        self.assertFalse(listeners.notify(event))
+
+    def test_failing_listener(self):
+        listeners = EventListeners()
+        received = []
+
+        def listener(_):
+            raise ValueError("foo")
+
+        listeners.add(listener)
+        listeners.add(lambda event: received.append(event))
+        event = InputEvent.key(KEY_A, 1)
+        listeners.notify(event)
+        self.assertListEqual(received, [event])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,7 +24,7 @@
 
 import asyncio
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import evdev
 from evdev.ecodes import (
@@ -53,13 +53,16 @@ from inputremapper.injection.mapping_handlers.abs_to_abs_handler import AbsToAbs
 from inputremapper.injection.mapping_handlers.abs_to_btn_handler import AbsToBtnHandler
 from inputremapper.injection.mapping_handlers.abs_to_rel_handler import AbsToRelHandler
 from inputremapper.injection.mapping_handlers.rel_to_rel_handler import RelToRelHandler
+from inputremapper.injection.mapping_handlers import axis_switch_handler
 from inputremapper.injection.mapping_handlers.axis_switch_handler import (
     AxisSwitchHandler,
 )
 from inputremapper.injection.mapping_handlers.hierarchy_handler import HierarchyHandler
 from inputremapper.injection.mapping_handlers.key_handler import KeyHandler
 from inputremapper.injection.mapping_handlers.macro_handler import MacroHandler
+from inputremapper.injection.macros.profiler import MacroProfiler
 from inputremapper.injection.mapping_handlers.mapping_handler import MappingHandler
+from inputremapper.injection.mapping_handlers.mapping_spec import MappingSpec
 from inputremapper.injection.mapping_handlers.rel_to_abs_handler import RelToAbsHandler
 from inputremapper.input_event import InputEvent, EventActions
 
@@ -90,6 +93,39 @@ class BaseTests:
         mock.reset.assert_called()
 
 
+class TestMappingSpec(unittest.TestCase):
+    def tearDown(self) -> None:
+        cleanup()
+
+    def test_from_mapping(self):
+        input_combination = InputCombination([InputConfig(type=EV_REL, code=REL_X)])
+        mapping = Mapping(
+            input_combination=input_combination.to_config(),
+            target_uinput="mouse",
+            output_type=EV_REL,
+            output_code=REL_WHEEL,
+            rel_rate=50,
+        )
+        spec = MappingSpec.from_mapping(mapping)
+        self.assertEqual(spec.input_combination, mapping.input_combination)
+        self.assertEqual(spec.output_type_code, (EV_REL, REL_WHEEL))
+        self.assertTrue(spec.is_axis_mapping)
+        self.assertTrue(spec.is_wheel_output)
+        self.assertFalse(spec.is_high_res_wheel_output)
+        self.assertEqual(spec.rel_interval, 0.02)
+        self.assertEqual(spec.format_name(), mapping.format_name())
+
+        # it is immutable, so that it can be used to find unchanged mappings
+        self.assertFalse(hasattr(spec, "__dict__"))
+        with self.assertRaises(AttributeError):
+            spec.gain = 2
+        self.assertEqual(spec, MappingSpec.from_mapping(mapping.copy()))
+        self.assertEqual(hash(spec), hash(MappingSpec.from_mapping(mapping.copy())))
+        self.assertNotEqual(
+            spec, MappingSpec.from_mapping(mapping.copy(update={"gain": 2}))
+        )
+
+
 class TestAxisSwitchHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         input_combination = InputCombination(
@@ -100,15 +136,47 @@ class TestAxisSwitchHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         )
         self.handler = AxisSwitchHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="mouse",
-                output_type=2,
-                output_code=1,
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="mouse",
+                    output_type=2,
+                    output_code=1,
+                )
             ),
             MagicMock(),
         )
 
+    def test_forward_device_by_origin_hash(self):
+        input_combination = InputCombination(
+            (
+                InputConfig(type=EV_REL, code=REL_X, origin_hash="mouse_hash"),
+                InputConfig(type=EV_KEY, code=KEY_A, origin_hash="keyboard_hash"),
+            )
+        )
+        context = MagicMock()
+        handler = AxisSwitchHandler(
+            input_combination,
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="mouse",
+                    output_type=EV_REL,
+                    output_code=REL_Y,
+                )
+            ),
+            context,
+        )
+        handler.set_sub_handler(MagicMock())
+
+        # the device isn't asked for its hash while events arrive
+        with patch.object(axis_switch_handler, "get_device_hash") as get_device_hash:
+            event = InputEvent.rel(REL_X, 1, origin_hash="mouse_hash")
+            handler.notify(event, source=InputDevice("/dev/input/event11"))
+
+        get_device_hash.assert_not_called()
+        context.get_forward_uinput.assert_called_once_with("mouse_hash")
+
 
 class TestAbsToBtnHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
     def setUp(self):
@@ -117,10 +185,12 @@ class TestAbsToBtnHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         )
         self.handler = AbsToBtnHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="mouse",
-                output_symbol="BTN_LEFT",
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="mouse",
+                    output_symbol="BTN_LEFT",
+                )
             ),
         )
 
@@ -130,11 +200,13 @@ class TestAbsToAbsHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         input_combination = InputCombination([InputConfig(type=EV_ABS, code=ABS_X)])
         self.handler = AbsToAbsHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="gamepad",
-                output_type=EV_ABS,
-                output_code=ABS_X,
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="gamepad",
+                    output_type=EV_ABS,
+                    output_code=ABS_X,
+                )
             ),
         )
 
@@ -156,11 +228,13 @@ class TestRelToAbsHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         input_combination = InputCombination([InputConfig(type=EV_REL, code=REL_X)])
         self.handler = RelToAbsHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="gamepad",
-                output_type=EV_ABS,
-                output_code=ABS_X,
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="gamepad",
+                    output_type=EV_ABS,
+                    output_code=ABS_X,
+                )
             ),
         )
 
@@ -219,11 +293,13 @@ class TestAbsToRelHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         input_combination = InputCombination([InputConfig(type=EV_ABS, code=ABS_X)])
         self.handler = AbsToRelHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="mouse",
-                output_type=EV_REL,
-                output_code=REL_X,
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="mouse",
+                    output_type=EV_REL,
+                    output_code=REL_X,
+                )
             ),
         )
 
@@ -282,10 +358,12 @@ class TestCombinationHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
 
         self.handler = CombinationHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="mouse",
-                output_symbol="BTN_LEFT",
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="mouse",
+                    output_symbol="BTN_LEFT",
+                )
             ),
             self.context_mock,
         )
@@ -409,10 +487,12 @@ class TestKeyHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         )
         self.handler = KeyHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="mouse",
-                output_symbol="BTN_LEFT",
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="mouse",
+                    output_symbol="BTN_LEFT",
+                )
             ),
         )
 
@@ -442,10 +522,12 @@ class TestMacroHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         self.context_mock = MagicMock()
         self.handler = MacroHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="mouse",
-                output_symbol="hold_keys(BTN_LEFT, BTN_RIGHT)",
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="mouse",
+                    output_symbol="hold_keys(BTN_LEFT, BTN_RIGHT)",
+                )
             ),
             context=self.context_mock,
         )
@@ -469,6 +551,42 @@ class TestMacroHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         self.assertIn(InputEvent.key(BTN_RIGHT, 0), history[-2:])
         self.assertEqual(len(history), 4)
 
+    async def test_profiler(self):
+        input_combination = InputCombination((InputConfig(type=1, code=3),))
+        mapping = Mapping(
+            input_combination=input_combination.to_config(),
+            target_uinput="keyboard",
+            output_symbol="set(foo, 1).key(a).hold_keys(b)",
+            macro_key_sleep_ms=20,
+        )
+        self.context_mock.macro_profiler = MacroProfiler()
+        handler = MacroHandler(
+            input_combination,
+            MappingSpec.from_mapping(mapping),
+            context=self.context_mock,
+        )
+        source = InputDevice("/dev/input/event11")
+
+        handler.notify(InputEvent.key(3, 1), source=source)
+        await asyncio.sleep(0.1)
+        handler.notify(InputEvent.key(3, 0), source=source)
+        await asyncio.sleep(0.05)
+
+        statistics = self.context_mock.macro_profiler.to_dict()
+        self.assertEqual(list(statistics.keys()), [mapping.format_name()])
+        statistics = statistics[mapping.format_name()]
+        self.assertEqual(statistics["runs"], 1)
+        self.assertGreaterEqual(statistics["total_time"], 0.1)
+        self.assertEqual(statistics["max_time"], statistics["total_time"])
+        # key(a) sleeps twice, hold_keys once after pressing b
+        self.assertGreaterEqual(statistics["pause_time"], 0.06)
+        self.assertGreater(statistics["trigger_wait_time"], 0.03)
+        self.assertGreater(statistics["variable_time"], 0)
+        self.assertLess(
+            statistics["pause_time"] + statistics["trigger_wait_time"],
+            statistics["total_time"],
+        )
+
 
 class TestRelToBtnHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
     def setUp(self):
@@ -477,10 +595,12 @@ class TestRelToBtnHandler(BaseTests, unittest.IsolatedAsyncioTestCase):
         )
         self.handler = RelToBtnHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                target_uinput="mouse",
-                output_symbol="BTN_LEFT",
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    target_uinput="mouse",
+                    output_symbol="BTN_LEFT",
+                )
             ),
         )
 
@@ -492,12 +612,14 @@ class TestRelToRelHanlder(BaseTests, unittest.IsolatedAsyncioTestCase):
         input_combination = InputCombination([InputConfig(type=EV_REL, code=REL_X)])
         self.handler = RelToRelHandler(
             input_combination,
-            Mapping(
-                input_combination=input_combination.to_config(),
-                output_type=EV_REL,
-                output_code=REL_Y,
-                output_value=20,
-                target_uinput="mouse",
+            MappingSpec.from_mapping(
+                Mapping(
+                    input_combination=input_combination.to_config(),
+                    output_type=EV_REL,
+                    output_code=REL_Y,
+                    output_value=20,
+                    target_uinput="mouse",
+                )
             ),
         )
 
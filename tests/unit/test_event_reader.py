@@ -19,7 +19,9 @@
 # along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
 
 import asyncio
+import time
 import unittest
+from unittest import mock
 
 import evdev
 from evdev.ecodes import (
@@ -41,12 +43,14 @@ from inputremapper.configs.preset import Preset
 from inputremapper.configs.system_mapping import system_mapping
 from inputremapper.configs.input_config import InputCombination, InputConfig
 from inputremapper.injection.context import Context
+from inputremapper.injection import event_reader as event_reader_module
 from inputremapper.injection.event_reader import EventReader
 from inputremapper.injection.global_uinputs import global_uinputs
 from inputremapper.input_event import InputEvent
 from inputremapper.utils import get_device_hash
 from tests.lib.fixtures import fixtures
 from tests.lib.cleanup import quick_cleanup
+from tests.lib.logger import logger
 
 
 class TestEventReader(unittest.IsolatedAsyncioTestCase):
@@ -183,7 +187,7 @@ class TestEventReader(unittest.IsolatedAsyncioTestCase):
         self.assertNotIn((EV_KEY, code_shift, 0), history)
 
         # after if_single takes an action, the listener should have been removed
-        self.assertSetEqual(context.listeners, set())
+        self.assertEqual(len(context.listeners), 0)
 
     async def test_if_single_joystick_under_threshold(self):
         """Triggers then because the joystick events value is too low."""
@@ -248,3 +252,83 @@ class TestEventReader(unittest.IsolatedAsyncioTestCase):
                 (EV_KEY, code_a, 0),
             ],
         )
+
+    async def unplug(self, source, mapping):
+        """Run an EventReader, and make its device appear to be unplugged."""
+        unplugged = [True]
+        path = source.path
+        list_devices = evdev.list_devices
+
+        def stat(fd):
+            return mock.Mock(st_nlink=0 if unplugged[0] else 1)
+
+        def list_plugged_devices():
+            return [p for p in list_devices() if not (unplugged[0] and p == path)]
+
+        for patch in [
+            mock.patch.object(event_reader_module, "os", mock.Mock(stat=stat)),
+            mock.patch.object(evdev, "list_devices", list_plugged_devices),
+        ]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        device_hash = get_device_hash(source)
+        context = Context(mapping, {device_hash: source}, {device_hash: evdev.UInput()})
+        event_reader = EventReader(context, source, self.stop_event)
+        task = asyncio.ensure_future(event_reader.run())
+
+        # the kernel wakes the reader up when the device is unplugged
+        source.push_events([InputEvent.abs(ABS_X, 0)])
+        await asyncio.sleep(0.1)
+        return context, event_reader, task, unplugged
+
+    async def test_reattach(self):
+        code_a = system_mapping.get("a")
+        trigger = evdev.ecodes.BTN_A
+        self.preset.add(
+            Mapping.from_combination(
+                InputCombination(
+                    [
+                        InputConfig(
+                            type=EV_KEY,
+                            code=trigger,
+                            origin_hash=fixtures.gamepad.get_device_hash(),
+                        )
+                    ]
+                ),
+                "keyboard",
+                "a",
+            )
+        )
+        context, event_reader, task, unplugged = await self.unplug(
+            self.gamepad_source, self.preset
+        )
+        self.assertFalse(task.done())
+
+        # it appears again
+        start = time.time()
+        unplugged[0] = False
+        while event_reader._source is self.gamepad_source:
+            self.assertLess(time.time() - start, 1)
+            await asyncio.sleep(0.001)
+
+        logger.info("Recovered after %.1f ms", (time.time() - start) * 1000)
+        device_hash = get_device_hash(self.gamepad_source)
+        self.assertIs(context.get_source(device_hash), event_reader._source)
+
+        # and the same context continues to map its events
+        self.gamepad_source.push_events([InputEvent.key(trigger, 1)])
+        await asyncio.sleep(0.1)
+        history = global_uinputs.get_uinput("keyboard").write_history
+        self.assertEqual(history, [(EV_KEY, code_a, 1)])
+
+        self.stop_event.set()
+        await asyncio.wait_for(task, timeout=1)
+
+    @mock.patch.object(EventReader, "reattach_timeout", 0.2)
+    async def test_reattach_timeout(self):
+        _, event_reader, task, _ = await self.unplug(self.gamepad_source, Preset())
+
+        # it stops like it did before it waited for the device
+        await asyncio.wait_for(task, timeout=1)
+        self.assertIs(event_reader._source, self.gamepad_source)
@@ -21,10 +21,14 @@
 
 from tests.lib.cleanup import quick_cleanup
 from tests.lib.fixtures import fixtures, keyboard_keys
+from tests.lib.logger import logger
+from tests.lib.tmp import tmp
 
 import os
+import time
 import unittest
 import json
+from unittest import mock
 
 import evdev
 from evdev.ecodes import EV_KEY, KEY_A
@@ -36,6 +40,10 @@ from inputremapper.groups import (
     classify,
     DeviceType,
     _Group,
+    _Groups,
+    _DeviceInfo,
+    _group_devices,
+    _probe,
 )
 
 
@@ -46,6 +54,27 @@ class FakePipe:
         self.groups = groups
 
 
+class SyntheticDevice:
+    """Quickly creates lots of devices, without the pipes that fixtures have."""
+
+    path = None
+    # how long opening each path takes, in seconds
+    delays = {}
+
+    def __init__(self, path):
+        time.sleep(self.delays.get(path, 0.005))
+        number = int(path.split("event")[-1])
+        self.path = path
+        self.name = f"Synthetic {number % 50}"
+        # 4 nodes per hardware device
+        self.phys = f"usb-{number // 4}/input{number % 4}"
+        self.uniq = ""
+        self.info = evdev.DeviceInfo(3, number // 4, 1, 1)
+
+    def capabilities(self, absinfo=True):
+        return {EV_KEY: [KEY_A]}
+
+
 class TestGroups(unittest.TestCase):
     def tearDown(self):
         quick_cleanup()
@@ -69,7 +98,8 @@ class TestGroups(unittest.TestCase):
         _FindGroups(pipe).run()
         self.assertIsInstance(pipe.groups, str)
 
-        groups.loads(pipe.groups)
+        devices = [_DeviceInfo.loads(info) for info in json.loads(pipe.groups)]
+        groups.set_groups(_group_devices(devices))
         self.maxDiff = None
         self.assertEqual(
             groups.dumps(),
@@ -146,7 +176,7 @@ class TestGroups(unittest.TestCase):
         groups2 = json.dumps(
             [group.dumps() for group in groups.filter(include_inputremapper=True)]
         )
-        self.assertEqual(pipe.groups, groups2)
+        self.assertEqual(groups.dumps(), groups2)
 
     def test_list_group_names(self):
         self.assertListEqual(
@@ -224,6 +254,230 @@ class TestGroups(unittest.TestCase):
         self.assertEqual(group2.name, "Foo Device")
         self.assertEqual(group3.name, "Foo Device")
 
+    def test_update(self):
+        groups.refresh()
+        self.assertIsNone(groups.find(key="Foo Device 3"))
+
+        with mock.patch("inputremapper.groups._probe", side_effect=_probe) as probe:
+            groups.update()
+            # nothing changed
+            probe.assert_not_called()
+
+            fixtures["/dev/input/event100"] = {
+                "capabilities": {evdev.ecodes.EV_KEY: keyboard_keys},
+                "phys": "usb-0000:03:00.0-6/input1",
+                "info": evdev.device.DeviceInfo(2, 1, 2, 1),
+                "name": "Foo Device",
+            }
+            groups.update()
+            # only the new device was opened
+            probe.assert_called_once_with("/dev/input/event100")
+            self.assertEqual(
+                groups.find(key="Foo Device 3").paths, ["/dev/input/event100"]
+            )
+            group = groups.find(path="/dev/input/event100")
+            self.assertEqual(group.key, "Foo Device 3")
+
+            probe.reset_mock()
+            fixtures.reset()
+            groups.update()
+            probe.assert_not_called()
+            self.assertIsNone(groups.find(key="Foo Device 3"))
+            self.assertIsNone(groups.find(path="/dev/input/event100"))
+
+    def test_update_replaced_device(self):
+        with mock.patch("inputremapper.groups.get_device_identity", lambda _: "old"):
+            groups.refresh()
+
+        with mock.patch("inputremapper.groups._probe", side_effect=_probe) as probe:
+            with mock.patch(
+                "inputremapper.groups.get_device_identity",
+                lambda path: "new" if path == "/dev/input/event30" else "old",
+            ):
+                groups.update()
+
+            # a different device appeared under the same path
+            probe.assert_called_once_with("/dev/input/event30")
+            self.assertIsNotNone(groups.find(key="gamepad"))
+
+    def test_update_failed_device(self):
+        path = "/dev/input/event100"
+        fixtures[path] = {
+            "capabilities": {evdev.ecodes.EV_KEY: keyboard_keys},
+            "phys": "usb-0000:03:00.0-6/input1",
+            "info": evdev.device.DeviceInfo(2, 1, 2, 1),
+            "name": "Foo Device",
+        }
+
+        def probe(probed_path):
+            # it can't be opened
+            return None if probed_path == path else _probe(probed_path)
+
+        with mock.patch("inputremapper.groups._probe", side_effect=probe) as mocked:
+            with mock.patch(
+                "inputremapper.groups.get_device_identity", lambda _: "old"
+            ):
+                groups.refresh()
+                self.assertIsNone(groups.find(path=path))
+
+                # it isn't tried again, because it is still the same node
+                mocked.reset_mock()
+                groups.update()
+                mocked.assert_not_called()
+
+            with mock.patch(
+                "inputremapper.groups.get_device_identity",
+                lambda probed_path: "new" if probed_path == path else "old",
+            ):
+                groups.update()
+                mocked.assert_called_once_with(path)
+
+    def test_update_after_set_groups(self):
+        groups.set_groups([])
+        self.assertIsNone(groups.find(key="gamepad"))
+        # the groups didn't come from looking at the devices, so they are all new
+        groups.update()
+        self.assertIsNotNone(groups.find(key="gamepad"))
+
+    def test_find(self):
+        group_1 = _Group(["/dev/a"], ["a"], [], "a")
+        group_2 = _Group(["/dev/b", "/dev/c"], ["b"], [], "b")
+        group_3 = _Group(["/dev/d"], ["input-remapper b"], [], "input-remapper b")
+        groups.set_groups([group_1, group_2, group_3])
+
+        self.assertIs(groups.find(key="b"), group_2)
+        self.assertIs(groups.find(path="/dev/c"), group_2)
+        self.assertIs(groups.find(name="b"), group_2)
+        self.assertIsNone(groups.find(key="b", path="/dev/a"))
+        self.assertIsNone(groups.find(key="c"))
+        self.assertIsNone(groups.find(path="/dev/d"))
+        self.assertIs(groups.find(path="/dev/d", include_inputremapper=True), group_3)
+
+    def test_device_cache(self):
+        cache_path = os.path.join(tmp, "cache", "devices.json")
+
+        def get_fingerprint(path):
+            return f"fingerprint {path}"
+
+        with mock.patch("inputremapper.groups._get_fingerprint", get_fingerprint):
+            groups_1 = _Groups()
+            groups_1.use_cache(cache_path)
+            groups_1.refresh()
+            self.assertTrue(os.path.exists(cache_path))
+
+            # like after a reboot
+            groups_2 = _Groups()
+            groups_2.use_cache(cache_path)
+            with mock.patch("inputremapper.groups._probe", side_effect=_probe) as probe:
+                groups_2.refresh()
+                probe.assert_not_called()
+
+            self.assertEqual(groups_2.dumps(), groups_1.dumps())
+            self.assertEqual(
+                groups_2._devices["/dev/input/event30"].capabilities,
+                fixtures["/dev/input/event30"].capabilities,
+            )
+
+        # a different device is at event30 now
+        with mock.patch(
+            "inputremapper.groups._get_fingerprint",
+            lambda path: "new" if path.endswith("event30") else get_fingerprint(path),
+        ):
+            groups_3 = _Groups()
+            groups_3.use_cache(cache_path)
+            with mock.patch("inputremapper.groups._probe", side_effect=_probe) as probe:
+                groups_3.refresh()
+                probe.assert_called_once_with("/dev/input/event30")
+
+            self.assertEqual(groups_3.dumps(), groups_1.dumps())
+
+            # and the cache was updated
+            groups_4 = _Groups()
+            groups_4.use_cache(cache_path)
+            self.assertEqual(groups_4._cached["/dev/input/event30"].fingerprint, "new")
+
+    def test_unwritable_device_cache(self):
+        # a file is in the way of the directory
+        with open(os.path.join(tmp, "cache"), "w"):
+            pass
+
+        groups_1 = _Groups()
+        groups_1.use_cache(os.path.join(tmp, "cache", "devices.json"))
+        with mock.patch("inputremapper.groups.logger") as logger_mock:
+            with mock.patch(
+                "inputremapper.groups._get_fingerprint", lambda path: "fingerprint"
+            ):
+                groups_1.refresh()
+                groups_1.refresh()
+
+        self.assertIsNotNone(groups_1.find(key="Foo Device 2"))
+        # the cache is disabled after the first attempt
+        logger_mock.warning.assert_called_once()
+        logger_mock.error.assert_not_called()
+
+    def test_broken_device_cache(self):
+        cache_path = os.path.join(tmp, "devices.json")
+        with open(cache_path, "w") as file:
+            file.write("[{")
+
+        groups_1 = _Groups()
+        groups_1.use_cache(cache_path)
+        groups_1.refresh()
+        self.assertIsNotNone(groups_1.find(key="Foo Device 2"))
+
+    def test_probe_many_devices(self):
+        paths = [f"/dev/input/event{i}" for i in range(400)]
+        with mock.patch.object(evdev, "list_devices", lambda: paths):
+            with mock.patch.object(evdev, "InputDevice", SyntheticDevice):
+                start = time.time()
+                groups.refresh()
+                duration = time.time() - start
+
+        logger.info("Probing %d devices took %.3fs", len(paths), duration)
+        self.assertEqual(len(groups), 100)
+        # one after the other, this would take at least 2 seconds
+        self.assertLess(duration, 1)
+
+    def test_probe_timeout(self):
+        paths = [f"/dev/input/event{i}" for i in range(8)]
+        with mock.patch.object(evdev, "list_devices", lambda: paths):
+            with mock.patch.object(evdev, "InputDevice", SyntheticDevice):
+                with mock.patch.object(
+                    SyntheticDevice, "delays", {"/dev/input/event1": 1}
+                ):
+                    with mock.patch("inputremapper.groups.PROBE_TIMEOUT", 0.1):
+                        start = time.time()
+                        groups.refresh()
+                        duration = time.time() - start
+
+        # the hanging device was skipped, the others still work
+        self.assertLess(duration, 0.5)
+        self.assertIsNone(groups.find(path="/dev/input/event1"))
+        self.assertEqual(
+            groups.find(path="/dev/input/event0").paths,
+            ["/dev/input/event0", "/dev/input/event2", "/dev/input/event3"],
+        )
+        self.assertEqual(len(groups.find(path="/dev/input/event4").paths), 4)
+
+    def test_probe_many_hanging_devices(self):
+        # more hanging devices than threads
+        paths = [f"/dev/input/event{i}" for i in range(20)]
+        delays = {f"/dev/input/event{i}": 2 for i in range(10)}
+        with mock.patch.object(evdev, "list_devices", lambda: paths):
+            with mock.patch.object(evdev, "InputDevice", SyntheticDevice):
+                with mock.patch.object(SyntheticDevice, "delays", delays):
+                    with mock.patch("inputremapper.groups.PROBE_TIMEOUT", 0.2):
+                        start = time.time()
+                        groups.refresh()
+                        duration = time.time() - start
+
+        # the timeouts of the devices overlap, and the other devices still work
+        self.assertLess(duration, 1)
+        for i in range(10):
+            self.assertIsNone(groups.find(path=f"/dev/input/event{i}"))
+        for i in range(10, 20):
+            self.assertIsNotNone(groups.find(path=f"/dev/input/event{i}"))
+
     def test_classify(self):
         # properly detects if the device is a gamepad
         EV_ABS = evdev.ecodes.EV_ABS
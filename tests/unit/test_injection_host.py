@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# input-remapper - GUI for device specific keyboard mappings
+# Copyright (C) 2023 sezanzeb <proxima@sezanzeb.de>
+#
+# This file is part of input-remapper.
+#
+# input-remapper is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# input-remapper is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
+
+from inputremapper.input_event import InputEvent
+from tests.lib.logger import logger
+from tests.lib.cleanup import cleanup
+from tests.lib.fixtures import fixtures
+from tests.lib.pipes import push_events, uinput_write_history_pipe
+from tests.unit.test_daemon import prepare_preset, iterate_main_loop
+
+import json
+import time
+import unittest
+
+from evdev.ecodes import EV_KEY, KEY_A
+
+from inputremapper.configs.global_config import global_config
+from inputremapper.configs.paths import get_config_path, mkdir
+from inputremapper.configs.system_mapping import system_mapping
+from inputremapper.daemon import Daemon
+from inputremapper.injection.global_uinputs import global_uinputs
+from inputremapper.injection.injection_host import HostedInjector
+from inputremapper.injection.injector import InjectorState
+
+
+class TestInjectionHost(unittest.TestCase):
+    group_keys = ["Foo Device 2", "Bar Device", "Qux/Device?"]
+    preset_name = "preset7"
+
+    def setUp(self):
+        self.daemon = None
+        mkdir(get_config_path())
+        for group_key in self.group_keys:
+            prepare_preset(group_key, self.preset_name)
+
+        global_config.set("injection_host", True)
+        global_config._save_config()
+
+        global_uinputs.devices = {}
+        global_uinputs.is_service = True
+
+    def tearDown(self):
+        if self.daemon is not None:
+            self.daemon.stop_all()
+            self.daemon = None
+
+        cleanup()
+
+    def start(self, group_keys):
+        for group_key in group_keys:
+            self.assertTrue(self.daemon.start_injecting(group_key, self.preset_name))
+
+        iterate_main_loop(
+            lambda: set(self.daemon.get_states().values()) == {"RUNNING"},
+        )
+        self.assertEqual(set(self.daemon.get_states().values()), {"RUNNING"})
+
+    def test_start_stop(self):
+        self.daemon = Daemon()
+        self.start(self.group_keys[:2])
+
+        injectors = [self.daemon.injectors[key] for key in self.group_keys[:2]]
+        for injector in injectors:
+            self.assertIsInstance(injector, HostedInjector)
+        host = self.daemon._injection_host
+        self.assertEqual(injectors[0].sentinel, host.sentinel)
+
+        push_events(fixtures.foo_device_2_keyboard, [InputEvent.key(KEY_A, 1)])
+        self.assertTrue(uinput_write_history_pipe[0].poll(timeout=1))
+        event = uinput_write_history_pipe[0].recv()
+        self.assertEqual(event.type, EV_KEY)
+        self.assertEqual(event.code, system_mapping.get("a"))
+        self.assertEqual(event.value, 1)
+
+        # the other injection keeps running
+        self.daemon.stop_injecting(self.group_keys[0])
+        iterate_main_loop(
+            lambda: self.daemon.get_state(self.group_keys[0]).value == "STOPPED"
+        )
+        self.assertEqual(
+            self.daemon.get_states(),
+            {self.group_keys[0]: "STOPPED", self.group_keys[1]: "RUNNING"},
+        )
+        self.assertFalse(injectors[0].is_alive())
+        self.assertTrue(host.is_alive())
+
+        # and a group can be injected into again
+        self.start(self.group_keys[:1])
+        self.assertIs(self.daemon._injection_host, host)
+
+        self.daemon.stop_all()
+        host.join(timeout=5)
+        self.assertFalse(host.is_alive())
+        self.assertEqual(
+            set(self.daemon.get_states().values()),
+            {"STOPPED"},
+        )
+
+    def test_stop_before_running(self):
+        """Injections can be stopped while they are still grabbing."""
+        self.daemon = Daemon()
+        group_key = self.group_keys[0]
+        # the host stops the first injection of the group for the second one
+        self.assertTrue(self.daemon.start_injecting(group_key, self.preset_name))
+        self.start([group_key])
+        host = self.daemon._injection_host
+
+        push_events(fixtures.foo_device_2_keyboard, [InputEvent.key(KEY_A, 1)])
+        self.assertTrue(uinput_write_history_pipe[0].poll(timeout=1))
+        event = uinput_write_history_pipe[0].recv()
+        self.assertEqual(event.code, system_mapping.get("a"))
+
+        # and all of them once it quits
+        self.assertTrue(self.daemon.start_injecting(group_key, self.preset_name))
+        self.daemon.stop_all()
+        host.join(timeout=5)
+        self.assertFalse(host.is_alive())
+        self.assertEqual(host.exitcode, 0)
+
+    def test_stats(self):
+        self.daemon = Daemon()
+        self.start(self.group_keys[:2])
+        keyboard = fixtures.foo_device_2_keyboard
+        push_events(keyboard, [InputEvent.key(KEY_A, 1), InputEvent.key(KEY_A, 0)])
+        time.sleep(0.1)
+
+        # every hosted injection counts its own events
+        stats = json.loads(self.daemon.get_stats())
+        self.assertEqual(stats[self.group_keys[0]]["events_read"], {keyboard.path: 2})
+        self.assertEqual(stats[self.group_keys[1]]["events_read"], {})
+
+    def test_memory(self):
+        """Compare the memory usage of injecting into many groups in both modes."""
+        rss = {}
+        for hosted in (False, True):
+            global_config.set("injection_host", hosted)
+            global_config._save_config()
+            self.daemon = Daemon()
+            self.start(self.group_keys)
+
+            rss_values = [
+                group_stats["rss"]
+                for group_stats in json.loads(self.daemon.get_stats()).values()
+            ]
+            # hosted injections all report the rss of the host
+            rss[hosted] = max(rss_values) if hosted else sum(rss_values)
+
+            self.daemon.stop_all()
+            self.daemon = None
+
+        logger.info(
+            "rss of %d groups: %.1f MiB in processes, %.1f MiB in the host",
+            len(self.group_keys),
+            rss[False] / 2**20,
+            rss[True] / 2**20,
+        )
+        self.assertLess(rss[True], rss[False])
+
+    def test_injector_pool(self):
+        """Compare the time it takes to start injecting, with and without pool."""
+        global_config.set("injection_host", False)
+        # the idle processes can only use uinputs that existed before
+        global_uinputs.prepare_single("keyboard")
+
+        latency = {}
+        for pool_size in (0, 1):
+            global_config.set("injector_pool_size", pool_size)
+            global_config._save_config()
+            self.daemon = Daemon()
+            iterate_main_loop(lambda: len(self.daemon._injector_pool) == pool_size)
+            pool = list(self.daemon._injector_pool)
+            # let them start up
+            time.sleep(0.2)
+
+            start = time.time()
+            self.daemon.start_injecting(self.group_keys[0], self.preset_name)
+            injector = self.daemon.injectors[self.group_keys[0]]
+            while injector.get_state() != InjectorState.RUNNING:
+                self.assertLess(time.time() - start, 5)
+                time.sleep(0.001)
+            latency[pool_size] = time.time() - start
+
+            if pool_size > 0:
+                # the injection runs in the process that was waiting in the pool
+                self.assertIs(injector._host, pool[0])
+                # and another one is started for the next injection
+                iterate_main_loop(lambda: len(self.daemon._injector_pool) == 1)
+                self.assertIsNot(self.daemon._injector_pool[0], pool[0])
+
+            # it ends like an Injector when the injection is stopped
+            self.daemon.stop_injecting(self.group_keys[0])
+            iterate_main_loop(lambda: not injector.is_alive())
+            self.assertEqual(injector.get_state(), InjectorState.STOPPED)
+            if pool_size > 0:
+                pool[0].join(timeout=5)
+                self.assertFalse(pool[0].is_alive())
+
+            self.daemon.stop_all()
+            self.daemon = None
+
+        logger.info(
+            "start to RUNNING: %.1f ms with a new process, %.1f ms from the pool",
+            latency[0] * 1000,
+            latency[1] * 1000,
+        )
+
+    def test_injector_pool_skips_unfit_hosts(self):
+        global_config.set("injection_host", False)
+        global_config.set("injector_pool_size", 1)
+        global_config._save_config()
+        self.daemon = Daemon()
+        iterate_main_loop(lambda: len(self.daemon._injector_pool) == 1)
+        host = self.daemon._injector_pool[0]
+        # it was forked before the keyboard uinput existed, so it can't be used
+        self.assertNotIn("keyboard", host.uinputs)
+
+        self.start(self.group_keys[:1])
+        injector = self.daemon.injectors[self.group_keys[0]]
+        self.assertNotIsInstance(injector, HostedInjector)
+        # but it stays in the pool for presets that fit
+        self.assertEqual(self.daemon._injector_pool, [host])
+        self.assertTrue(host.is_alive())
+
+    def test_disabled_injector_pool(self):
+        global_config.set("injection_host", False)
+        global_config.set("injector_pool_size", 0)
+        global_config._save_config()
+        self.daemon = Daemon()
+
+        self.assertTrue(
+            self.daemon.start_injecting(self.group_keys[0], self.preset_name)
+        )
+        # nothing is scheduled to fill it
+        self.assertIsNone(self.daemon._injector_pool_source)
+        self.assertEqual(self.daemon._injector_pool, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,12 +30,15 @@ from tests.lib.global_uinputs import (
 )
 from tests.lib.patches import uinputs
 from tests.lib.cleanup import quick_cleanup
+from tests.lib.logger import logger
 from tests.lib.constants import EVENT_READ_TIMEOUT
 from tests.lib.fixtures import fixtures
 from tests.lib.pipes import uinput_write_history_pipe
 from tests.lib.pipes import read_write_history_pipe, push_events
 from tests.lib.fixtures import keyboard_keys
 
+import asyncio
+import multiprocessing
 import unittest
 from unittest import mock
 import time
@@ -51,6 +54,8 @@ from evdev.ecodes import (
     BTN_A,
     ABS_X,
     ABS_VOLUME,
+    EV_LED,
+    LED_NUML,
 )
 
 from inputremapper.injection.injector import (
@@ -115,10 +120,10 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
 
     def initialize_injector(self, group, preset: Preset):
         self.injector = Injector(group, preset)
-        self.injector._devices = self.injector.group.get_devices()
+        self.injector._load_devices()
         self.injector._update_preset()
 
-    def test_grab(self):
+    async def test_grab(self):
         # path is from the fixtures
         path = "/dev/input/event10"
         preset = Preset()
@@ -134,14 +139,14 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         # this test needs to pass around all other constraints of
         # _grab_device
         self.injector.context = Context(preset, {}, {})
-        device = self.injector._grab_device(evdev.InputDevice(path))
+        device = await self.injector._grab_device(evdev.InputDevice(path))
         gamepad = classify(device) == DeviceType.GAMEPAD
         self.assertFalse(gamepad)
         self.assertEqual(self.failed, 2)
         # success on the third try
         self.assertEqual(device.name, fixtures[path].name)
 
-    def test_fail_grab(self):
+    async def test_fail_grab(self):
         self.make_it_fail = 999
         preset = Preset()
         preset.add(
@@ -155,7 +160,7 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         self.injector = Injector(groups.find(key="Foo Device 2"), preset)
         path = "/dev/input/event10"
         self.injector.context = Context(preset, {}, {})
-        device = self.injector._grab_device(evdev.InputDevice(path))
+        device = await self.injector._grab_device(evdev.InputDevice(path))
         self.assertIsNone(device)
         self.assertGreaterEqual(self.failed, 1)
 
@@ -164,11 +169,11 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(self.injector.get_state(), InjectorState.STARTING)
         # since none can be grabbed, the process will terminate. But that
         # actually takes quite some time.
-        time.sleep(self.injector.regrab_timeout * 12)
+        time.sleep(self.injector.grab_deadline + 0.5)
         self.assertFalse(self.injector.is_alive())
         self.assertEqual(self.injector.get_state(), InjectorState.NO_GRAB)
 
-    def test_grab_device_1(self):
+    async def test_grab_device_1(self):
         device_hash = fixtures.gamepad.get_device_hash()
 
         preset = Preset()
@@ -196,11 +201,11 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
             "/dev/input/event1234",
         ]
 
-        grabbed = self.injector._grab_devices()
+        grabbed = await self.injector._grab_devices()
         self.assertEqual(len(grabbed), 1)
         self.assertEqual(grabbed[device_hash].path, "/dev/input/event30")
 
-    def test_forward_gamepad_events(self):
+    async def test_forward_gamepad_events(self):
         device_hash = fixtures.gamepad.get_device_hash()
 
         # forward abs joystick events
@@ -219,13 +224,13 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         self.injector.context = Context(preset, {}, {})
 
         path = "/dev/input/event30"
-        devices = self.injector._grab_devices()
+        devices = await self.injector._grab_devices()
         self.assertEqual(len(devices), 1)
         self.assertEqual(devices[device_hash].path, path)
         gamepad = classify(devices[device_hash]) == DeviceType.GAMEPAD
         self.assertTrue(gamepad)
 
-    def test_skip_unused_device(self):
+    async def test_skip_unused_device(self):
         # skips a device because its capabilities are not used in the preset
         preset = Preset()
         preset.add(
@@ -239,11 +244,11 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         self.injector.context = Context(preset, {}, {})
 
         # grabs only one device even though the group has 4 devices
-        devices = self.injector._grab_devices()
+        devices = await self.injector._grab_devices()
         self.assertEqual(len(devices), 1)
         self.assertEqual(self.failed, 2)
 
-    def test_skip_unknown_device(self):
+    async def test_skip_unknown_device(self):
         preset = Preset()
         preset.add(
             Mapping.from_combination(
@@ -256,12 +261,92 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         # skips a device because its capabilities are not used in the preset
         self.initialize_injector(groups.find(key="Foo Device 2"), preset)
         self.injector.context = Context(preset, {}, {})
-        devices = self.injector._grab_devices()
+        devices = await self.injector._grab_devices()
 
         # skips the device alltogether, so no grab attempts fail
         self.assertEqual(self.failed, 0)
         self.assertEqual(devices, {})
 
+    async def test_grab_concurrently(self):
+        # both devices are busy until the deadline
+        self.make_it_fail = 999
+        preset = Preset()
+        input_configs = [
+            InputConfig(
+                type=EV_KEY,
+                code=KEY_A,
+                origin_hash=fixtures.foo_device_2_keyboard.get_device_hash(),
+            ),
+            InputConfig(
+                type=EV_REL,
+                code=REL_HWHEEL,
+                analog_threshold=1,
+                origin_hash=fixtures.foo_device_2_mouse.get_device_hash(),
+            ),
+        ]
+        for input_config in input_configs:
+            preset.add(
+                Mapping.from_combination(
+                    InputCombination([input_config]),
+                    "keyboard",
+                    "a",
+                )
+            )
+
+        self.initialize_injector(groups.find(key="Foo Device 2"), preset)
+        start = time.time()
+        devices = await self.injector._grab_devices()
+        duration = time.time() - start
+
+        self.assertEqual(devices, {})
+        # they were retried with increasing delays
+        self.assertLess(self.failed, 20)
+        # at the same time, instead of one after the other
+        self.assertGreaterEqual(duration, self.injector.grab_deadline)
+        self.assertLess(duration, self.injector.grab_deadline * 1.5)
+
+    async def test_wait_for_previous(self):
+        previous = multiprocessing.Process(target=time.sleep, args=(0.2,))
+        previous.start()
+        self.injector = Injector(
+            groups.find(key="Foo Device 2"),
+            Preset(),
+            mock.Mock(get_release_sentinel=lambda: previous.sentinel),
+        )
+
+        start = time.time()
+        await self.injector._wait_for_previous()
+        duration = time.time() - start
+        # it might not be reaped yet, but it is done
+        previous.join(timeout=0.05)
+        self.assertFalse(previous.is_alive())
+        self.assertLess(duration, self.injector.grab_deadline)
+
+    async def test_load_devices(self):
+        preset = Preset()
+        for code in range(10, 60):
+            preset.add(
+                Mapping.from_combination(
+                    InputCombination([InputConfig(type=EV_KEY, code=code)]),
+                    "keyboard",
+                    "a",
+                )
+            )
+
+        with mock.patch.object(
+            evdev.InputDevice,
+            "capabilities",
+            autospec=True,
+            side_effect=evdev.InputDevice.capabilities,
+        ) as capabilities:
+            self.initialize_injector(groups.find(key="Foo Device 2"), preset)
+            await self.injector._grab_devices()
+
+        # for the index, the hash, and possibly classify, instead of for each config
+        devices = self.injector._devices
+        self.assertGreater(len(devices), 1)
+        self.assertLessEqual(capabilities.call_count, 3 * len(devices))
+
     def test_get_udev_name(self):
         self.injector = Injector(groups.find(key="Foo Device 2"), Preset())
         suffix = "mapped"
@@ -312,8 +397,9 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         self.injector.stop_injecting()
         self.injector.run()
 
+        # the injector doesn't keep the mappings, but it updated their origin_hash
         self.assertEqual(
-            self.injector.preset.get_mapping(
+            preset.get_mapping(
                 InputCombination(
                     [
                         InputConfig(
@@ -327,7 +413,7 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
             m1,
         )
         self.assertEqual(
-            self.injector.preset.get_mapping(
+            preset.get_mapping(
                 InputCombination(
                     [
                         InputConfig(
@@ -357,8 +443,6 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(ungrab_patch.call_count, 2)
 
     def test_injector(self):
-        numlock_before = is_numlock_on()
-
         # stuff the preset outputs
         system_mapping.clear()
         code_a = 100
@@ -527,10 +611,221 @@ class TestInjector(unittest.IsolatedAsyncioTestCase):
         time.sleep(0.1)
         self.assertTrue(self.injector.is_alive())
 
-        numlock_after = is_numlock_on()
-        self.assertEqual(numlock_before, numlock_after)
         self.assertEqual(self.injector.get_state(), InjectorState.RUNNING)
 
+    async def test_numlock(self):
+        keyboard = fixtures.foo_device_2_keyboard
+        self.addCleanup(keyboard.capabilities.pop, EV_LED)
+        self.addCleanup(keyboard.leds.clear)
+        keyboard.capabilities[EV_LED] = [LED_NUML]
+        keyboard.leds.append(LED_NUML)
+
+        preset = Preset()
+        preset.add(
+            Mapping.from_combination(
+                InputCombination([InputConfig(type=EV_KEY, code=KEY_A)]),
+                "keyboard",
+                "b",
+            )
+        )
+        self.injector = Injector(groups.find(key="Foo Device 2"), preset)
+
+        # runs within this process, to see what happens to the leds
+        self.injector.is_alive = lambda: True
+        start = time.time()
+        injection = asyncio.ensure_future(self.injector.inject())
+        while self.injector.get_state() != InjectorState.RUNNING:
+            self.assertLess(time.time() - start, 5)
+            await asyncio.sleep(0.001)
+        logger.info("start to RUNNING: %.1f ms", (time.time() - start) * 1000)
+
+        # the forwarded keyboard starts with the numlock state of the keyboard
+        forwarded = uinputs[get_udev_name(keyboard.name, "forwarded")]
+        self.assertIn((EV_LED, LED_NUML, 1), forwarded.write_history)
+
+        # the display server turns its led off, because the numlock is toggled
+        forwarded.device._fixture.capabilities[EV_LED] = [LED_NUML]
+        self.assertFalse(is_numlock_on(forwarded.device))
+
+        # the keyboard gets the state of the forwarded keyboard back
+        self.injector.stop_injecting()
+        await asyncio.wait_for(injection, timeout=5)
+        self.injector.is_alive = lambda: False
+        self.assertEqual(self.injector.get_state(), InjectorState.STOPPED)
+        self.assertFalse(is_numlock_on(evdev.InputDevice(keyboard.path)))
+        self.assertEqual(keyboard.leds, [])
+
+    async def test_reload_preset(self):
+        keyboard = fixtures.foo_device_2_keyboard
+        gamepad = fixtures.foo_device_2_gamepad
+        system_mapping.clear()
+        system_mapping._set("b", 101)
+        system_mapping._set("c", 102)
+        system_mapping._set("d", 103)
+
+        def key_mapping(code, output_symbol):
+            return Mapping.from_combination(
+                InputCombination(
+                    [
+                        InputConfig(
+                            type=EV_KEY,
+                            code=code,
+                            origin_hash=keyboard.get_device_hash(),
+                        )
+                    ]
+                ),
+                "keyboard",
+                output_symbol,
+            )
+
+        preset = Preset()
+        preset.add(key_mapping(KEY_A, "b"))
+        preset.add(key_mapping(KEY_A + 1, "c"))
+        self.injector = Injector(groups.find(key="Foo Device 2"), preset)
+
+        # runs within this process, to see what happens to the devices
+        self.injector.is_alive = lambda: True
+        injection = asyncio.ensure_future(self.injector.inject())
+        while self.injector.get_state() != InjectorState.RUNNING:
+            await asyncio.sleep(0.001)
+
+        context = self.injector.context
+        sources = dict(context._source_devices)
+        self.assertEqual(list(sources.keys()), [keyboard.get_device_hash()])
+
+        def get_callbacks(code):
+            event = InputEvent.key(code, 1, keyboard.get_device_hash())
+            return context.get_notify_callbacks(event)
+
+        unchanged = get_callbacks(KEY_A + 1)
+        changed = get_callbacks(KEY_A)
+        self.assertEqual(len(changed), 1)
+
+        new_preset = Preset()
+        new_preset.add(key_mapping(KEY_A, "d"))
+        new_preset.add(key_mapping(KEY_A + 1, "c"))
+        new_preset.add(
+            Mapping.from_combination(
+                InputCombination(
+                    [
+                        InputConfig(
+                            type=EV_ABS,
+                            code=ABS_HAT0X,
+                            analog_threshold=-1,
+                            origin_hash=gamepad.get_device_hash(),
+                        )
+                    ]
+                ),
+                "keyboard",
+                "b",
+            )
+        )
+        start = time.time()
+        self.injector.reload_preset(new_preset)
+        while get_callbacks(KEY_A) == changed:
+            self.assertLess(time.time() - start, 5)
+            await asyncio.sleep(0.001)
+
+        # the same injection keeps running with its devices grabbed
+        self.assertIs(self.injector.context, context)
+        self.assertEqual(self.injector.get_state(), InjectorState.RUNNING)
+        self.assertIs(
+            context._source_devices[keyboard.get_device_hash()],
+            sources[keyboard.get_device_hash()],
+        )
+        self.assertIn(gamepad.get_device_hash(), context._source_devices)
+        self.assertEqual(get_callbacks(KEY_A + 1), unchanged)
+
+        logger.info("reload: %.1f ms", (time.time() - start) * 1000)
+
+        async def wait_for_output():
+            while not uinput_write_history_pipe[0].poll():
+                self.assertLess(time.time() - start, 5)
+                await asyncio.sleep(0.001)
+
+            await asyncio.sleep(0.01)
+            return read_write_history_pipe()
+
+        push_events(keyboard, [InputEvent.key(KEY_A, 1)])
+        self.assertIn((EV_KEY, 103, 1), await wait_for_output())
+
+        push_events(gamepad, [InputEvent.abs(ABS_HAT0X, -1)])
+        self.assertIn((EV_KEY, 101, 1), await wait_for_output())
+
+        self.injector.stop_injecting()
+        await asyncio.wait_for(injection, timeout=5)
+        self.injector.is_alive = lambda: False
+
+    def test_get_macro_statistics(self):
+        self.make_it_fail = 0
+        preset = Preset()
+        preset.add(
+            Mapping.from_combination(
+                InputCombination([InputConfig(type=EV_KEY, code=10)]),
+                "keyboard",
+                "a",
+            )
+        )
+        self.injector = Injector(groups.find(key="Foo Device 2"), preset)
+        self.injector.start()
+        for _ in range(50):
+            if self.injector.get_state() == InjectorState.RUNNING:
+                break
+
+            time.sleep(0.1)
+
+        self.assertEqual(self.injector.get_state(), InjectorState.RUNNING)
+
+        # a late reply of a request that timed out
+        self.injector._statistics_pipe[0].send((0, {"stale": {}}))
+        self.assertEqual(self.injector.get_macro_statistics(), {})
+        # the state isn't affected by the statistics
+        self.assertEqual(self.injector.get_state(), InjectorState.RUNNING)
+        self.assertFalse(self.injector._statistics_pipe[1].poll())
+
+    def test_get_stats(self):
+        keyboard = fixtures.foo_device_2_keyboard
+        preset = Preset()
+        preset.add(
+            Mapping.from_combination(
+                InputCombination(
+                    [
+                        InputConfig(
+                            type=EV_KEY,
+                            code=10,
+                            origin_hash=keyboard.get_device_hash(),
+                        )
+                    ]
+                ),
+                "keyboard",
+                "a",
+            )
+        )
+        self.injector = Injector(groups.find(key="Foo Device 2"), preset)
+        self.injector.start()
+        uinput_write_history_pipe[0].poll(timeout=1)
+        self.assertEqual(self.injector.get_state(), InjectorState.RUNNING)
+        time.sleep(EVENT_READ_TIMEOUT * 10)
+
+        push_events(
+            keyboard,
+            [
+                InputEvent.key(10, 1),
+                InputEvent.key(10, 0),
+                InputEvent.key(11, 1),
+            ],
+        )
+        time.sleep(0.1)
+
+        stats = self.injector.get_stats()
+        self.assertEqual(stats["events_read"], {keyboard.path: 3})
+        self.assertEqual(stats["events_forwarded"], 1)
+        self.assertEqual(sum(stats["events_handled"].values()), 2)
+        self.assertEqual(stats["uinput_writes"], 3)
+        self.assertEqual(stats["exceptions"], 0)
+        self.assertGreater(stats["cpu_time"], 0)
+        self.assertGreater(stats["rss"], 0)
+
     def test_is_in_capabilities(self):
         key = InputCombination(InputCombination.from_tuples((1, 2, 1)))
         capabilities = {1: [9, 2, 5]}
@@ -31,6 +31,7 @@ from evdev.ecodes import (
     EV_ABS,
     EV_KEY,
     ABS_Y,
+    REL_X,
     REL_Y,
     REL_HWHEEL,
     REL_HWHEEL_HI_RES,
@@ -38,6 +39,10 @@ from evdev.ecodes import (
     KEY_B,
     KEY_C,
     KEY_E,
+    KEY_Q,
+    KEY_1,
+    KEY_LEFTSHIFT,
+    KEY_RIGHTALT,
 )
 
 from inputremapper.configs.preset import Preset
@@ -97,10 +102,9 @@ class MacroTestBase(unittest.IsolatedAsyncioTestCase):
         self.result.append((type_, code, value))
 
     async def trigger_sequence(self, macro: Macro, event):
-        for listener in self.context.listeners:
-            asyncio.ensure_future(listener(event))
-            # this still might cause race conditions and the test to fail
-            await asyncio.sleep(0)
+        self.context.listeners.notify(event)
+        # give waiting macros a chance to react
+        await asyncio.sleep(0)
 
         macro.press_trigger()
         if macro.running:
@@ -108,10 +112,8 @@ class MacroTestBase(unittest.IsolatedAsyncioTestCase):
         asyncio.ensure_future(macro.run(self.handler))
 
     async def release_sequence(self, macro: Macro, event):
-        for listener in self.context.listeners:
-            asyncio.ensure_future(listener(event))
-            # this still might cause race conditions and the test to fail
-            await asyncio.sleep(0)
+        self.context.listeners.notify(event)
+        await asyncio.sleep(0)
 
         if macro.is_holding():
             macro.release_trigger()
@@ -594,6 +596,99 @@ class TestMacros(MacroTestBase):
             ],
         )
 
+    async def test_type(self):
+        code_a = system_mapping.get("a")
+        macro = parse('type("aA!@")', self.context, DummyMapping)
+        await macro.run(self.handler)
+        self.assertListEqual(
+            self.result,
+            [
+                (EV_KEY, code_a, 1),
+                (EV_KEY, code_a, 0),
+                (EV_KEY, KEY_LEFTSHIFT, 1),
+                (EV_KEY, code_a, 1),
+                (EV_KEY, code_a, 0),
+                (EV_KEY, KEY_LEFTSHIFT, 0),
+                (EV_KEY, KEY_LEFTSHIFT, 1),
+                (EV_KEY, KEY_1, 1),
+                (EV_KEY, KEY_1, 0),
+                (EV_KEY, KEY_LEFTSHIFT, 0),
+                # the tests use a german layout
+                (EV_KEY, KEY_RIGHTALT, 1),
+                (EV_KEY, KEY_Q, 1),
+                (EV_KEY, KEY_Q, 0),
+                (EV_KEY, KEY_RIGHTALT, 0),
+            ],
+        )
+
+    async def test_type_frames(self):
+        frames = []
+
+        def handler(*_):
+            raise AssertionError("Expected write_frame to be used")
+
+        handler.write_frame = frames.append
+
+        code_b = system_mapping.get("b")
+        macro = parse('set(foo, " B").type($foo, 0)', self.context, DummyMapping)
+        await macro.run(handler)
+        code_space = system_mapping.get("space")
+        self.assertListEqual(
+            frames,
+            [
+                [(EV_KEY, code_space, 1)],
+                [(EV_KEY, code_space, 0)],
+                [(EV_KEY, KEY_LEFTSHIFT, 1), (EV_KEY, code_b, 1)],
+                [(EV_KEY, code_b, 0), (EV_KEY, KEY_LEFTSHIFT, 0)],
+            ],
+        )
+
+    async def test_type_delay(self):
+        text = "a" * 20
+
+        macro = parse(f'type("{text}", delay=0)', self.context, DummyMapping)
+        start = time.time()
+        await macro.run(self.handler)
+        self.assertLess(time.time() - start, 0.01)
+        self.assertEqual(len(self.result), 40)
+
+        self.result.clear()
+        macro = parse(f'type("{text}", delay=5)', self.context, DummyMapping)
+        start = time.time()
+        await macro.run(self.handler)
+        # one delay per character, not per frame
+        self.assertGreater(time.time() - start, 0.1)
+        self.assertLess(time.time() - start, 0.2)
+        self.assertEqual(len(self.result), 40)
+
+    async def test_type_yields(self):
+        # other events are still injected while a long text is written
+        iterations = 0
+
+        async def count():
+            nonlocal iterations
+            while True:
+                iterations += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(count())
+        macro = parse(f'type("{"a" * 20}", delay=0)', self.context, DummyMapping)
+        await macro.run(self.handler)
+        task.cancel()
+        self.assertGreaterEqual(iterations, 19)
+        self.assertEqual(len(self.result), 40)
+
+    def test_type_errors(self):
+        self.assertRaises(MacroParsingError, parse, 'type("€")', self.context)
+        self.assertRaises(MacroParsingError, parse, 'type("a", "b")', self.context)
+        self.assertRaises(
+            SymbolNotAvailableInTargetError,
+            parse,
+            'type("a")',
+            self.context,
+            mapping=type("Mapping", (), {"target_uinput": "mouse"}),
+        )
+
     async def test_modify(self):
         code_a = system_mapping.get("a")
         code_b = system_mapping.get("b")
@@ -713,6 +808,78 @@ class TestMacros(MacroTestBase):
         await asyncio.sleep(0.1)
         self.assertFalse(macro.running)
 
+    async def test_hold_interval(self):
+        class Mapping(DummyMapping):
+            # the child doesn't wait at all
+            macro_key_sleep_ms = 0
+
+        # without an interval, it pauses for 1ms between repetitions as before
+        macro = parse("hold(event(EV_REL, REL_X, 1))", self.context, Mapping)
+        macro.press_trigger()
+        asyncio.ensure_future(macro.run(self.handler))
+        await asyncio.sleep(0.1)
+        macro.release_trigger()
+        await asyncio.sleep(0.05)
+        self.assertFalse(macro.running)
+        # much more often than every 10ms
+        self.assertGreater(len(self.result), 20)
+
+        # with an interval, it doesn't spin
+        self.result.clear()
+        macro = parse("hold(event(EV_REL, REL_X, 1), 50)", self.context, Mapping)
+        with mock.patch.object(
+            macro, "_wait_for_release", wraps=macro._wait_for_release
+        ) as wait_for_release, mock.patch.object(
+            asyncio, "sleep", wraps=asyncio.sleep
+        ) as sleep:
+            macro.press_trigger()
+            asyncio.ensure_future(macro.run(self.handler))
+            await asyncio.sleep(0.5)
+            macro.release_trigger()
+            await asyncio.sleep(0.05)
+
+        # only one wakeup per repetition
+        self.assertGreater(wait_for_release.call_count, 7)
+        self.assertLessEqual(wait_for_release.call_count, 11)
+        self.assertEqual(len(self.result), wait_for_release.call_count)
+        # besides the sleeps of this test, only the zero pauses of the child
+        sleeps = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(sleeps.count(0), len(self.result))
+        self.assertEqual(len(sleeps), len(self.result) + 2)
+
+    async def test_hold_interval_slow_child(self):
+        # the interval is counted from the start of the previous repetition,
+        # so a slow child is repeated right away
+        macro = parse("hold(key(a), interval=5)", self.context, DummyMapping)
+        macro.press_trigger()
+        asyncio.ensure_future(macro.run(self.handler))
+        await asyncio.sleep(0.21)
+        macro.release_trigger()
+        await asyncio.sleep(0.05)
+        # key(a) takes 20ms, because of macro_key_sleep_ms
+        code_a = system_mapping.get("a")
+        self.assertGreaterEqual(self.result.count((EV_KEY, code_a, 1)), 9)
+        self.assertLessEqual(self.result.count((EV_KEY, code_a, 1)), 12)
+
+    async def test_hold_release_stops_waiting(self):
+        macro = parse(
+            "hold(event(EV_REL, REL_X, 1), 10000)", self.context, DummyMapping
+        )
+        macro.press_trigger()
+        asyncio.ensure_future(macro.run(self.handler))
+        await asyncio.sleep(0.05)
+        self.assertTrue(macro.running)
+        self.assertEqual(self.result, [(EV_REL, REL_X, 1)])
+
+        macro.release_trigger()
+        start = time.time()
+        while macro.running:
+            await asyncio.sleep(0)
+
+        # doesn't wait for the interval to pass
+        self.assertLess(time.time() - start, 0.005)
+        self.assertEqual(len(self.result), 1)
+
     async def test_dont_hold(self):
         macro = parse("key(1).hold(key(a)).key(3)", self.context, DummyMapping)
 
@@ -1064,6 +1231,17 @@ class TestMacros(MacroTestBase):
         await parse("set(a, )", self.context, DummyMapping).run(self.handler)
         self.assertEqual(macro_variables.get("a"), None)
 
+    async def test_switch_preset(self):
+        self.context.preload_preset(Preset("/presets/gaming.json"))
+        macro = parse("switch_preset(gaming)", self.context, DummyMapping)
+        await macro.run(self.handler)
+        self.assertEqual(self.context.active_preset, "gaming")
+
+        # presets that were not preloaded are not switched to
+        macro = parse('switch_preset("editing")', self.context, DummyMapping)
+        await macro.run(self.handler)
+        self.assertEqual(self.context.active_preset, "gaming")
+
     async def test_add(self):
         await parse("set(a, 1).add(a, 1)", self.context, DummyMapping).run(self.handler)
         self.assertEqual(macro_variables.get("a"), 2)
@@ -1333,8 +1511,7 @@ class TestIfSingle(MacroTestBase):
         # it doesn't care if keys were released that have been
         # pressed before if_single. This was decided because it is a lot
         # less tricky and more fluently to use if you type fast
-        for listener in self.context.listeners:
-            asyncio.ensure_future(listener(InputEvent.key(b, 0)))
+        self.context.listeners.notify(InputEvent.key(b, 0))
         await asyncio.sleep(0.05)
         self.assertListEqual(self.result, [])
 
@@ -1367,8 +1544,7 @@ class TestIfSingle(MacroTestBase):
         await self.trigger_sequence(macro, InputEvent.key(a, 1))
         await asyncio.sleep(0.1)
         # press another key
-        for listener in self.context.listeners:
-            asyncio.ensure_future(listener(InputEvent.key(b, 1)))
+        self.context.listeners.notify(InputEvent.key(b, 1))
         await asyncio.sleep(0.1)
 
         self.assertListEqual(self.result, [(EV_KEY, y, 1), (EV_KEY, y, 0)])
@@ -1387,8 +1563,7 @@ class TestIfSingle(MacroTestBase):
         await self.trigger_sequence(macro, InputEvent.key(a, 1))
         await asyncio.sleep(0.1)
         # press another key
-        for listener in self.context.listeners:
-            asyncio.ensure_future(listener(InputEvent.key(b, 1)))
+        self.context.listeners.notify(InputEvent.key(b, 1))
         await asyncio.sleep(0.1)
 
         self.assertListEqual(self.result, [])
@@ -1428,8 +1603,7 @@ class TestIfSingle(MacroTestBase):
 
         await self.trigger_sequence(macro, InputEvent.key(trigger, 1))
         await asyncio.sleep(0.1)
-        for listener in self.context.listeners:
-            asyncio.ensure_future(listener(InputEvent.abs(ABS_Y, 10)))
+        self.context.listeners.notify(InputEvent.abs(ABS_Y, 10))
         await asyncio.sleep(0.1)
         await self.release_sequence(macro, InputEvent.key(trigger, 0))
         await asyncio.sleep(0.1)
@@ -24,10 +24,23 @@ import subprocess
 import unittest
 from unittest.mock import patch
 
-from evdev.ecodes import BTN_LEFT, KEY_A
+from evdev.ecodes import (
+    BTN_LEFT,
+    KEY_A,
+    KEY_1,
+    KEY_Q,
+    KEY_Y,
+    KEY_Z,
+    KEY_LEFTSHIFT,
+    KEY_RIGHTALT,
+)
 
 from inputremapper.configs.paths import CONFIG_PATH
-from inputremapper.configs.system_mapping import SystemMapping, XMODMAP_FILENAME
+from inputremapper.configs.system_mapping import (
+    SystemMapping,
+    XMODMAP_FILENAME,
+    XMODMAP_LEVELS_FILENAME,
+)
 from tests.lib.cleanup import quick_cleanup
 
 
@@ -147,6 +160,64 @@ class TestSystemMapping(unittest.TestCase):
 
         self.assertEqual(system_mapping.get("disable"), -1)
 
+    def test_xmodmap_levels_file(self):
+        system_mapping = SystemMapping()
+        path = os.path.join(CONFIG_PATH, XMODMAP_LEVELS_FILENAME)
+        if os.path.exists(path):
+            os.remove(path)
+
+        # only written when the session tells the service about the config dir
+        system_mapping.populate()
+        self.assertFalse(os.path.exists(path))
+
+        system_mapping.save_levels()
+        self.assertTrue(os.path.exists(path))
+        with open(path, "r") as file:
+            content = json.load(file)
+            self.assertEqual(content["a"], [KEY_A, 0])
+            self.assertEqual(content["A"], [KEY_A, 1])
+            self.assertEqual(content["at"], [KEY_Q, 4])
+            self.assertNotIn("NoSymbol", content)
+
+    def test_get_character_keys(self):
+        system_mapping = SystemMapping()
+        system_mapping.populate()
+
+        # the xmodmap of the tests is a german layout
+        self.assertEqual(system_mapping.get_character_keys("z"), (KEY_Y, []))
+        self.assertEqual(
+            system_mapping.get_character_keys("Z"), (KEY_Y, [KEY_LEFTSHIFT])
+        )
+        self.assertEqual(
+            system_mapping.get_character_keys("!"), (KEY_1, [KEY_LEFTSHIFT])
+        )
+        self.assertEqual(
+            system_mapping.get_character_keys("@"), (KEY_Q, [KEY_RIGHTALT])
+        )
+        self.assertIsNone(system_mapping.get_character_keys("€"))
+
+    @patch("inputremapper.configs.system_mapping.is_service", lambda: True)
+    def test_get_character_keys_without_levels(self):
+        # the service only knows the levels if the xmodmap_levels.json file exists
+        system_mapping = SystemMapping()
+        system_mapping.clear()
+        system_mapping.update({"z": KEY_Y, "KEY_Z": KEY_Z, "KEY_1": KEY_1})
+
+        self.assertEqual(system_mapping.get_character_keys("z"), (KEY_Y, []))
+        self.assertEqual(
+            system_mapping.get_character_keys("Z"), (KEY_Y, [KEY_LEFTSHIFT])
+        )
+        # falls back to a us layout
+        self.assertEqual(
+            system_mapping.get_character_keys("!"), (KEY_1, [KEY_LEFTSHIFT])
+        )
+        self.assertIsNone(system_mapping.get_character_keys("@"))
+
+        system_mapping.update_levels({"at": (KEY_Q, 4)})
+        self.assertEqual(
+            system_mapping.get_character_keys("@"), (KEY_Q, [KEY_RIGHTALT])
+        )
+
     def test_get_name_no_xmodmap(self):
         # if xmodmap is not installed, uses the linux constant names
         system_mapping = SystemMapping()
@@ -19,11 +19,29 @@
 # along with input-remapper.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import os
+import tempfile
 import unittest
 
 from evdev._ecodes import EV_ABS, ABS_X, BTN_WEST, BTN_Y, EV_KEY, KEY_A
 
-from inputremapper.utils import get_evdev_constant_name
+from inputremapper.utils import (
+    get_evdev_constant_name,
+    get_device_hash,
+    get_device_capabilities,
+    forget_device,
+)
+
+
+class CountingDevice:
+    def __init__(self, path):
+        self.path = path
+        self.name = "device"
+        self.queries = 0
+
+    def capabilities(self, absinfo=True):
+        self.queries += 1
+        return {EV_KEY: [KEY_A]}
 
 
 class TestUtil(unittest.TestCase):
@@ -39,3 +57,31 @@ class TestUtil(unittest.TestCase):
         self.assertEqual(get_evdev_constant_name(EV_KEY, KEY_A), "KEY_A")
 
         self.assertEqual(get_evdev_constant_name(EV_ABS, ABS_X), "ABS_X")
+
+    def test_get_device_hash(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "event1")
+            open(path, "w").close()
+            device = CountingDevice(path)
+
+            device_hash = get_device_hash(device)
+            self.assertEqual(get_device_hash(device), device_hash)
+            self.assertEqual(get_device_capabilities(device), {EV_KEY: [KEY_A]})
+            self.assertEqual(device.queries, 1)
+
+            # a different node appears at the path
+            other_path = os.path.join(directory, "other")
+            open(other_path, "w").close()
+            os.replace(other_path, path)
+            self.assertEqual(get_device_hash(device), device_hash)
+            self.assertEqual(device.queries, 2)
+
+            forget_device(path)
+            get_device_hash(device)
+            self.assertEqual(device.queries, 3)
+
+            # it's not cached while the node doesn't exist
+            os.remove(path)
+            get_device_hash(device)
+            get_device_hash(device)
+            self.assertEqual(device.queries, 5)